@@ -2,11 +2,21 @@ import streamlit as st
 import os
 from utils.pdf_processor import PDFProcessor
 from utils.vector_store import VectorStore
+from utils.retrieval_client import RetrievalClient
+from utils.document_stores import DocumentStores
+from utils.large_document import index_large_document
 from utils.qa_chain import QAChain
 from utils.web_search import WebSearch
+from utils.pdf_buffer import PDFBuffer
+from utils.query_rewriter import QueryRewriter
+from utils.chat_history import ChatHistory, new_debug_log
+from utils.single_flight import single_flight
+from utils.upstream import deadline, upstream_stats
+from utils.doc_summary import SummaryStore, summary_intent, format_outline
+from utils.warmup import warm_up_components
+from utils.voice_search import get_transcriber
 from config import Config
 import tempfile
-from io import BytesIO
 import re
 from datetime import datetime
 
@@ -20,12 +30,20 @@ st.set_page_config(
 # Initialize components
 @st.cache_resource
 def initialize_components():
-    return {
+    # Constructors are cheap; API clients and heavy modules load in the background
+    qa_chain = QAChain()
+    components = {
         'pdf_processor': PDFProcessor(),
-        'vector_store': VectorStore(),
-        'qa_chain': QAChain(),
-        'web_search': WebSearch()
+        # One store per document, resolved per session; "service" mode searches through
+        # retrieval_service.py instead of in this process
+        'documents': DocumentStores(RetrievalClient if Config.RETRIEVAL_MODE == "service" else VectorStore),
+        'qa_chain': qa_chain,
+        'web_search': WebSearch(),
+        'query_rewriter': QueryRewriter(qa_chain),
+        'summaries': SummaryStore()
     }
+    warm_up_components(components)
+    return components
 
 def is_conversational_query(question):
     """Check if the question is conversational/greeting rather than PDF-related"""
@@ -173,6 +191,40 @@ If you have a PDF document you'd like to explore, just upload it and start askin
 
 What would you like to know or discuss? 😊"""
 
+def init_session_state():
+    """Per-session defaults (also used by benchmarks/load_test.py for simulated sessions)"""
+    if 'messages' not in st.session_state:
+        st.session_state.messages = ChatHistory([
+            {
+                "role": "assistant", 
+                "content": """🌸 **Hello! I'm Ira, your friendly PDF Q&A assistant!** 👋
+
+I'm excited to help you explore and understand your documents. You can:
+- Upload a PDF and ask questions about it 📄
+- Chat with me using voice or text 💬
+- Ask me about my capabilities 🤖
+
+What would you like to do today?"""
+            }
+        ])
+    elif not isinstance(st.session_state.messages, ChatHistory):
+        # Sessions started before the history cap existed still hold a plain list
+        st.session_state.messages = ChatHistory(st.session_state.messages)
+    if 'pdf_processed' not in st.session_state:
+        st.session_state.pdf_processed = False
+    if 'current_pdf' not in st.session_state:
+        st.session_state.current_pdf = None
+    if 'debug_info' not in st.session_state:
+        st.session_state.debug_info = new_debug_log()
+    elif isinstance(st.session_state.debug_info, list):
+        debug_log = new_debug_log()
+        debug_log.extend(st.session_state.debug_info)
+        st.session_state.debug_info = debug_log
+    if 'last_uploaded_pdf' not in st.session_state:
+        st.session_state.last_uploaded_pdf = None
+    if 'show_upload_success' not in st.session_state:
+        st.session_state.show_upload_success = False
+
 def main():
     st.title("🌸 Ira - Your PDF Q&A Assistant")
     st.markdown("*Upload a PDF and chat with me about its content, or just say hello!* 💬")
@@ -220,30 +272,7 @@ def main():
     components = initialize_components()
     
     # Initialize session state
-    if 'messages' not in st.session_state:
-        st.session_state.messages = [
-            {
-                "role": "assistant", 
-                "content": """🌸 **Hello! I'm Ira, your friendly PDF Q&A assistant!** 👋
-
-I'm excited to help you explore and understand your documents. You can:
-- Upload a PDF and ask questions about it 📄
-- Chat with me using voice or text 💬
-- Ask me about my capabilities 🤖
-
-What would you like to do today?"""
-            }
-        ]
-    if 'pdf_processed' not in st.session_state:
-        st.session_state.pdf_processed = False
-    if 'current_pdf' not in st.session_state:
-        st.session_state.current_pdf = None
-    if 'debug_info' not in st.session_state:
-        st.session_state.debug_info = []
-    if 'last_uploaded_pdf' not in st.session_state:
-        st.session_state.last_uploaded_pdf = None
-    if 'show_upload_success' not in st.session_state:
-        st.session_state.show_upload_success = False
+    init_session_state()
 
     # Sidebar for PDF upload
     with st.sidebar:
@@ -273,22 +302,22 @@ What would you like to do today?"""
             col1, col2 = st.columns(2)
             with col1:
                 if st.button("🗑️ Clear Chat", help="Clear chat history"):
-                    st.session_state.messages = [
+                    st.session_state.messages = ChatHistory([
                         {
                             "role": "assistant", 
                             "content": "🌸 **Chat cleared!** I'm still here and ready to help with your PDF or any other questions! 😊"
                         }
-                    ]
+                    ])
                     st.rerun()
             
             with col2:
                 if st.button("🔄 Reset All", help="Clear everything"):
-                    st.session_state.messages = [
+                    st.session_state.messages = ChatHistory([
                         {
                             "role": "assistant", 
                             "content": "🌸 **All reset!** Feel free to upload a new PDF or just chat with me! How can I help you today? 😊"
                         }
-                    ]
+                    ])
                     st.session_state.pdf_processed = False
                     st.session_state.current_pdf = None
                     st.session_state.last_uploaded_pdf = None
@@ -312,13 +341,20 @@ What would you like to do today?"""
             show_debug = st.checkbox("Show Debug Info", value=False)
             if show_debug:
                 with st.expander("Debug Information"):
-                    for debug_msg in st.session_state.debug_info[-10:]:
+                    for debug_msg in list(st.session_state.debug_info)[-10:]:
                         st.text(debug_msg)
 
     # Display chat messages
     chat_container = st.container()
     with chat_container:
-        for message in st.session_state.messages:
+        history = st.session_state.messages
+        # Older turns are compacted and only rendered when asked for
+        if history.archived_count:
+            if st.checkbox(f"Show {history.summary()}", value=False, key="show_archived_messages"):
+                for message in history.archived:
+                    with st.chat_message(message["role"]):
+                        st.caption(message["content"])
+        for message in history:
             with st.chat_message(message["role"]):
                 st.write(message["content"])
 
@@ -331,18 +367,27 @@ What would you like to do today?"""
     
     with voice_col1:
         try:
-            from streamlit_mic_recorder import speech_to_text
+            from streamlit_mic_recorder import mic_recorder
             
-            voice_text = speech_to_text(
+            # The browser only records; the shared VoiceTranscriber (VOICE_BACKEND) transcribes
+            recording = mic_recorder(
                 start_prompt="🎤 Start Recording",
                 stop_prompt="⏹️ Stop Recording", 
                 just_once=True,
                 use_container_width=True,
+                format="wav",
                 key="voice_input"
             )
             
-            if voice_text:
-                process_user_input(voice_text, components, chat_container)
+            if recording:
+                voice_text = None
+                try:
+                    with st.spinner("🎧 Transcribing..."):
+                        voice_text = get_transcriber().transcribe(recording["bytes"])
+                except Exception as e:
+                    st.error(f"Voice transcription failed: {str(e)}")
+                if voice_text:
+                    process_user_input(voice_text, components, chat_container)
                 
         except ImportError:
             st.info("📦 Install `streamlit-mic-recorder` for voice input support:")
@@ -376,22 +421,51 @@ def process_pdf(uploaded_file, components):
     """Process uploaded PDF file"""
     try:
         with st.spinner("🔄 Processing PDF..."):
-            if uploaded_file.size > Config.MAX_FILE_SIZE:
-                st.error(f"❌ File size exceeds {Config.MAX_FILE_SIZE // (1024*1024)}MB limit")
+            documents = components['documents']
+            # Beyond MAX_FILE_SIZE the document is spooled to disk and indexed a window of pages at a time
+            large = uploaded_file.size > Config.MAX_FILE_SIZE
+            if large and not (Config.ENABLE_LARGE_DOCUMENTS and Config.RETRIEVAL_MODE != "service"
+                              and uploaded_file.size <= Config.MAX_LARGE_FILE_SIZE):
+                limit = Config.MAX_LARGE_FILE_SIZE if Config.ENABLE_LARGE_DOCUMENTS else Config.MAX_FILE_SIZE
+                st.error(f"❌ File size exceeds {limit // (1024*1024)}MB limit")
                 return
 
             filename = uploaded_file.name
-            pdf_bytes = uploaded_file.getbuffer()
-            text_chunks = components['pdf_processor'].process_pdf_bytes(BytesIO(pdf_bytes))
-
-            if not text_chunks:
-                st.error("❌ No text content found in PDF. Please ensure the PDF contains extractable text.")
-                return
-
-            components['vector_store'].create_vector_store(text_chunks, filename)
+            text_chunks = None
+            if large:
+                # Streamlit's UploadedFile already holds the whole upload in RAM (up to
+                # server.maxUploadSize); spooling only keeps extraction and indexing from adding copies
+                with PDFBuffer.spool(uploaded_file) as pdf_file:
+                    doc_id = pdf_file.sha256()
+                    if documents.get(doc_id) is None:
+                        single_flight.do("index", doc_id, documents.build, doc_id, lambda store: index_large_document(
+                            components['pdf_processor'], store, pdf_file.as_path(), filename, doc_id))
+            else:
+                # Share the upload's own buffer with the parser and OCR instead of copying it
+                with PDFBuffer.from_upload(uploaded_file) as pdf_bytes:
+                    doc_id = pdf_bytes.sha256()
+                    # Another session, worker process or earlier run may already have indexed this document
+                    store = documents.get(doc_id)
+                    if store is not None:
+                        text_chunks = store.chunk_texts()
+                    else:
+                        # Sessions uploading the same document at the same time share one extraction
+                        text_chunks = single_flight.do("ingest", doc_id, components['pdf_processor'].process_pdf_bytes, pdf_bytes)
+                        if not text_chunks:
+                            st.error("❌ No text content found in PDF. Please ensure the PDF contains extractable text.")
+                            return
+                        single_flight.do("index", doc_id, documents.build, doc_id,
+                                         lambda store: store.create_vector_store(text_chunks, filename, doc_id))
+
+            if Config.ENABLE_DOCUMENT_SUMMARIES and text_chunks is not None:
+                # Summary and outline are prepared in the background for "summarize this" questions
+                # (not for large documents, whose full text is never held in memory)
+                components['summaries'].start(doc_id, text_chunks, components['qa_chain'].router)
             st.session_state.pdf_processed = True
             st.session_state.current_pdf = filename
+            st.session_state.current_doc_id = doc_id
             st.session_state.debug_info.append(f"PDF processed successfully: {filename}")
+            st.session_state.debug_info.append(f"Boilerplate stripping stats: {components['pdf_processor'].boilerplate_stats()}")
             
             # Add a message about successful PDF processing
             st.session_state.messages.append({
@@ -427,9 +501,25 @@ def process_user_input(user_input, components, chat_container):
                 
                 st.write(response)
                 st.session_state.messages.append({"role": "assistant", "content": response})
-    
-    st.rerun()
-
+    # Both turns are already on screen; no st.rerun() needed to re-render the whole history
+
+def answer_from_document_artifacts(question, components):
+    """Answer "summarize this" / "what are the sections" from the precomputed artifacts, if ready"""
+    intent = summary_intent(question)
+    doc_id = st.session_state.get('current_doc_id')
+    if not intent or not doc_id or not Config.ENABLE_DOCUMENT_SUMMARIES:
+        return None
+    artifacts = components['summaries'].get(doc_id, timeout=Config.SUMMARY_WAIT_SECONDS)
+    if not artifacts:
+        st.session_state.debug_info.append("Document summary not ready; using retrieval")
+        return None
+    st.session_state.debug_info.append(f"Answered {intent} question from precomputed artifacts")
+    if intent == "outline" and artifacts["outline"]:
+        return f"🌸 **Outline of '{st.session_state.current_pdf}':**\n\n{format_outline(artifacts['outline'])}"
+    return f"🌸 **Summary of '{st.session_state.current_pdf}':**\n\n{artifacts['summary']}"
+
+# Every embedding, search and LLM call made for one question shares REQUEST_DEADLINE_SECONDS
+@deadline()
 def generate_response(question, components):
     """Generate response to user question"""
     try:
@@ -437,7 +527,31 @@ def generate_response(question, components):
         st.session_state.debug_info.append(debug_msg)
         
         if st.session_state.pdf_processed:
-            relevant_docs = components['vector_store'].similarity_search(question, k=3)
+            # Only this session's own document is searched
+            vector_store = components['documents'].get(st.session_state.get('current_doc_id'))
+            if vector_store is None:
+                st.session_state.pdf_processed = False
+                st.session_state.last_uploaded_pdf = None
+                return ("🌸 **Your PDF is no longer loaded** (the server keeps a limited number open). "
+                        "Please upload it again and I'll pick up right where we left off! 😊")
+
+            # Pick up a generation republished by another worker (one small file read)
+            if vector_store.refresh():
+                st.session_state.debug_info.append("Switched to a newer published index")
+
+            summary_response = answer_from_document_artifacts(question, components)
+            if summary_response:
+                return summary_response
+
+            # Follow-ups like "and the second one?" are retrieved as standalone queries;
+            # the rewrite only drives retrieval, answers are written for the question as asked
+            retrieval_query = question
+            if Config.ENABLE_CONVERSATIONAL_MODE and Config.ENABLE_QUERY_REWRITE:
+                retrieval_query = components['query_rewriter'].rewrite(question, st.session_state.messages[:-1])
+                if retrieval_query != question:
+                    st.session_state.debug_info.append(f"Rewritten query: {retrieval_query}")
+
+            relevant_docs = vector_store.similarity_search(retrieval_query, k=3)
             debug_msg = f"Found {len(relevant_docs)} relevant documents"
             st.session_state.debug_info.append(debug_msg)
             
@@ -446,12 +560,35 @@ def generate_response(question, components):
                     score_msg = f"Doc {i+1}: Score={score:.4f}"
                     st.session_state.debug_info.append(score_msg)
             
-            is_relevant = components['vector_store'].is_relevant_to_pdf(question)
+            is_relevant = vector_store.is_relevant_to_pdf(retrieval_query)
             relevance_msg = f"Question relevance to PDF: {is_relevant}"
             st.session_state.debug_info.append(relevance_msg)
+
+            if is_relevant and retrieval_query != question and Config.TRACK_REWRITE_FALLBACKS:
+                if not vector_store.is_relevant_to_pdf(question):
+                    components['query_rewriter'].record_prevented_fallback()
+                stats = components['query_rewriter'].stats
+                st.session_state.debug_info.append(f"Query rewrite stats: {stats}")
             
+            st.session_state.debug_info.append(f"Coalescing stats: {single_flight.stats()}")
+            st.session_state.debug_info.append(f"Upstream stats: {upstream_stats()}")
+
             if is_relevant and relevant_docs:
+                # Direct lookups answered verbatim by one sentence skip the LLM entirely
+                extractive = vector_store.extractive_answer(question, relevant_docs)
+                if extractive:
+                    sentence, doc, score = extractive
+                    st.session_state.debug_info.append(f"Extractive answer (score {score:.4f})")
+                    page = doc.metadata.get("page")
+                    citation = f" (page {page})" if page else ""
+                    return f"🌸 **From your PDF '{st.session_state.current_pdf}'{citation}:**\n\n> {sentence}"
+
                 response = components['qa_chain'].answer_from_pdf(question, relevant_docs)
+                st.session_state.debug_info.append(f"Model tier stats: {components['qa_chain'].router.stats()}")
+                last_request = components['qa_chain'].router.last_request()
+                if last_request:
+                    st.session_state.debug_info.append(
+                        f"Prompt tokens: {last_request['prompt_tokens']} ({last_request['tier']} tier)")
                 return f"🌸 **From your PDF '{st.session_state.current_pdf}':**\n\n{response}"
             else:
                 if not relevant_docs:
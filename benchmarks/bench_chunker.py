@@ -0,0 +1,87 @@
+"""Compare the offset-based TextChunker with LangChain's RecursiveCharacterTextSplitter.
+
+Both split the same corpus (a text file, or synthetic pages shaped like PDFProcessor
+output) with the app's chunk settings and the same short-chunk filter:
+
+    python benchmarks/bench_chunker.py --megabytes 10
+    python benchmarks/bench_chunker.py --text extracted.txt
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from utils.chunker import TextChunker
+
+WORDS = ("pump valve pressure rated temperature maximum operating manual section install "
+         "warranty motor controller voltage current sensor calibration procedure safety "
+         "the a of to and in for with is are be on at by").split()
+
+
+def synthetic_text(megabytes: float, seed: int = 7) -> str:
+    """Pages of paragraphs and sentences with the page markers the PDF extractor writes"""
+    rng = random.Random(seed)
+    parts, size, page = [], 0, 1
+    while size < megabytes * 1024 * 1024:
+        paragraphs = []
+        for _ in range(rng.randint(3, 8)):
+            sentences = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 24))).capitalize() + "."
+                         for _ in range(rng.randint(2, 7))]
+            paragraphs.append(" ".join(sentences))
+        page_text = f"\n--- Page {page} ---\n" + "\n\n".join(paragraphs)
+        parts.append(page_text)
+        size += len(page_text)
+        page += 1
+    return "".join(parts)
+
+
+def run(name, split, text):
+    tracemalloc.start()
+    start = time.perf_counter()
+    chunks = split(text)
+    count = len(chunks)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<16} {elapsed * 1000:>10.1f} {count:>8} {peak / 1024 / 1024:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--megabytes", type=float, default=10)
+    parser.add_argument("--text", help="Use this text file instead of a synthetic corpus")
+    args = parser.parse_args()
+
+    if args.text:
+        with open(args.text, encoding="utf-8") as f:
+            text = f.read()
+    else:
+        text = synthetic_text(args.megabytes)
+    print(f"Corpus: {len(text) / 1024 / 1024:.1f} MB, chunk_size={Config.CHUNK_SIZE}, overlap={Config.CHUNK_OVERLAP}")
+    print(f"{'splitter':<16} {'ms':>10} {'chunks':>8} {'peak MB':>10}")
+
+    for boundary in ("sentence", "paragraph", "page"):
+        chunker = TextChunker(boundary=boundary)
+        run(f"fast/{boundary}", chunker.split, text)
+
+    try:
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+    except ImportError:
+        try:
+            from langchain_text_splitters import RecursiveCharacterTextSplitter
+        except ImportError:
+            print("recursive        (langchain not installed, skipped)")
+            return
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=Config.CHUNK_SIZE, chunk_overlap=Config.CHUNK_OVERLAP, length_function=len
+    )
+    run("recursive", lambda t: [c for c in splitter.split_text(t) if len(c.strip()) > Config.MIN_CHUNK_LENGTH], text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Measure cold import time of the app's modules and check heavy dependencies stay unloaded.
+
+Each module is imported in a fresh interpreter, the way a new container starts:
+
+    python benchmarks/bench_import_time.py --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = [
+    "config",
+    "utils.pdf_processor",
+    "utils.vector_store",
+    "utils.qa_chain",
+    "utils.web_search",
+    "utils.voice_search",
+]
+
+# Should only be imported when first used (or by the background warm-up)
+HEAVY = ["numpy", "PyPDF2", "langchain", "langchain_openai", "openai", "thefuzz",
+         "speech_recognition", "pdf2image", "pytesseract", "requests"]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(module: str, runs: int):
+    timings, loaded = [], []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY)],
+            cwd=ROOT, capture_output=True, text=True,
+        )
+        if out.returncode != 0:
+            return None, out.stderr.strip().splitlines()[-1]
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        timings.append(result["seconds"] * 1000)
+        loaded = result["loaded"]
+    return statistics.median(timings), loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--modules", nargs="+", default=MODULES)
+    args = parser.parse_args()
+
+    print(f"{'module':<24} {'median ms':>10}  heavy modules loaded at import")
+    for module in args.modules:
+        millis, loaded = measure(module, args.runs)
+        if millis is None:
+            print(f"{module:<24} {'error':>10}  {loaded}")
+        else:
+            print(f"{module:<24} {millis:>10.1f}  {', '.join(loaded) or '-'}")
+
+
+if __name__ == "__main__":
+    main()
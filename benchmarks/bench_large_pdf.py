@@ -0,0 +1,175 @@
+"""Peak memory and throughput of large-document ingestion on a synthetic PDF.
+
+Writes a text-only PDF of the requested size, then ingests it with fake embeddings
+(no API calls) in a fresh process per run, so peak RSS is measured independently:
+
+    python benchmarks/bench_large_pdf.py --pages 2000 8000
+    python benchmarks/bench_large_pdf.py --pages 2000 --modes large inmemory
+
+"large" is the page-window pipeline used above MAX_FILE_SIZE; "inmemory" is the regular
+extract-everything-then-embed path, for comparison. Peak RSS includes the pages of the
+memory-mapped index that were touched (shared page cache); peak anon is private memory.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Iterable, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from benchmarks.bench_chunker import WORDS
+
+
+def _pdf_string(line: str) -> bytes:
+    escaped = line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    return ("(" + escaped + ") Tj T*").encode("latin-1", "replace")
+
+
+def write_pdf(path: str, pages: Iterable[List[str]], page_count: int):
+    """Minimal uncompressed PDF with one text stream per page, written page by page"""
+    offsets = []
+    with open(path, "wb") as f:
+        def obj(number: int, body: bytes):
+            offsets.append((number, f.tell()))
+            f.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+
+        f.write(b"%PDF-1.4\n")
+        # 1: catalog, 2: page tree, 3: font; page i uses objects 4 + 2i (page) and 5 + 2i (content)
+        kids = b" ".join(b"%d 0 R" % (4 + 2 * i) for i in range(page_count))
+        obj(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        obj(2, b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % page_count)
+        obj(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+        for i, lines in enumerate(pages):
+            content = b"BT /F1 10 Tf 12 TL 50 780 Td " + b" ".join(_pdf_string(line) for line in lines) + b" ET"
+            obj(4 + 2 * i, b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+                           b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (5 + 2 * i))
+            obj(5 + 2 * i, b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+        xref = f.tell()
+        count = 3 + 2 * page_count + 1
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % count)
+        for _, offset in sorted(offsets):
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (count, xref))
+
+
+def random_sentences(rng: random.Random, count: int) -> List[str]:
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 14))).capitalize() + "." for _ in range(count)]
+
+
+def write_synthetic_pdf(path: str, pages: int, lines_per_page: int = 45, seed: int = 7):
+    rng = random.Random(seed)
+    write_pdf(path, (random_sentences(rng, lines_per_page) for _ in range(pages)), pages)
+
+
+class FakeEmbeddings:
+    """Deterministic unit-ish vectors; costs a little CPU but no network"""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    def embed_documents(self, texts):
+        import numpy as np
+        seed = int(hashlib.sha1("".join(t[:16] for t in texts[:4]).encode()).hexdigest()[:8], 16)
+        return np.random.default_rng(seed).standard_normal((len(texts), self.dim), dtype=np.float32).tolist()
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class AnonPeak(threading.Thread):
+    """Samples RssAnon (Linux): private memory, excluding the shared, memory-mapped
+    index pages that ru_maxrss also counts"""
+
+    def __init__(self, interval: float = 0.02):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak_kb = 0
+
+    def run(self):
+        while True:
+            try:
+                with open("/proc/self/status") as f:
+                    anon = next(int(line.split()[1]) for line in f if line.startswith("RssAnon"))
+            except (OSError, StopIteration):
+                return
+            self.peak_kb = max(self.peak_kb, anon)
+            time.sleep(self.interval)
+
+
+def child(args):
+    """One ingestion run; prints a JSON line with the measurements"""
+    from utils.pdf_buffer import PDFBuffer
+    from utils.pdf_processor import PDFProcessor
+    from utils.vector_store import VectorStore
+    from utils.large_document import index_large_document
+
+    Config.VECTOR_DB_DIR = tempfile.mkdtemp(prefix="bench-index-")
+    Config.ENABLE_EXTRACTIVE_ANSWERS = False
+    embeddings = FakeEmbeddings(args.dim)
+    processor, store = PDFProcessor(), VectorStore()
+    store.__dict__["embeddings"] = embeddings  # pre-fills the cached_property
+
+    sampler = AnonPeak()
+    sampler.start()
+    start = time.perf_counter()
+    with open(args.pdf, "rb") as upload:
+        if args.mode == "large":
+            with PDFBuffer.spool(upload) as pdf_file:
+                chunks = index_large_document(processor, store, pdf_file.as_path(), "bench.pdf", pdf_file.sha256())
+        else:
+            # Streamlit keeps regular uploads in memory
+            with PDFBuffer(upload.read()) as pdf_bytes:
+                text_chunks = processor.process_pdf_bytes(pdf_bytes)
+                store.create_vector_store(text_chunks, "bench.pdf", pdf_bytes.sha256())
+                chunks = len(text_chunks)
+    elapsed = time.perf_counter() - start
+    shutil.rmtree(Config.VECTOR_DB_DIR, ignore_errors=True)
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # kilobytes on Linux
+    print(json.dumps({"seconds": elapsed, "chunks": chunks, "peak_rss_mb": peak_kb / 1024,
+                      "peak_anon_mb": sampler.peak_kb / 1024}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1000, 4000])
+    parser.add_argument("--modes", nargs="+", default=["large"], choices=["large", "inmemory"])
+    parser.add_argument("--dim", type=int, default=1536, help="fake embedding size")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--pdf", help=argparse.SUPPRESS)
+    parser.add_argument("--mode", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args)
+        return
+
+    print(f"storage={Config.EMBEDDING_STORAGE} window={Config.LARGE_DOCUMENT_PAGE_WINDOW} pages "
+          f"batch={Config.LARGE_DOCUMENT_EMBED_BATCH} chunks dim={args.dim}")
+    print(f"{'mode':<10} {'pages':>7} {'PDF MB':>8} {'chunks':>8} {'seconds':>8} {'pages/s':>8} {'peak RSS MB':>12} {'peak anon MB':>13}")
+    for pages in args.pages:
+        fd, pdf = tempfile.mkstemp(suffix=".pdf")
+        os.close(fd)
+        try:
+            write_synthetic_pdf(pdf, pages)
+            size_mb = os.path.getsize(pdf) / 1024 / 1024
+            for mode in args.modes:
+                out = subprocess.run([sys.executable, __file__, "--child", "--pdf", pdf, "--mode", mode,
+                                      "--dim", str(args.dim)], capture_output=True, text=True, check=True).stdout
+                result = json.loads(out.strip().splitlines()[-1])
+                print(f"{mode:<10} {pages:>7} {size_mb:>8.1f} {result['chunks']:>8} {result['seconds']:>8.1f} "
+                      f"{pages / result['seconds']:>8.1f} {result['peak_rss_mb']:>12.0f} {result['peak_anon_mb']:>13.0f}")
+        finally:
+            os.remove(pdf)
+
+
+if __name__ == "__main__":
+    main()
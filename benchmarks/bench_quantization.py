@@ -0,0 +1,71 @@
+"""Compare embedding storage modes: memory per chunk, query latency and recall@k.
+
+Runs offline on synthetic clustered embeddings shaped like ada-002 output, so no API
+key is needed:
+
+    python benchmarks/bench_quantization.py --chunks 20000 --queries 200
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.quantization import QuantizedIndex, CODECS, normalize_rows
+
+
+def synthetic_embeddings(count: int, dim: int, clusters: int, rng) -> np.ndarray:
+    """Clustered unit vectors, roughly mimicking topic structure in a document"""
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=count)
+    noise = rng.standard_normal((count, dim)).astype(np.float32) * 0.6
+    return normalize_rows(centers[labels] + noise)
+
+
+def python_list_bytes(dim: int) -> int:
+    """Approximate footprint of one embedding stored as a list of Python floats"""
+    return sys.getsizeof([0.0] * dim) + dim * sys.getsizeof(1.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--modes", nargs="+", default=list(CODECS))
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    corpus = synthetic_embeddings(args.chunks, args.dim, clusters=64, rng=rng)
+    queries = normalize_rows(corpus[rng.integers(0, args.chunks, size=args.queries)]
+                             + rng.standard_normal((args.queries, args.dim)).astype(np.float32) * 0.02)
+
+    truth = [set(np.argsort(-(corpus @ q))[:args.k]) for q in queries]
+
+    print(f"{args.chunks} chunks x {args.dim} dims, {args.queries} queries, k={args.k}")
+    print(f"python float lists: {python_list_bytes(args.dim):>8} bytes/chunk")
+    print(f"{'mode':<8} {'bytes/chunk':>12} {'build s':>9} {'p50 ms':>8} {'p95 ms':>8} {'recall@k':>9}")
+    for mode in args.modes:
+        index = QuantizedIndex(mode=mode)
+        start = time.perf_counter()
+        index.build(corpus)
+        build_seconds = time.perf_counter() - start
+
+        latencies, hits = [], 0
+        for q, expected in zip(queries, truth):
+            start = time.perf_counter()
+            rows, _ = index.search(q, args.k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            hits += len(expected.intersection(rows.tolist()))
+
+        print(f"{mode:<8} {index.memory_bytes() / args.chunks:>12.0f} {build_seconds:>9.2f} "
+              f"{np.percentile(latencies, 50):>8.2f} {np.percentile(latencies, 95):>8.2f} "
+              f"{hits / (args.k * len(queries)):>9.3f}")
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
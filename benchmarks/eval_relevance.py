@@ -0,0 +1,50 @@
+"""Offline evaluation of the PDF-vs-web routing decision on a labelled question set.
+
+The questions file is JSON Lines with one object per line:
+    {"question": "What is the maximum operating temperature?", "relevant": true}
+
+Needs OPENAI_API_KEY (the PDF and questions are embedded):
+
+    python benchmarks/eval_relevance.py manual.pdf questions.jsonl --calibration synthetic
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from utils.pdf_buffer import PDFBuffer
+from utils.pdf_processor import PDFProcessor
+from utils.relevance import evaluate_routing
+from utils.vector_store import VectorStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pdf")
+    parser.add_argument("questions")
+    parser.add_argument("--calibration", choices=["synthetic", "chunks", "off"], default=Config.RELEVANCE_CALIBRATION)
+    args = parser.parse_args()
+
+    Config.RELEVANCE_CALIBRATION = args.calibration
+    with open(args.questions, encoding="utf-8") as f:
+        labelled = [(row["question"], bool(row["relevant"])) for row in map(json.loads, filter(str.strip, f))]
+
+    store = VectorStore()
+    with PDFBuffer.from_path(args.pdf) as pdf:
+        chunks = PDFProcessor().process_pdf_bytes(pdf)
+    store.create_vector_store(chunks, os.path.basename(args.pdf))
+
+    report = evaluate_routing(store, labelled)
+    positives = sum(1 for _, relevant in labelled if relevant)
+    print(f"\n{len(labelled)} questions ({positives} about the PDF), calibration={args.calibration}")
+    print(f"{'threshold':<12} {'distance':>9} {'precision':>10} {'recall':>8} {'f1':>6} {'accuracy':>9}")
+    for name, row in report.items():
+        print(f"{name:<12} {row['threshold']:>9.4f} {row['precision']:>10.3f} {row['recall']:>8.3f} "
+              f"{row['f1']:>6.3f} {row['accuracy']:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
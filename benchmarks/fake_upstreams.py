@@ -0,0 +1,269 @@
+"""Local stand-ins for the OpenAI embeddings/chat APIs and SerpAPI.
+
+One threaded HTTP server answers:
+    POST /v1/embeddings        deterministic hashed bag-of-words vectors (float or base64)
+    POST /v1/chat/completions  the context sentence that best overlaps the question
+    GET  /search               a few canned organic results
+    GET  /stats                request and injected-error counts per route
+
+Each route has its own latency (mean seconds, jittered +/-50%), error rate (HTTP 500),
+slow rate (requests taking --slow-factor times longer, a latency tail for hedging to trim)
+and outage window (every request fails with HTTP 503, to trip circuit breakers).
+Run standalone and point the app at it:
+
+    python benchmarks/fake_upstreams.py --port 8900 --latency chat=0.5 --error-rate 0.02 --outage chat=60:30
+    OPENAI_BASE_URL=http://127.0.0.1:8900/v1 SERPAPI_URL=http://127.0.0.1:8900/search \\
+        OPENAI_API_KEY=sk-fake SERPAPI_KEY=fake streamlit run app.py
+"""
+import argparse
+import base64
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+ROUTES = ("embeddings", "chat", "search")
+EMBEDDING_DIM = 1536
+WORD = re.compile(r"[a-z0-9][a-z0-9-]*")
+STOP_WORDS = set("the a an of to and in for with is are be on at by what which who how this that it its".split())
+
+
+def embed_text(text, dim: int = EMBEDDING_DIM) -> np.ndarray:
+    """Signed feature hashing of distinct words (or token ids), so shared words mean similar vectors"""
+    tokens = {str(t) for t in text} if isinstance(text, list) else set(WORD.findall(text.lower()))
+    vector = np.zeros(dim, dtype=np.float32)
+    for token in tokens - STOP_WORDS:
+        digest = hashlib.blake2b(token.encode(), digest_size=8).digest()
+        vector[int.from_bytes(digest[:4], "little") % dim] += 1.0 if digest[4] & 1 else -1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def best_sentence(context: str, question: str) -> str:
+    words = set(WORD.findall(question.lower())) - STOP_WORDS
+    sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+|\n+", context) if s.strip()]
+    if not sentences:
+        return "I could not find that in the provided context."
+    return max(sentences, key=lambda s: len(words & set(WORD.findall(s.lower()))))
+
+
+class FakeUpstreams:
+    """The fake API server; start() runs it on a daemon thread"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: Optional[Dict[str, float]] = None,
+                 error_rate: Optional[Dict[str, float]] = None, slow_rate: Optional[Dict[str, float]] = None,
+                 slow_factor: float = 10.0, outages: Optional[Dict[str, Tuple[float, float]]] = None, seed: int = 0):
+        self.latency = {route: 0.0 for route in ROUTES}
+        self.latency.update(latency or {})
+        self.error_rate = {route: 0.0 for route in ROUTES}
+        self.error_rate.update(error_rate or {})
+        self.slow_rate = {route: 0.0 for route in ROUTES}
+        self.slow_rate.update(slow_rate or {})
+        self.slow_factor = slow_factor
+        # route -> (start, duration) in seconds after the server was created
+        self.outages = dict(outages or {})
+        self.started = time.monotonic()
+        self.counts = {route: {"requests": 0, "errors": 0, "slow": 0} for route in ROUTES}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeUpstreams":
+        threading.Thread(target=self.server.serve_forever, name="fake-upstreams", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {route: dict(counts) for route, counts in self.counts.items()}
+
+    def in_outage(self, route: str) -> bool:
+        if route not in self.outages:
+            return False
+        start, duration = self.outages[route]
+        return start <= time.monotonic() - self.started < start + duration
+
+    def _admit(self, route: str) -> int:
+        """Count the request, sleep its latency and return the HTTP status to answer with"""
+        with self._lock:
+            self.counts[route]["requests"] += 1
+            if self.in_outage(route):
+                self.counts[route]["errors"] += 1
+                return 503
+            delay = self.latency[route] * (0.5 + self._rng.random())
+            if self._rng.random() < self.slow_rate[route]:
+                self.counts[route]["slow"] += 1
+                delay *= self.slow_factor
+            fail = self._rng.random() < self.error_rate[route]
+            if fail:
+                self.counts[route]["errors"] += 1
+        if delay:
+            time.sleep(delay)
+        return 500 if fail else 200
+
+    def embeddings(self, body: Dict) -> Dict:
+        inputs = body["input"]
+        if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+            inputs = [inputs]
+        data = []
+        for i, item in enumerate(inputs):
+            vector = embed_text(item)
+            if body.get("encoding_format") == "base64":
+                embedding = base64.b64encode(vector.astype("<f4").tobytes()).decode()
+            else:
+                embedding = vector.tolist()
+            data.append({"object": "embedding", "index": i, "embedding": embedding})
+        tokens = sum(len(item) if isinstance(item, list) else len(item) // 4 for item in inputs)
+        return {"object": "list", "data": data, "model": body.get("model", "fake-embedding"),
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens}}
+
+    def chat(self, body: Dict) -> Dict:
+        messages: List[Dict] = body.get("messages", [])
+        text = "\n".join(m.get("content") or "" for m in messages if isinstance(m.get("content"), str))
+        context = re.search(r"Context from PDF:\n(.*?)\n\nQuestion: (.*)", text, re.DOTALL)
+        if context:
+            content = best_sentence(context.group(1), context.group(2))
+        elif "Web search results" in text:
+            content = "According to the web results, this is a general answer. 🌐"
+        else:
+            content = "Hello! I'm a fake model answering from the load-test server. 😊"
+        prompt_tokens = max(1, len(text) // 4)
+        completion_tokens = max(1, len(content) // 4)
+        return {
+            "id": f"chatcmpl-fake-{time.time_ns()}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake-chat"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        }
+
+    @staticmethod
+    def search(query: str) -> Dict:
+        return {"organic_results": [
+            {"title": f"Result {i} for {query[:40]}", "snippet": f"A snippet about {query[:60]}.",
+             "link": f"https://example.com/{i}"}
+            for i in range(1, 4)
+        ]}
+
+    def _handler(self):
+        upstreams = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, payload: Dict):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _serve(self, route: str, respond):
+                status = upstreams._admit(route)
+                if status != 200:
+                    self._send(status, {"error": {"message": "Injected failure", "type": "server_error"}})
+                    return
+                self._send(200, respond())
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path == "/stats":
+                    self._send(200, upstreams.stats())
+                elif url.path == "/search":
+                    query = parse_qs(url.query).get("q", [""])[0]
+                    self._serve("search", lambda: upstreams.search(query))
+                else:
+                    self._send(404, {"error": {"message": f"Unknown path {url.path}"}})
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+                path = urlparse(self.path).path
+                if path.endswith("/embeddings"):
+                    self._serve("embeddings", lambda: upstreams.embeddings(body))
+                elif path.endswith("/chat/completions"):
+                    self._serve("chat", lambda: upstreams.chat(body))
+                else:
+                    self._send(404, {"error": {"message": f"Unknown path {path}"}})
+
+        return Handler
+
+
+def parse_route_values(values: List[str], default: float = 0.0) -> Dict[str, float]:
+    """["0.1"] sets every route; ["chat=0.5", "search=0.2"] sets single routes"""
+    result = {}
+    for value in values or []:
+        if "=" in value:
+            route, number = value.split("=", 1)
+            if route not in ROUTES:
+                raise ValueError(f"Unknown route '{route}'. Choose one of: {', '.join(ROUTES)}")
+            result[route] = float(number)
+        else:
+            result.update({route: float(value) for route in ROUTES})
+    return {route: result.get(route, default) for route in ROUTES}
+
+
+def parse_outages(values: List[str]) -> Dict[str, Tuple[float, float]]:
+    """["chat=60:30"] fails every chat request from 60s to 90s after start"""
+    outages = {}
+    for value in values or []:
+        route, window = value.split("=", 1)
+        if route not in ROUTES:
+            raise ValueError(f"Unknown route '{route}'. Choose one of: {', '.join(ROUTES)}")
+        start, duration = window.split(":", 1)
+        outages[route] = (float(start), float(duration))
+    return outages
+
+
+def add_fault_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--latency", nargs="*", help="seconds, for all routes or route=seconds")
+    parser.add_argument("--error-rate", nargs="*", help="0-1, for all routes or route=rate")
+    parser.add_argument("--slow-rate", nargs="*", help="share of requests that are --slow-factor times slower")
+    parser.add_argument("--slow-factor", type=float, default=10.0)
+    parser.add_argument("--outage", nargs="*", help="route=start:duration, seconds after start")
+
+
+def from_arguments(args, host: str = "127.0.0.1", port: int = 0, default_latency: float = 0.0) -> FakeUpstreams:
+    return FakeUpstreams(host, port, latency=parse_route_values(args.latency, default_latency),
+                         error_rate=parse_route_values(args.error_rate), slow_rate=parse_route_values(args.slow_rate),
+                         slow_factor=args.slow_factor, outages=parse_outages(args.outage),
+                         seed=getattr(args, "seed", 0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+    upstreams = from_arguments(args, args.host, args.port)
+    print(f"Fake upstreams on {upstreams.url} (latency {upstreams.latency}, error rate {upstreams.error_rate})")
+    try:
+        upstreams.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""Simulated concurrent sessions against the app's own upload and question handlers.
+
+Starts benchmarks/fake_upstreams.py in-process (embeddings, chat and search with
+configurable latency and error rates), points Config at it and drives N sessions through
+app.process_pdf and app.generate_response, each with its own session state:
+
+    python benchmarks/load_test.py --sessions 16 --questions 6
+    python benchmarks/load_test.py --sessions 32 --latency embeddings=0.05 chat=0.4 --error-rate 0.02
+    python benchmarks/load_test.py --sessions 16 --slow-rate 0.05 --outage chat=5:10 --deadline 5
+
+Every session uploads its own PDF containing a unique access code, then asks for that
+code between filler, greeting and off-topic questions. An answer quoting another
+session's code means indexes were clobbered across sessions; one quoting no code is a
+miss. Reports throughput, p50/p95/p99 latencies, errors, upstream request counts and the
+app's upstream layer counters (retries, hedges, circuit breaker rejections, deadlines).
+Needs the app's requirements installed (streamlit is imported but only its module).
+"""
+import argparse
+import io
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import nullcontext
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from benchmarks.bench_large_pdf import random_sentences, write_pdf
+from benchmarks.fake_upstreams import FakeUpstreams, add_fault_arguments, from_arguments
+
+CODE = re.compile(r"\b[A-Z]{3}-\d{4}\b")
+FILLER_QUESTIONS = [
+    "What does the report say about the quarterly review?",
+    "Summarize the section on maintenance schedules.",
+]
+OFF_TOPIC_QUESTIONS = ["What is the tallest mountain in Europe?", "How do tides work?"]
+GREETINGS = ["Hello!", "Thank you"]
+
+
+class SessionState(dict):
+    """Attribute access over a dict, like st.session_state"""
+
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __setattr__(self, name, value):
+        self[name] = value
+
+
+class StreamlitShim:
+    """Stands in for the `st` module inside app.py: session state is per thread (one
+    thread per simulated session) and st.error/st.warning are recorded, not rendered."""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    @property
+    def session_state(self) -> SessionState:
+        return self._local.state
+
+    def begin_session(self):
+        self._local.state = SessionState()
+        self._local.alerts = []
+
+    @property
+    def alerts(self) -> List[str]:
+        return self._local.alerts
+
+    def spinner(self, *args, **kwargs):
+        return nullcontext()
+
+    def error(self, message, *args, **kwargs):
+        self._local.alerts.append(f"error: {message}")
+
+    def warning(self, message, *args, **kwargs):
+        self._local.alerts.append(f"warning: {message}")
+
+    def __getattr__(self, name):
+        # Rendering calls (st.write, st.info, ...) are no-ops
+        return lambda *args, **kwargs: None
+
+
+class Upload(io.BytesIO):
+    """The parts of Streamlit's UploadedFile the app uses"""
+
+    def __init__(self, data: bytes, name: str):
+        super().__init__(data)
+        self.name = name
+        self.size = len(data)
+
+
+def make_document(session: int, pages: int, seed: int):
+    """(PDF bytes, project name, access code) for one session"""
+    rng = random.Random(seed * 1000 + session)
+    project = f"Project{session:03d}"
+    code = f"{''.join(rng.choice('ABCDEFGHJKLMNPQRSTUVWXYZ') for _ in range(3))}-{session:04d}"
+    needle_page = rng.randrange(pages)
+    page_lines = []
+    for page in range(pages):
+        lines = random_sentences(rng, 30)
+        if page == needle_page:
+            lines.insert(rng.randrange(len(lines)), f"The access code for {project} is {code}.")
+        page_lines.append(lines)
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    os.close(fd)
+    try:
+        write_pdf(path, page_lines, pages)
+        with open(path, "rb") as f:
+            return f.read(), project, code
+    finally:
+        os.remove(path)
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+class LoadTest:
+    def __init__(self, app, st: StreamlitShim, components: Dict, args):
+        self.app = app
+        self.st = st
+        self.components = components
+        self.args = args
+        self.codes: Dict[str, int] = {}
+        self.latencies = defaultdict(list)
+        self.outcomes = Counter()
+        self.issues: List[str] = []
+        self._lock = threading.Lock()
+
+    def _record(self, kind: str, seconds: float, outcome: str = None, issue: str = None):
+        with self._lock:
+            self.latencies[kind].append(seconds)
+            if outcome:
+                self.outcomes[outcome] += 1
+            if issue and len(self.issues) < 20:
+                self.issues.append(issue)
+
+    def _ask(self, question: str):
+        """Mirror process_user_input without the chat widgets"""
+        self.st.session_state.messages.append({"role": "user", "content": question})
+        if self.app.is_conversational_query(question):
+            response = self.app.generate_conversational_response(question)
+        else:
+            response = self.app.generate_response(question, self.components)
+        self.st.session_state.messages.append({"role": "assistant", "content": response})
+        return response
+
+    def run_session(self, session: int, document):
+        data, project, code = document
+        self.st.begin_session()
+        self.app.init_session_state()
+        rng = random.Random(session)
+        time.sleep(rng.random() * self.args.ramp)
+
+        start = time.perf_counter()
+        self.app.process_pdf(Upload(data, f"{project.lower()}.pdf"), self.components)
+        ok = self.st.session_state.pdf_processed and not self.st.alerts
+        self._record("upload", time.perf_counter() - start, "upload ok" if ok else "upload failed",
+                     None if ok else f"session {session}: upload failed {self.st.alerts}")
+        if not ok:
+            return
+
+        for turn in range(self.args.questions):
+            if turn % 2 == 0:
+                kind, question = "lookup", f"What is the access code for {project}?"
+            else:
+                kind, question = rng.choice([
+                    ("filler", rng.choice(FILLER_QUESTIONS)),
+                    ("greeting", rng.choice(GREETINGS)),
+                    ("off-topic", rng.choice(OFF_TOPIC_QUESTIONS)),
+                ])
+            start = time.perf_counter()
+            response = self._ask(question)
+            elapsed = time.perf_counter() - start
+            if "I encountered an error" in response:
+                self._record(kind, elapsed, "error", f"session {session}: {response[:160]!r}")
+            elif "can't reach the language model" in response:
+                # Failed fast (circuit open or deadline) with the fallback answer
+                self._record(kind, elapsed, "degraded")
+            elif kind != "lookup":
+                self._record(kind, elapsed, "answered")
+            else:
+                quoted = set(CODE.findall(response))
+                if code in quoted:
+                    self._record(kind, elapsed, "correct")
+                elif quoted:
+                    owners = sorted(self.codes.get(c, -1) for c in quoted)
+                    self._record(kind, elapsed, "clobbered",
+                                 f"session {session}: answered with the code of session(s) {owners}")
+                else:
+                    self._record(kind, elapsed, "missed", f"session {session}: {response[:160]!r}")
+            time.sleep(rng.random() * self.args.think)
+
+    def run(self) -> float:
+        documents = [make_document(i, self.args.pages, self.args.seed) for i in range(self.args.sessions)]
+        self.codes = {code: i for i, (_, _, code) in enumerate(documents)}
+        threads = [threading.Thread(target=self.run_session, args=(i, doc), name=f"session-{i}")
+                   for i, doc in enumerate(documents)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - start
+
+    def report(self, elapsed: float, upstreams: FakeUpstreams):
+        requests = sum(len(v) for v in self.latencies.values())
+        print(f"\n{self.args.sessions} sessions, {requests} requests in {elapsed:.1f}s "
+              f"({requests / elapsed:.1f} req/s, {self.args.sessions / elapsed:.2f} sessions/s)")
+        print(f"{'kind':<10} {'count':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+        for kind, values in sorted(self.latencies.items()):
+            print(f"{kind:<10} {len(values):>6} {percentile(values, 50) * 1000:>8.0f} {percentile(values, 95) * 1000:>8.0f} "
+                  f"{percentile(values, 99) * 1000:>8.0f} {max(values) * 1000:>8.0f}")
+        print("outcomes: " + ", ".join(f"{name}={count}" for name, count in sorted(self.outcomes.items())))
+        print("fake upstreams: " + ", ".join(f"{route} {c['requests']} requests / {c['errors']} errors / {c['slow']} slow"
+                                             for route, c in upstreams.stats().items()))
+        print("upstream layer:")
+        for name, counts in sorted(self.app.upstream_stats().items()):
+            print(f"  {name:<12} " + ", ".join(f"{key}={value}" for key, value in counts.items()))
+        if self.issues:
+            print("first issues:")
+            for issue in self.issues:
+                print(f"  {issue}")
+        if self.outcomes["clobbered"]:
+            print("CROSS-SESSION CLOBBERING: a session was answered from another session's document")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--questions", type=int, default=6, help="questions per session")
+    parser.add_argument("--pages", type=int, default=4, help="pages per uploaded PDF")
+    parser.add_argument("--ramp", type=float, default=1.0, help="seconds over which sessions start")
+    parser.add_argument("--think", type=float, default=0.2, help="max pause between questions, seconds")
+    parser.add_argument("--deadline", type=float, help="REQUEST_DEADLINE_SECONDS for each question")
+    add_fault_arguments(parser)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    upstreams = from_arguments(args, default_latency=0.02).start()
+    if args.deadline:
+        Config.REQUEST_DEADLINE_SECONDS = args.deadline
+    Config.OPENAI_BASE_URL = f"{upstreams.url}/v1"
+    Config.OPENAI_API_KEY = "sk-load-test"
+    Config.SERPAPI_URL = f"{upstreams.url}/search"
+    Config.SERPAPI_KEY = "load-test"
+    Config.VECTOR_DB_DIR = tempfile.mkdtemp(prefix="load-test-index-")
+    try:
+        import app  # after Config points at the fake upstreams
+        st = StreamlitShim()
+        app.st = st
+        components = app.initialize_components()
+        test = LoadTest(app, st, components, args)
+        print(f"Fake upstreams on {upstreams.url}: latency {upstreams.latency}, error rate {upstreams.error_rate}")
+        test.report(test.run(), upstreams)
+    finally:
+        upstreams.stop()
+        shutil.rmtree(Config.VECTOR_DB_DIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,30 +6,142 @@ load_dotenv()
 class Config:
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
     SERPAPI_KEY = os.getenv("SERPAPI_KEY")  # Optional
+    # Upstream endpoints; point them at benchmarks/fake_upstreams.py for load tests
+    OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")  # None = api.openai.com
+    SERPAPI_URL = os.getenv("SERPAPI_URL", "https://serpapi.com/search")
+    # Upstream calls (embeddings, chat, web search): one deadline per question, circuit breakers, hedging
+    REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "30"))
+    UPSTREAM_TIMEOUT = 60  # Seconds for one HTTP request (less when a deadline is closer)
+    UPSTREAM_RETRIES = 1  # Immediate retries of a failed call while the deadline allows
+    BREAKER_FAILURE_THRESHOLD = 5  # Consecutive failures that open an upstream's circuit
+    BREAKER_RESET_SECONDS = 20  # An open circuit lets one trial call through after this
+    ENABLE_HEDGING = os.getenv("ENABLE_HEDGING", "true").lower() == "true"
+    HEDGE_MIN_SAMPLES = 20  # Successful calls observed before an upstream's calls are hedged
+    HEDGE_LATENCY_WINDOW = 200  # Recent latencies the p95 hedge delay is taken from
+    HEDGE_MIN_DELAY = 0.05  # Seconds; hedges never fire earlier than this, and a call timing out
+                            # with less budget than this is not counted against the circuit breaker
+    UPSTREAM_WORKERS = 32  # Threads running calls that have a deadline or may be hedged
     
     # Vector store settings
     CHUNK_SIZE = 1000
     CHUNK_OVERLAP = 200
+    CHUNKER = "fast"  # "fast" (offset-based TextChunker) or "recursive" (LangChain splitter)
+    CHUNK_BOUNDARY = "sentence"  # "sentence", "paragraph" or "page" (never cross a page)
+    CHUNK_LENGTH_UNIT = "chars"  # "chars" or "tokens"; CHUNK_SIZE/CHUNK_OVERLAP use this unit
+    MIN_CHUNK_LENGTH = 50  # Chunks at or below this many characters are dropped
+    # Running headers, footers and page numbers are stripped before chunking
+    STRIP_BOILERPLATE = os.getenv("STRIP_BOILERPLATE", "true").lower() == "true"
+    BOILERPLATE_EDGE_LINES = 3  # First and last non-empty lines of each page that are counted
+    BOILERPLATE_MIN_SHARE = 0.5  # Share of pages a line must start or end to be boilerplate
+    BOILERPLATE_MIN_PAGES = 4  # Shorter documents are left as extracted
+
+    # Post-retrieval: maximal marginal relevance over the top candidates, then optional neighbours
+    ENABLE_MMR = os.getenv("ENABLE_MMR", "true").lower() == "true"
+    MMR_FETCH_K = 12  # Candidates re-ranked for diversity when more than one chunk is requested
+    MMR_LAMBDA = 0.6  # 1.0 ranks by relevance only, 0.0 by diversity only
+    NEIGHBOR_WINDOW = int(os.getenv("NEIGHBOR_WINDOW", "0"))  # Adjacent chunks merged into each hit, per side
     
     # OpenAI settings
     EMBEDDING_MODEL = "text-embedding-ada-002"
-    CHAT_MODEL = "gpt-3.5-turbo"
+    CHAT_MODEL = os.getenv("CHAT_MODEL", "gpt-3.5-turbo")
+    # Model routing: easy turns (small talk, confident single-chunk lookups) use the fast tier,
+    # which must be the cheaper model. "stub" selects a local deterministic model for testing.
+    ENABLE_MODEL_ROUTING = os.getenv("ENABLE_MODEL_ROUTING", "true").lower() == "true"
+    FAST_CHAT_MODEL = os.getenv("FAST_CHAT_MODEL", "gpt-4o-mini")
+    ROUTER_FAST_MIN_CONFIDENCE = 0.85  # Best chunk cosine similarity needed for the fast tier
+    ROUTER_FAST_MAX_CONTEXT_CHARS = 4000
+    # Retry unsure fast-tier PDF answers on the full model. Only useful when CHAT_MODEL is the
+    # stronger model; with the defaults the fast tier (gpt-4o-mini) is both cheaper and stronger
+    # than gpt-3.5-turbo, so escalation is off unless enabled
+    ROUTER_ESCALATE = os.getenv("ROUTER_ESCALATE", "false").lower() == "true"
     
     # File paths
     UPLOAD_DIR = "data/uploads"
     VECTOR_DB_DIR = "data/vector_db"
     
     # App settings
-    MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+    MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB; larger uploads use large-document mode
+    # Large-document mode: the upload is spooled to disk and indexed a window of pages at a time
+    ENABLE_LARGE_DOCUMENTS = os.getenv("ENABLE_LARGE_DOCUMENTS", "true").lower() == "true"
+    MAX_LARGE_FILE_SIZE = 500 * 1024 * 1024  # Also raise server.maxUploadSize in .streamlit/config.toml
+    LARGE_DOCUMENT_PAGE_WINDOW = 32  # Pages extracted and chunked together
+    LARGE_DOCUMENT_EMBED_BATCH = 256  # Chunks per embedding request
+    PQ_TRAINING_SAMPLE = 4096  # Vectors used to fit the "pq" codebooks incrementally
     # FIXED: For ChromaDB distance scores, lower threshold = more strict
     # ChromaDB returns distance scores where 0 = perfect match, higher = less similar
     SIMILARITY_THRESHOLD = 0.5  # Reduced from 0.7 to be more lenient
+    # Per-document calibration replaces SIMILARITY_THRESHOLD once an index is built:
+    # "synthetic" (pseudo-queries vs off-topic probes, one small embedding call), "chunks" (no API calls) or "off"
+    RELEVANCE_CALIBRATION = os.getenv("RELEVANCE_CALIBRATION", "synthetic")
+    MIN_CALIBRATION_CHUNKS = 8  # Smaller documents keep the fixed threshold
+    CALIBRATION_SAMPLE_SIZE = 256  # Chunks sampled for chunk-to-chunk statistics
+    CALIBRATION_QUERIES = 24  # Pseudo-queries embedded in "synthetic" mode
+    CALIBRATION_NEGATIVE_QUANTILE = 0.9  # Upper quantile of off-topic scores used for the cutoff
+    QUERY_EMBEDDING_CACHE_SIZE = 256
+
+    # Extractive answers: return the best matching sentence (with page) for confident lookups, skipping the LLM
+    ENABLE_EXTRACTIVE_ANSWERS = os.getenv("ENABLE_EXTRACTIVE_ANSWERS", "true").lower() == "true"
+    # Query-to-sentence cosine similarity needed to skip the LLM. With ada-002, loosely related
+    # sentences already score 0.75-0.9, so the score alone is not enough: the sentence must
+    # also contain EXTRACTIVE_MIN_TERM_COVERAGE of the question's key terms
+    EXTRACTIVE_MIN_SCORE = 0.9
+    EXTRACTIVE_MIN_TERM_COVERAGE = 1.0
+    EXTRACTIVE_MAX_SENTENCES_PER_CHUNK = 40
+    EXTRACTIVE_MAX_SENTENCES = 20000  # Larger documents skip sentence embedding
+
+    # Document summary and outline, built in the background after ingest
+    ENABLE_DOCUMENT_SUMMARIES = os.getenv("ENABLE_DOCUMENT_SUMMARIES", "true").lower() == "true"
+    SUMMARY_BATCH_CHARS = 12000  # Text per map-step LLM call
+    SUMMARY_MAX_MAP_CALLS = 12  # Longer documents are sampled evenly
+    SUMMARY_WAIT_SECONDS = 2  # How long a summary question waits for a job still running
+    SUMMARY_CACHE_DOCUMENTS = 32
+    OUTLINE_MAX_ENTRIES = 200
+
+    # Embedding storage: "float32", "float16", "int8" or "pq" (product quantization)
+    EMBEDDING_STORAGE = os.getenv("EMBEDDING_STORAGE", "int8")
+    RESCORE_MULTIPLIER = 4  # Candidates rescored at full precision = k * this
+    PQ_SUBSPACES = 96  # Bytes per chunk in "pq" mode; must not exceed the embedding size
+
+    # Persisted indexes: memory-mapped under VECTOR_DB_DIR/<doc_id>/ and shared by every worker process
+    PERSIST_INDEX = os.getenv("PERSIST_INDEX", "true").lower() == "true"
+    INDEX_GENERATIONS_KEPT = 2  # Older generations are deleted after a publish
+    # Whole documents (index, chunk text, summary) are deleted once unused for this long,
+    # and the least recently used beyond INDEX_MAX_DOCUMENTS; 0 disables either limit
+    INDEX_RETENTION_HOURS = float(os.getenv("INDEX_RETENTION_HOURS", "24"))
+    INDEX_MAX_DOCUMENTS = int(os.getenv("INDEX_MAX_DOCUMENTS", "50"))
+    OPEN_DOCUMENTS = 8  # Document indexes each app process keeps open for its sessions
+
+    # Retrieval: "inprocess" searches inside the Streamlit process, "service" calls retrieval_service.py
+    RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "inprocess")
+    RETRIEVAL_SERVICE_URL = os.getenv("RETRIEVAL_SERVICE_URL", "http://127.0.0.1:8001")
+    RETRIEVAL_TIMEOUT = 60  # Seconds; ingest embeds the whole document
+    RETRIEVAL_BATCH_WINDOW_MS = 5  # Concurrent searches arriving within this window share one scan
+    RETRIEVAL_MAX_BATCH = 64
+    RETRIEVAL_SERVICE_DOCUMENTS = 8  # Indexes the service keeps open at once
+
+    # Startup: build clients in the background; optionally send one tiny request to open connections
+    WARMUP_PING = os.getenv("WARMUP_PING", "false").lower() == "true"
+
+    # Voice transcription: "google" (Web Speech API), "whisper" (OpenAI API) or "vosk" (offline)
+    VOICE_BACKEND = os.getenv("VOICE_BACKEND", "google")
+    VOSK_MODEL_PATH = os.getenv("VOSK_MODEL_PATH", "models/vosk-model-small-en-us-0.15")
+    VOICE_CHUNK_SECONDS = 15  # Chunk length for streaming transcription of long recordings
     
     # Chatbot personality settings
-BOT_NAME = "Lily"
-BOT_PERSONALITY = "friendly, helpful, and professional PDF Q&A assistant"
-GREETING_MESSAGE = "Hello! I'm Lily, your friendly PDF Q&A assistant! How can I help you today?"
+    BOT_NAME = "Lily"
+    BOT_PERSONALITY = "friendly, helpful, and professional PDF Q&A assistant"
+    GREETING_MESSAGE = "Hello! I'm Lily, your friendly PDF Q&A assistant! How can I help you today?"
+
+    # Conversation settings
+    ENABLE_CONVERSATIONAL_MODE = True
+    CONVERSATION_CONTEXT_LENGTH = 5  # Number of previous messages to remember
+    ENABLE_QUERY_REWRITE = True  # Turn follow-ups into standalone retrieval queries
+    QUERY_REWRITE_USE_LLM = True  # Ask the LLM when the local heuristic can't resolve a reference
+    QUERY_REWRITE_CACHE_SIZE = 512
+    TRACK_REWRITE_FALLBACKS = False  # Metrics only: also check the raw question (one more embedding + search per rewrite)
 
-# Conversation settings  
-ENABLE_CONVERSATIONAL_MODE = True
-CONVERSATION_CONTEXT_LENGTH = 5  # Number of previous messages to remember
\ No newline at end of file
+    # Chat history limits (per session)
+    CHAT_HISTORY_VISIBLE = 40  # Newest messages rendered in full on every rerun
+    CHAT_HISTORY_ARCHIVE = 200  # Older messages kept as short previews, shown on request
+    CHAT_ARCHIVE_PREVIEW_CHARS = 300
+    DEBUG_LOG_SIZE = 200  # Ring buffer size for debug messages
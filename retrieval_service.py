@@ -0,0 +1,155 @@
+"""Standalone retrieval service over the persisted document indexes.
+
+Run with:  uvicorn retrieval_service:app --port 8001 --workers 2
+and set RETRIEVAL_MODE=service for the Streamlit app. Every worker maps the same
+published index files (see utils/index_store.py), so adding workers does not add
+copies of the index.
+"""
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel
+from config import Config
+from utils.micro_batch import MicroBatcher
+from utils.single_flight import single_flight
+from utils.vector_store import VectorStore
+
+app = FastAPI(title="Ira retrieval service")
+
+_stores: "OrderedDict[str, VectorStore]" = OrderedDict()
+_stores_lock = threading.Lock()
+
+
+class IngestRequest(BaseModel):
+    doc_id: str
+    filename: str
+    chunks: List[str]
+    pages: Optional[List[int]] = None
+
+
+class SearchRequest(BaseModel):
+    doc_id: str
+    query: str
+    k: int = 3
+
+
+class BatchSearchRequest(BaseModel):
+    doc_id: str
+    queries: List[str]
+    k: int = 3
+
+
+class ExtractiveRequest(BaseModel):
+    doc_id: str
+    query: str
+    chunk_ids: List[int]
+
+
+def _remember(doc_id: str, store: VectorStore):
+    with _stores_lock:
+        _stores[doc_id] = store
+        _stores.move_to_end(doc_id)
+        while len(_stores) > Config.RETRIEVAL_SERVICE_DOCUMENTS:
+            _stores.popitem(last=False)
+
+
+def get_store(doc_id: str) -> VectorStore:
+    """Open index for a document, loading the published generation on first use"""
+    with _stores_lock:
+        store = _stores.get(doc_id)
+        if store is not None:
+            _stores.move_to_end(doc_id)
+    if store is None:
+        store = VectorStore()
+        if not store.load_from_store(doc_id):
+            raise HTTPException(status_code=404, detail=f"No index published for document {doc_id}")
+        _remember(doc_id, store)
+    else:
+        # Another worker may have republished this document
+        store.refresh()
+    return store
+
+
+def _serialize(results):
+    return [{"content": doc.page_content, "metadata": doc.metadata, "distance": distance} for doc, distance in results]
+
+
+def _search_batch(group, queries: List[str]):
+    doc_id, k = group
+    return get_store(doc_id).batch_similarity_search(queries, k)
+
+
+# Single searches arriving together for the same document and k share one scan
+batcher = MicroBatcher(_search_batch)
+
+
+def _describe(doc_id: str, store: VectorStore) -> dict:
+    return {
+        "doc_id": doc_id,
+        "chunks": len(store.documents),
+        "relevance_threshold": store.relevance_threshold,
+        "calibration": store.calibration,
+    }
+
+
+@app.post("/ingest")
+def ingest(request: IngestRequest):
+    """Embed and index already extracted chunks, publishing the index for every worker"""
+    if not request.chunks:
+        raise HTTPException(status_code=400, detail="No chunks to index")
+    if request.pages is not None and len(request.pages) != len(request.chunks):
+        raise HTTPException(status_code=400, detail="pages must have one entry per chunk")
+
+    def build():
+        store = VectorStore()
+        if not store.load_from_store(request.doc_id):
+            store.create_vector_store(request.chunks, request.filename, request.doc_id, request.pages)
+        return store
+
+    store = single_flight.do("index", request.doc_id, build)
+    _remember(request.doc_id, store)
+    return _describe(request.doc_id, store)
+
+
+@app.post("/documents/{doc_id}/load")
+def load(doc_id: str):
+    """Open a published index; 404 if the document was never ingested"""
+    return _describe(doc_id, get_store(doc_id))
+
+
+@app.get("/documents/{doc_id}/chunks")
+def chunks(doc_id: str):
+    return {"chunks": list(get_store(doc_id).chunk_texts())}
+
+
+@app.post("/search")
+async def search(request: SearchRequest):
+    results = await asyncio.wrap_future(batcher.submit((request.doc_id, request.k), request.query))
+    return {"results": _serialize(results)}
+
+
+@app.post("/batch_search")
+def batch_search(request: BatchSearchRequest):
+    """Many queries in one call: one embedding request and one matrix-matrix scan"""
+    results = get_store(request.doc_id).batch_similarity_search(request.queries, request.k)
+    return {"results": [_serialize(r) for r in results]}
+
+
+@app.post("/extractive")
+def extractive(request: ExtractiveRequest):
+    store = get_store(request.doc_id)
+    docs = [(store.documents[i], 0.0) for i in request.chunk_ids if 0 <= i < len(store.documents)]
+    answer = store.extractive_answer(request.query, docs)
+    if answer is None:
+        return {"answer": None}
+    sentence, doc, score = answer
+    return {"answer": {"sentence": sentence, "chunk_id": doc.metadata["chunk_id"], "score": score}}
+
+
+@app.get("/health")
+def health():
+    with _stores_lock:
+        documents = list(_stores)
+    return {"status": "ok", "documents": documents, "batching": batcher.stats(), "coalescing": single_flight.stats()}
@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+# Modules import `config` and `utils` from the repository root, as app.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config  # noqa: E402
+
+
+@pytest.fixture
+def index_dir(tmp_path, monkeypatch):
+    """A fresh VECTOR_DB_DIR for spill files and published indexes"""
+    monkeypatch.setattr(Config, "VECTOR_DB_DIR", str(tmp_path))
+    return tmp_path
@@ -0,0 +1,52 @@
+from utils.boilerplate import BoilerplateFilter
+
+TOPICS = ["revenue", "staffing", "logistics", "research", "marketing", "compliance", "outlook"]
+
+
+def body(number):
+    topic = TOPICS[number % len(TOPICS)]
+    return "\n".join([
+        f"This section reviews {topic} for the year.",
+        f"Spending on {topic} rose against the prior plan.",
+        "All figures are unaudited.",
+        f"The board approved the {topic} budget.",
+        f"Questions about {topic} go to the committee.",
+    ])
+
+
+def page(number, text):
+    return number, f"ACME Corp Annual Report 2023\nConfidential\n{text}\nPage {number} of 12"
+
+
+def test_running_headers_and_footers_are_removed():
+    pages = [page(n, body(n)) for n in range(1, 7)]
+    filter = BoilerplateFilter()
+    cleaned = filter.clean(pages)
+    assert cleaned == [(n, body(n)) for n in range(1, 7)]
+    report = filter.report()
+    assert report["pages"] == 6
+    assert report["lines_removed"] == 18
+    assert report["chars_removed"] == sum(len(text) - len(body(n)) for n, text in pages)
+
+
+def test_body_text_is_kept():
+    # "All figures are unaudited." repeats on every page, but mid-page, so it stays;
+    # a page whose first body line is a repeated header text is only peeled at the edge
+    pages = [page(n, body(n)) for n in range(1, 7)]
+    pages.append((7, "ACME Corp Annual Report 2023\nA page with a single body line.\nConfidential"))
+    cleaned = dict(BoilerplateFilter().clean(pages))
+    for number in range(1, 7):
+        assert "All figures are unaudited." in cleaned[number]
+        assert cleaned[number] == body(number)
+    assert cleaned[7] == "A page with a single body line."
+
+
+def test_short_documents_are_left_alone():
+    pages = [page(n, body(n)) for n in range(1, 4)]
+    assert BoilerplateFilter().clean(pages) == pages
+
+
+def test_later_windows_reuse_what_was_learned():
+    filter = BoilerplateFilter()
+    filter.clean([page(n, body(n)) for n in range(1, 6)])
+    assert filter.clean([page(6, body(6))]) == [(6, body(6))]
@@ -0,0 +1,56 @@
+import pytest
+
+from utils.chunker import PAGE_MARKER, TextChunker
+from utils.pdf_processor import join_pages
+
+SENTENCE = "The quarterly report lists revenue, costs and the outlook for each region. "
+
+
+@pytest.fixture
+def document():
+    return join_pages([(number, f"Page {number} text. " + SENTENCE * 12) for number in range(1, 6)])
+
+
+@pytest.mark.parametrize("boundary", ["sentence", "paragraph", "page"])
+def test_spans_index_the_shared_text(document, boundary):
+    chunks = TextChunker(chunk_size=300, chunk_overlap=60, boundary=boundary, length_unit="chars").split(document)
+    assert len(chunks) > 5
+    assert len(chunks.pages) == len(chunks)
+    for i, (start, end) in enumerate(chunks.spans):
+        assert 0 <= start < end <= len(document)
+        assert chunks[i] == document[start:end]
+        assert chunks[i] == chunks[i].strip()
+        assert len(chunks[i]) > TextChunker().min_chunk_length
+    assert list(chunks) == chunks[:]
+    assert list(chunks.starts) == sorted(chunks.starts)
+
+
+def test_chunks_respect_size_and_cover_the_text(document):
+    chunker = TextChunker(chunk_size=300, chunk_overlap=60, boundary="sentence", length_unit="chars")
+    chunks = chunker.split(document)
+    assert all(end - start <= 300 for start, end in chunks.spans)
+    # Consecutive chunks overlap or touch, so no text between them is lost
+    for (_, previous_end), (start, _) in zip(chunks.spans, chunks.spans[1:]):
+        assert document[previous_end:start].strip() == "" or start < previous_end
+
+
+def test_pages_follow_the_markers(document):
+    chunks = TextChunker(chunk_size=300, chunk_overlap=60, boundary="page", length_unit="chars").split(document)
+    markers = [(m.start(), int(m.group(1))) for m in PAGE_MARKER.finditer(document)]
+    for (start, end), page in zip(chunks.spans, chunks.pages):
+        assert page == max(number for position, number in markers if position <= start)
+        # Page mode never lets a chunk cross into the next page
+        assert PAGE_MARKER.search(document, start, end) is None
+    assert sorted(set(chunks.pages)) == [1, 2, 3, 4, 5]
+
+
+def test_short_chunks_are_dropped():
+    chunks = TextChunker(chunk_size=100, chunk_overlap=0, length_unit="chars", min_chunk_length=50).split("Too short.")
+    assert len(chunks) == 0
+
+
+def test_invalid_settings_are_rejected():
+    with pytest.raises(ValueError):
+        TextChunker(chunk_size=100, chunk_overlap=100)
+    with pytest.raises(ValueError):
+        TextChunker(boundary="chapter")
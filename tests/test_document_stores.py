@@ -0,0 +1,99 @@
+import hashlib
+
+import numpy as np
+import pytest
+
+from config import Config
+from utils.document_stores import DocumentStores
+
+pytest.importorskip("langchain.schema")
+
+from utils.vector_store import VectorStore  # noqa: E402
+
+
+class HashingEmbeddings:
+    """Deterministic local embeddings: documents sharing words get similar vectors"""
+
+    def embed_query(self, text):
+        vector = np.zeros(256, dtype=np.float32)
+        for word in set(text.lower().replace(".", " ").replace("?", " ").split()):
+            digest = hashlib.blake2b(word.encode(), digest_size=4).digest()
+            vector[int.from_bytes(digest, "little") % 256] += 1.0
+        return vector / max(np.linalg.norm(vector), 1e-9)
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+def make_store():
+    store = VectorStore()
+    store.__dict__["embeddings"] = HashingEmbeddings()  # pre-fills the cached_property
+    return store
+
+
+DOCUMENTS = {
+    "doc-apples": ["Apples grow in orchards and ripen in autumn across the northern valleys.",
+                   "The apple harvest employs seasonal pickers who fill wooden crates by hand."],
+    "doc-rockets": ["Rockets burn liquid oxygen and kerosene to lift payloads into low orbit.",
+                    "The rocket engine test stand measures thrust during a full duration burn."],
+}
+
+
+def build(documents, doc_id):
+    return documents.build(doc_id, lambda store: store.create_vector_store(DOCUMENTS[doc_id], f"{doc_id}.pdf",
+                                                                           doc_id=doc_id))
+
+
+def top_source(store, question):
+    return store.similarity_search(question, k=1)[0][0].metadata["source"]
+
+
+@pytest.fixture
+def settings(index_dir, monkeypatch):
+    monkeypatch.setattr(Config, "RELEVANCE_CALIBRATION", "off")
+    # Every nearest chunk counts as relevant, so results never come from the fuzzy fallback
+    monkeypatch.setattr(Config, "SIMILARITY_THRESHOLD", 2.0)
+    monkeypatch.setattr(Config, "ENABLE_EXTRACTIVE_ANSWERS", False)
+    monkeypatch.setattr(Config, "EMBEDDING_STORAGE", "float32")
+    return monkeypatch
+
+
+@pytest.mark.parametrize("persist", [True, False])
+def test_sessions_keep_their_own_document(settings, persist):
+    settings.setattr(Config, "PERSIST_INDEX", persist)
+    documents = DocumentStores(make_store)
+    # Session A uploads first, then session B uploads a different PDF
+    session_a = {"current_doc_id": "doc-apples"}
+    build(documents, "doc-apples")
+    session_b = {"current_doc_id": "doc-rockets"}
+    build(documents, "doc-rockets")
+
+    # Session A's next question must still search its own document
+    store_a = documents.get(session_a["current_doc_id"])
+    store_b = documents.get(session_b["current_doc_id"])
+    assert store_a is not store_b
+    assert top_source(store_a, "when do apples ripen?") == "doc-apples.pdf"
+    assert top_source(store_a, "how is rocket thrust measured?") == "doc-apples.pdf"
+    assert top_source(store_b, "when do apples ripen?") == "doc-rockets.pdf"
+
+
+def test_evicted_document_is_reopened_from_its_published_index(settings):
+    settings.setattr(Config, "PERSIST_INDEX", True)
+    documents = DocumentStores(make_store, max_open=1)
+    build(documents, "doc-apples")
+    build(documents, "doc-rockets")
+
+    store = documents.get("doc-apples")
+    assert store is not None
+    assert store.doc_id == "doc-apples"
+    assert top_source(store, "when do apples ripen?") == "doc-apples.pdf"
+
+
+def test_evicted_document_is_gone_without_persistence(settings):
+    settings.setattr(Config, "PERSIST_INDEX", False)
+    documents = DocumentStores(make_store, max_open=1)
+    build(documents, "doc-apples")
+    build(documents, "doc-rockets")
+    assert documents.get("doc-apples") is None
+    assert documents.get("doc-rockets") is not None
+    assert documents.get(None) is None
@@ -0,0 +1,99 @@
+import os
+import time
+
+import pytest
+
+from config import Config
+from utils.index_store import CURRENT_POINTER, IndexStore
+
+
+def writer(value):
+    def write(directory):
+        with open(os.path.join(directory, "data.txt"), "w") as f:
+            f.write(value)
+        return {"value": value}
+    return write
+
+
+def read(generation):
+    with open(os.path.join(generation, "data.txt")) as f:
+        return f.read()
+
+
+def test_publish_makes_the_generation_current(index_dir):
+    store = IndexStore()
+    assert store.current("doc") is None
+    generation = store.publish("doc", writer("one"))
+    assert store.current("doc") == generation
+    assert IndexStore.read_meta(generation)["value"] == "one"
+    assert IndexStore.read_meta(generation)["doc_id"] == "doc"
+    assert read(generation) == "one"
+
+
+def test_readers_keep_their_generation_while_a_newer_one_is_published(index_dir, monkeypatch):
+    monkeypatch.setattr(Config, "INDEX_GENERATIONS_KEPT", 2)
+    store = IndexStore()
+    first = store.publish("doc", writer("one"))
+    second = store.publish("doc", writer("two"))
+    assert store.current("doc") == second
+    assert read(first) == "one"
+    third = store.publish("doc", writer("three"))
+    assert store.current("doc") == third
+    # Only INDEX_GENERATIONS_KEPT generations stay on disk
+    assert not os.path.exists(first)
+    assert sorted(name for name in os.listdir(store.doc_dir("doc")) if name.startswith("gen-")) == \
+        sorted([os.path.basename(second), os.path.basename(third)])
+
+
+def test_failed_write_leaves_the_current_generation(index_dir):
+    store = IndexStore()
+    generation = store.publish("doc", writer("one"))
+
+    def broken(directory):
+        writer("partial")(directory)
+        raise OSError("disk full")
+
+    with pytest.raises(OSError):
+        store.publish("doc", broken)
+    assert store.current("doc") == generation
+    assert read(store.current("doc")) == "one"
+    assert [name for name in os.listdir(store.doc_dir("doc")) if name.startswith(".")] == []
+
+
+def test_pointer_to_an_incomplete_generation_is_ignored(index_dir):
+    store = IndexStore()
+    os.makedirs(os.path.join(store.doc_dir("doc"), "gen-1"))
+    with open(os.path.join(store.doc_dir("doc"), CURRENT_POINTER), "w") as f:
+        f.write("gen-1")
+    assert store.current("doc") is None
+
+
+def test_unused_documents_expire(index_dir, monkeypatch):
+    monkeypatch.setattr(Config, "INDEX_RETENTION_HOURS", 1)
+    monkeypatch.setattr(Config, "INDEX_MAX_DOCUMENTS", 0)
+    store = IndexStore()
+    store.publish("old", writer("old"))
+    store.publish("recent", writer("recent"))
+    stale = time.time() - 2 * 3600
+    os.utime(os.path.join(store.doc_dir("old"), CURRENT_POINTER), (stale, stale))
+
+    assert store.evict() == 1
+    assert store.current("old") is None
+    assert store.current("recent") is not None
+
+
+def test_least_recently_used_documents_beyond_the_limit_are_evicted(index_dir, monkeypatch):
+    monkeypatch.setattr(Config, "INDEX_RETENTION_HOURS", 0)
+    monkeypatch.setattr(Config, "INDEX_MAX_DOCUMENTS", 2)
+    store = IndexStore()
+    for age, doc_id in enumerate(["a", "b"]):
+        store.publish(doc_id, writer(doc_id))
+        used = time.time() - 100 + age
+        os.utime(os.path.join(store.doc_dir(doc_id), CURRENT_POINTER), (used, used))
+    store.touch("a")
+
+    # Publishing a third document evicts the least recently used other one
+    store.publish("c", writer("c"))
+    assert store.current("a") is not None
+    assert store.current("b") is None
+    assert store.current("c") is not None
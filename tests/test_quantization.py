@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from utils.quantization import QuantizedIndex, normalize_rows
+
+
+@pytest.fixture
+def vectors():
+    rng = np.random.default_rng(0)
+    return rng.normal(size=(600, 64)).astype(np.float32)
+
+
+def exact_top_k(vectors, queries, k):
+    scores = normalize_rows(queries) @ normalize_rows(vectors).T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+@pytest.mark.parametrize("mode, min_recall", [("float32", 1.0), ("float16", 1.0), ("int8", 0.98), ("pq", 0.9)])
+def test_recall_against_exact_search(index_dir, monkeypatch, vectors, mode, min_recall):
+    monkeypatch.setattr("config.Config.PQ_SUBSPACES", 16)
+    index = QuantizedIndex(mode).build(vectors)
+    queries = vectors[:40] + np.random.default_rng(1).normal(scale=0.3, size=(40, 64)).astype(np.float32)
+    expected = exact_top_k(vectors, queries, 10)
+
+    hits = sum(len(set(index.search(q, 10)[0]) & set(truth)) for q, truth in zip(queries, expected))
+    assert hits / expected.size >= min_recall
+
+    rows, sims = index.search_batch(queries, 10)
+    assert rows.shape == sims.shape == (40, 10)
+    for q, row, sim in zip(queries, rows, sims):
+        single_rows, single_sims = index.search(q, 10)
+        assert list(row) == list(single_rows)
+        np.testing.assert_allclose(sim, single_sims, rtol=1e-5, atol=1e-6)
+    index.close()
+
+
+def test_rescored_similarities_are_exact_and_sorted(index_dir, vectors):
+    index = QuantizedIndex("int8").build(vectors)
+    rows, sims = index.search(vectors[7], 5)
+    assert rows[0] == 7
+    assert list(sims) == sorted(sims, reverse=True)
+    exact = normalize_rows(vectors[rows]) @ normalize_rows(vectors[7])[0]
+    np.testing.assert_allclose(sims, exact, rtol=1e-5)
+    index.close()
+
+
+def test_build_twice_is_refused(index_dir, vectors):
+    index = QuantizedIndex("float32").build(vectors)
+    with pytest.raises(Exception, match="already built"):
+        index.build(vectors)
+
+
+def test_save_and_load_give_the_same_results(index_dir, vectors):
+    index = QuantizedIndex("int8").build(vectors)
+    meta = index.save(str(index_dir))
+    loaded = QuantizedIndex.load(str(index_dir), meta)
+    assert len(loaded) == len(index) == 600
+    for query in vectors[:5]:
+        np.testing.assert_array_equal(loaded.search(query, 5)[0], index.search(query, 5)[0])
+    index.close()
+
+
+def test_close_removes_the_spill_file(index_dir, vectors):
+    index = QuantizedIndex("float16").build(vectors)
+    assert len(list(index_dir.glob("*.f32"))) == 1
+    index.close()
+    assert list(index_dir.glob("*.f32")) == []
+
+
+def test_empty_index_searches_return_nothing():
+    rows, sims = QuantizedIndex("int8").search(np.ones(8), 3)
+    assert len(rows) == len(sims) == 0
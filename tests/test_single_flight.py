@@ -0,0 +1,80 @@
+import threading
+import time
+
+import pytest
+
+from utils.single_flight import SingleFlight, normalize_key
+
+
+def run_concurrently(count, target):
+    results, errors = [None] * count, [None] * count
+
+    def worker(i):
+        try:
+            results[i] = target()
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results, errors
+
+
+def test_concurrent_callers_share_one_call():
+    flight, release, calls = SingleFlight(), threading.Event(), []
+
+    def slow():
+        calls.append(1)
+        release.wait(5)
+        return "answer"
+
+    threads, results, errors = run_concurrently(5, lambda: flight.do("search", "key", slow))
+    # Let every caller reach the in-flight future before the leader finishes
+    while flight.stats().get("search", {}).get("calls", 0) < 5:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert calls == [1]
+    assert results == ["answer"] * 5
+    assert errors == [None] * 5
+    assert flight.stats()["search"] == {"calls": 5, "executed": 1, "coalesced": 4}
+
+
+def test_exception_reaches_every_waiter():
+    flight, release = SingleFlight(), threading.Event()
+
+    def failing():
+        release.wait(5)
+        raise ValueError("upstream down")
+
+    threads, results, errors = run_concurrently(3, lambda: flight.do("embed", "key", failing))
+    while flight.stats().get("embed", {}).get("calls", 0) < 3:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == [None] * 3
+    assert all(isinstance(e, ValueError) and str(e) == "upstream down" for e in errors)
+
+
+def test_nothing_is_cached_after_completion():
+    flight, calls = SingleFlight(), []
+    flight.do("g", "key", calls.append, 1)
+    flight.do("g", "key", calls.append, 2)
+    assert calls == [1, 2]
+
+    with pytest.raises(KeyError):
+        flight.do("g", "key", {}.__getitem__, "missing")
+    # A failed call does not leave its future behind either
+    assert flight.do("g", "key", lambda: "ok") == "ok"
+
+
+def test_groups_and_keys_are_separate():
+    flight = SingleFlight()
+    assert flight.do("a", "key", lambda: 1) == 1
+    assert flight.do("b", "key", lambda: 2) == 2
+    assert normalize_key("  What IS\n the  Total? ") == "what is the total?"
@@ -0,0 +1,122 @@
+import pytest
+
+from utils import upstream
+from utils.upstream import CircuitBreaker, CircuitOpenError, Upstream, is_transient
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(upstream.time, "monotonic", clock)
+    return clock
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_seconds=10)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_seconds=10)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+
+def test_half_open_trial_success_closes(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_seconds=10)
+    breaker.record_failure()
+    clock.now += 9
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    clock.now += 1
+    breaker.before_call()
+    assert breaker.state == "half_open"
+    # Only one trial call at a time
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    breaker.before_call()
+
+
+def test_half_open_trial_failure_reopens(clock):
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_seconds=10)
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now += 10
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    clock.now += 10
+    breaker.before_call()
+    assert breaker.state == "half_open"
+
+
+def test_released_trial_lets_the_next_call_try(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_seconds=10)
+    breaker.record_failure()
+    clock.now += 10
+    breaker.before_call()
+    breaker.release_trial()
+    assert breaker.state == "half_open"
+    breaker.before_call()
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class APITimeoutError(Exception):
+    pass
+
+
+@pytest.mark.parametrize("error, transient", [
+    (StatusError(429), True), (StatusError(500), True), (StatusError(503), True), (StatusError(408), True),
+    (StatusError(400), False), (StatusError(401), False), (APITimeoutError(), True), (ValueError(), False),
+])
+def test_transient_errors(error, transient):
+    assert is_transient(error) is transient
+
+
+def test_only_transient_errors_are_retried_and_counted(monkeypatch):
+    monkeypatch.setattr("config.Config.UPSTREAM_RETRIES", 1)
+    service = Upstream("test-errors")
+    attempts = []
+
+    def fail(status):
+        attempts.append(status)
+        raise StatusError(status)
+
+    with pytest.raises(StatusError):
+        service.call(fail, 400)
+    assert attempts == [400]
+    assert service.breaker.failures == 0
+
+    with pytest.raises(StatusError):
+        service.call(fail, 503)
+    assert attempts == [400, 503, 503]
+    assert service.breaker.failures == 2
+    stats = service.stats()
+    assert (stats["request_errors"], stats["failures"], stats["retries"]) == (1, 2, 1)
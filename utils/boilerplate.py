@@ -0,0 +1,88 @@
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Set, Tuple
+from config import Config
+
+DIGITS = re.compile(r'\d+')
+SPACES = re.compile(r'\s+')
+
+
+def normalize_line(line: str) -> str:
+    """Case-, whitespace- and number-insensitive form, so "Page 3 of 120" matches "page 4 of 120" """
+    return SPACES.sub(" ", DIGITS.sub("#", line.lower())).strip()
+
+
+def edge_lines(lines: List[str], count: int) -> Tuple[List[int], List[int]]:
+    """Indexes of the first and last `count` non-empty lines of a page"""
+    filled = [i for i, line in enumerate(lines) if line.strip()]
+    return filled[:count], filled[::-1][:count]
+
+
+class BoilerplateFilter:
+    """Strips running headers, footers and page numbers from extracted page text.
+
+    Lines repeating at the top or bottom of pages are detected by counting the
+    normalized first and last BOILERPLATE_EDGE_LINES lines of every page seen so far; a
+    line on at least BOILERPLATE_MIN_SHARE of them (once BOILERPLATE_MIN_PAGES pages are
+    seen) is boilerplate. Only runs of such lines at a page's edges are removed, never
+    text in the middle. One instance per document: large documents feed it window by
+    window, and later windows reuse what earlier ones learned.
+    """
+
+    def __init__(self):
+        self.pages_seen = 0
+        self.line_counts = Counter()
+        self.chars_removed = 0
+        self.lines_removed = 0
+        self.removed_patterns = Counter()
+
+    def learn(self, page_texts: Iterable[str]):
+        edge = Config.BOILERPLATE_EDGE_LINES
+        for text in page_texts:
+            lines = text.splitlines()
+            top, bottom = edge_lines(lines, edge)
+            # Counted once per page, even if a line is both among the first and last lines
+            self.line_counts.update({normalize_line(lines[i]) for i in top + bottom} - {""})
+            self.pages_seen += 1
+
+    def boilerplate(self) -> Set[str]:
+        if self.pages_seen < Config.BOILERPLATE_MIN_PAGES:
+            return set()
+        needed = max(2, Config.BOILERPLATE_MIN_SHARE * self.pages_seen)
+        return {line for line, count in self.line_counts.items() if count >= needed}
+
+    def strip(self, text: str, boilerplate: Set[str]) -> str:
+        lines = text.splitlines()
+        removed = set()
+        # Peel matching lines off each edge; stop at the first line of real content
+        for order in (range(len(lines)), range(len(lines) - 1, -1, -1)):
+            for i in order:
+                if not lines[i].strip():
+                    continue
+                normalized = normalize_line(lines[i])
+                if normalized not in boilerplate:
+                    break
+                if i not in removed:
+                    removed.add(i)
+                    self.removed_patterns[normalized] += 1
+        if not removed:
+            return text
+        self.lines_removed += len(removed)
+        self.chars_removed += sum(len(lines[i]) + 1 for i in removed)
+        return "\n".join(line for i, line in enumerate(lines) if i not in removed)
+
+    def clean(self, pages: List[Tuple[int, str]]) -> List[Tuple[int, str]]:
+        """Learn from these (page number, text) pairs, then return them with boilerplate stripped"""
+        self.learn(text for _, text in pages)
+        boilerplate = self.boilerplate()
+        if not boilerplate:
+            return pages
+        return [(number, self.strip(text, boilerplate)) for number, text in pages]
+
+    def report(self) -> Dict:
+        return {
+            "pages": self.pages_seen,
+            "chars_removed": self.chars_removed,
+            "lines_removed": self.lines_removed,
+            "patterns": [line for line, _ in self.removed_patterns.most_common(5)],
+        }
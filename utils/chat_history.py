@@ -0,0 +1,61 @@
+from collections import deque
+from typing import Dict, Iterator, List, Optional
+from config import Config
+
+
+class ChatHistory:
+    """Capped chat transcript for one session.
+
+    The newest `visible_messages` are kept verbatim and rendered on every rerun. Older
+    messages are compacted (content truncated to a preview) into a bounded archive that
+    the UI only renders on request; anything beyond the archive is just counted.
+    Behaves like the plain message list it replaces: append, len, iterate and slice.
+    """
+
+    def __init__(self, initial: Optional[List[Dict]] = None, visible_messages: int = None,
+                 archive_size: int = None, preview_chars: int = None):
+        self.visible_messages = visible_messages or Config.CHAT_HISTORY_VISIBLE
+        self.preview_chars = preview_chars or Config.CHAT_ARCHIVE_PREVIEW_CHARS
+        self.messages = []
+        self.archived = deque(maxlen=archive_size or Config.CHAT_HISTORY_ARCHIVE)
+        self.dropped = 0
+        for message in initial or []:
+            self.append(message)
+
+    def append(self, message: Dict):
+        self.messages.append(message)
+        while len(self.messages) > self.visible_messages:
+            self._archive(self.messages.pop(0))
+
+    def _archive(self, message: Dict):
+        if len(self.archived) == self.archived.maxlen:
+            self.dropped += 1
+        content = message["content"]
+        if len(content) > self.preview_chars:
+            content = content[:self.preview_chars].rstrip() + "…"
+        self.archived.append({"role": message["role"], "content": content})
+
+    @property
+    def archived_count(self) -> int:
+        return len(self.archived) + self.dropped
+
+    def summary(self) -> str:
+        """One-line description of the compacted part of the conversation"""
+        text = f"{self.archived_count} earlier messages"
+        if self.dropped:
+            text += f" ({self.dropped} oldest no longer stored)"
+        return text
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    def __iter__(self) -> Iterator[Dict]:
+        return iter(self.messages)
+
+    def __getitem__(self, i):
+        return self.messages[i]
+
+
+def new_debug_log() -> deque:
+    """Fixed-size ring buffer for per-session debug messages"""
+    return deque(maxlen=Config.DEBUG_LOG_SIZE)
@@ -0,0 +1,140 @@
+import re
+from array import array
+from bisect import bisect_right
+from typing import Iterator, List, Sequence, Tuple, Union
+from config import Config
+from utils.lazy import optional_import
+
+# Marker written by PDFProcessor.extract_text_from_pdf_bytes before each page's text
+PAGE_MARKER = re.compile(r'\n--- Page (\d+) ---\n')
+
+# Break points tried from the end of the window backwards, strongest first
+SEPARATORS = {
+    "page": ["\n\n", ". ", "? ", "! ", ".\n", "\n", " "],
+    "paragraph": ["\n\n", ". ", "? ", "! ", ".\n", "\n", " "],
+    "sentence": [". ", "? ", "! ", ".\n", "\n", " "],
+}
+
+
+class ChunkSpans(Sequence):
+    """Chunks stored as (start, end) offsets into one shared text.
+
+    Indexing returns the chunk string (sliced on demand), so it can be passed
+    anywhere a list of chunk strings is expected.
+    """
+
+    def __init__(self, text: str, starts: array, ends: array, pages: List[int]):
+        self.text = text
+        self.starts = starts
+        self.ends = ends
+        self.pages = pages
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __getitem__(self, i: Union[int, slice]):
+        if isinstance(i, slice):
+            return [self.text[s:e] for s, e in zip(self.starts[i], self.ends[i])]
+        return self.text[self.starts[i]:self.ends[i]]
+
+    def __iter__(self) -> Iterator[str]:
+        for s, e in zip(self.starts, self.ends):
+            yield self.text[s:e]
+
+    @property
+    def spans(self) -> List[Tuple[int, int]]:
+        return list(zip(self.starts, self.ends))
+
+
+def chars_per_token(text: str, sample_size: int = 100_000) -> float:
+    """Average characters per token for this text, measured with tiktoken when installed"""
+    tiktoken = optional_import("tiktoken")
+    sample = text[:sample_size]
+    if tiktoken is None or not sample:
+        return 4.0  # Typical for English prose with OpenAI tokenizers
+    encoding = tiktoken.encoding_for_model(Config.EMBEDDING_MODEL)
+    return len(sample) / max(1, len(encoding.encode(sample)))
+
+
+class TextChunker:
+    """Single-pass, offset-based splitter producing ChunkSpans.
+
+    Each chunk ends at the strongest boundary (paragraph, sentence, then word) found in
+    the second half of its window; "page" mode also never lets a chunk cross a page
+    marker. Chunks whose stripped length is at most `min_chunk_length` are dropped inline.
+    """
+
+    def __init__(self, chunk_size: int = None, chunk_overlap: int = None, boundary: str = None,
+                 length_unit: str = None, min_chunk_length: int = None):
+        self.chunk_size = chunk_size or Config.CHUNK_SIZE
+        self.chunk_overlap = Config.CHUNK_OVERLAP if chunk_overlap is None else chunk_overlap
+        self.boundary = boundary or Config.CHUNK_BOUNDARY
+        self.length_unit = length_unit or Config.CHUNK_LENGTH_UNIT
+        self.min_chunk_length = Config.MIN_CHUNK_LENGTH if min_chunk_length is None else min_chunk_length
+        if self.boundary not in SEPARATORS:
+            raise ValueError(f"Unknown chunk boundary '{self.boundary}'. Choose one of: {', '.join(SEPARATORS)}")
+        if self.chunk_overlap >= self.chunk_size:
+            raise ValueError("Chunk overlap must be smaller than chunk size")
+
+    def split(self, text: str) -> ChunkSpans:
+        size, overlap = self.chunk_size, self.chunk_overlap
+        if self.length_unit == "tokens":
+            # Sizes are given in tokens; convert once using this document's token density
+            ratio = chars_per_token(text)
+            size, overlap = int(size * ratio), int(overlap * ratio)
+
+        markers = [(m.start(), m.end(), int(m.group(1))) for m in PAGE_MARKER.finditer(text)]
+        marker_starts = [start for start, _, _ in markers]
+        if self.boundary == "page" and markers:
+            segments = [(0, markers[0][0])] + [
+                (end, markers[i + 1][0] if i + 1 < len(markers) else len(text))
+                for i, (_, end, _) in enumerate(markers)
+            ]
+        else:
+            segments = [(0, len(text))]
+
+        starts, ends, pages = array("q"), array("q"), []
+        separators = SEPARATORS[self.boundary]
+        for seg_start, seg_end in segments:
+            start = seg_start
+            while start < seg_end:
+                end = self._find_end(text, start, seg_end, size, separators)
+                s, e = self._trim(text, start, end)
+                if e - s > self.min_chunk_length:
+                    starts.append(s)
+                    ends.append(e)
+                    marker = bisect_right(marker_starts, s) - 1
+                    pages.append(markers[marker][2] if marker >= 0 else 1)
+                if end >= seg_end:
+                    break
+                start = self._next_start(text, start, end, overlap)
+        return ChunkSpans(text, starts, ends, pages)
+
+    @staticmethod
+    def _find_end(text: str, start: int, limit: int, size: int, separators: List[str]) -> int:
+        end = start + size
+        if end >= limit:
+            return limit
+        lowest = start + size // 2
+        for sep in separators:
+            pos = text.rfind(sep, lowest, end)
+            if pos != -1:
+                return pos + len(sep)
+        return end
+
+    @staticmethod
+    def _next_start(text: str, start: int, end: int, overlap: int) -> int:
+        if overlap <= 0:
+            return end
+        next_start = max(end - overlap, start + 1)
+        # Begin the overlap on a word boundary rather than mid-word
+        space = text.find(" ", next_start, end)
+        return space + 1 if space != -1 else next_start
+
+    @staticmethod
+    def _trim(text: str, start: int, end: int) -> Tuple[int, int]:
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        return start, end
@@ -0,0 +1,191 @@
+import json
+import os
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence
+from config import Config
+from utils.chunker import PAGE_MARKER
+
+# Intents only cover the whole document: the entire question must be a request like
+# "summarize this document" or "what are the chapters?". Scoped requests ("summarize the
+# warranty section", "main topics in chapter 3") go through retrieval instead.
+REQUEST_PREFIX = (r'(please |can you |could you |would you )*(give me |provide |write |show me |list |i want |i need )?'
+                  r'(a |an |the )?(short |brief |quick |full )?')
+DOCUMENT_REF = r'((this|the|my|that) (document|pdf|file|paper|manual|report|book)|this|it)'
+SUMMARY_PATTERN = (rf'^{REQUEST_PREFIX}(summar(y|ize|ise)|overview|tl;?dr|key (points|takeaways)|main (points|ideas))'
+                   rf'( (of|for|in) {DOCUMENT_REF}| {DOCUMENT_REF})?( please)?$|'
+                   rf'^what is {DOCUMENT_REF} about$|'
+                   rf'^what are the (key|main) (points|ideas|takeaways)( (of|in) {DOCUMENT_REF})?$')
+OUTLINE_PATTERN = (rf'^{REQUEST_PREFIX}(outline|table of contents|contents|structure|main sections|sections|chapters)'
+                   rf'( (of|for|in) {DOCUMENT_REF})?( please)?$|'
+                   rf'^(what|which) (are|is) the (main )?(sections|chapters|topics|structure)( (of|in) {DOCUMENT_REF})?$|'
+                   rf'^how is {DOCUMENT_REF} (organized|organised|structured)$')
+
+NUMBERED_HEADING = re.compile(r'^(\d+(?:\.\d+)*)\.?\s+([A-Z][^\n]{2,80})$')
+KEYWORD_HEADING = re.compile(r'^(chapter|section|part|appendix)\s+[\w.]+\b.{0,70}$', re.IGNORECASE)
+
+MAP_PROMPT = """Summarize the following part of a document in 3-5 concise bullet points.
+Keep specific facts, numbers and names.
+
+Text:
+{text}
+
+Summary:"""
+
+REDUCE_PROMPT = """Combine these partial summaries of one document into a single clear summary.
+Start with one sentence saying what the document is, then list the main points as bullets.
+
+Partial summaries:
+{text}
+
+Summary:"""
+
+
+def summary_intent(question: str) -> Optional[str]:
+    """"outline", "summary" or None for questions about the whole document"""
+    question_lower = re.sub(r'\s+', ' ', question.lower()).strip().rstrip('?.! ')
+    if re.search(OUTLINE_PATTERN, question_lower):
+        return "outline"
+    if re.search(SUMMARY_PATTERN, question_lower):
+        return "summary"
+    return None
+
+
+def extract_outline(text: str) -> List[Dict]:
+    """Headings found in the extracted text, with their page and nesting level"""
+    outline = []
+    markers = list(PAGE_MARKER.finditer(text))
+    pages = [(1, text[:markers[0].start()] if markers else text)]
+    for i, marker in enumerate(markers):
+        end = markers[i + 1].start() if i + 1 < len(markers) else len(text)
+        pages.append((int(marker.group(1)), text[marker.end():end]))
+
+    for page, page_text in pages:
+        for line in page_text.splitlines():
+            line = line.strip()
+            numbered = NUMBERED_HEADING.match(line)
+            if numbered and not line.endswith(('.', ',', ';')):
+                entry = {"title": line, "page": page, "level": numbered.group(1).count(".") + 1}
+            elif KEYWORD_HEADING.match(line) or (line.isupper() and 3 <= len(line) <= 80 and re.search(r'[A-Z]{3}', line)):
+                entry = {"title": line, "page": page, "level": 1}
+            else:
+                continue
+            if outline and outline[-1]["title"] == entry["title"]:
+                continue
+            outline.append(entry)
+            if len(outline) >= Config.OUTLINE_MAX_ENTRIES:
+                return outline
+    return outline
+
+
+def format_outline(outline: List[Dict]) -> str:
+    return "\n".join(f"{'  ' * (entry['level'] - 1)}- {entry['title']} (page {entry['page']})" for entry in outline)
+
+
+class DocumentSummarizer:
+    """Hierarchical map-reduce summary of a document's chunks.
+
+    Chunks are packed into batches of about SUMMARY_BATCH_CHARS (sampling evenly when a
+    document would need more than SUMMARY_MAX_MAP_CALLS batches); each batch is
+    summarized on the fast model tier, then the partial summaries are reduced level by
+    level on the full tier until one remains.
+    """
+
+    def __init__(self, router):
+        self.router = router
+
+    def summarize(self, chunks: Sequence[str]) -> str:
+        batches = self._batches(list(chunks))
+        if len(batches) > Config.SUMMARY_MAX_MAP_CALLS:
+            step = len(batches) / Config.SUMMARY_MAX_MAP_CALLS
+            batches = [batches[int(i * step)] for i in range(Config.SUMMARY_MAX_MAP_CALLS)]
+        partials = [self.router.invoke(MAP_PROMPT.format(text=batch), "summary_map", "") for batch in batches]
+        while len(partials) > 1:
+            groups = self._batches(partials)
+            if len(groups) == len(partials):
+                groups = ["\n\n".join(partials)]
+            partials = [self.router.invoke(REDUCE_PROMPT.format(text=group), "summary_reduce", "") for group in groups]
+        return partials[0] if partials else ""
+
+    @staticmethod
+    def _batches(texts: List[str]) -> List[str]:
+        batches, current, size = [], [], 0
+        for text in texts:
+            if current and size + len(text) > Config.SUMMARY_BATCH_CHARS:
+                batches.append("\n\n".join(current))
+                current, size = [], 0
+            current.append(text)
+            size += len(text)
+        if current:
+            batches.append("\n\n".join(current))
+        return batches
+
+
+class SummaryStore:
+    """Per-document summary and outline, built in the background after ingest.
+
+    With PERSIST_INDEX on, artifacts are written as summary.json next to the document's
+    persisted index under Config.VECTOR_DB_DIR, so other workers and restarts reuse them
+    without LLM calls (and eviction deletes them with the index). Otherwise they are only
+    kept in memory, for the SUMMARY_CACHE_DOCUMENTS most recent documents.
+    """
+
+    def __init__(self, max_workers: int = 2):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="summary")
+        self._jobs: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def artifact_path(doc_id: str) -> str:
+        return os.path.join(Config.VECTOR_DB_DIR, doc_id, "summary.json")
+
+    def start(self, doc_id: str, chunks: Sequence[str], router) -> Future:
+        """Begin building the artifacts for a document (no-op if already started)"""
+        with self._lock:
+            if doc_id not in self._jobs:
+                self._jobs[doc_id] = self._executor.submit(self._build, doc_id, chunks, router)
+                while len(self._jobs) > Config.SUMMARY_CACHE_DOCUMENTS:
+                    self._jobs.pop(next(iter(self._jobs)))
+            return self._jobs[doc_id]
+
+    def get(self, doc_id: str, timeout: float = 0) -> Optional[Dict]:
+        """The artifacts if ready within `timeout` seconds, else None"""
+        with self._lock:
+            job = self._jobs.get(doc_id)
+        if job is None:
+            return self._load(doc_id)
+        try:
+            return job.result(timeout=timeout)
+        except Exception as e:
+            print(f"Summary not available for {doc_id[:12]}: {e or 'still building'}")
+            return None
+
+    def _build(self, doc_id: str, chunks: Sequence[str], router) -> Dict:
+        artifacts = self._load(doc_id)
+        if artifacts:
+            return artifacts
+        text = getattr(chunks, "text", None) or "\n".join(chunks)
+        print(f"Building summary and outline for {doc_id[:12]} in the background...")
+        artifacts = {
+            "outline": extract_outline(text),
+            "summary": DocumentSummarizer(router).summarize(chunks),
+        }
+        if Config.PERSIST_INDEX:
+            path = self.artifact_path(doc_id)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(artifacts, f)
+            os.replace(tmp_path, path)
+        print(f"Summary and outline ready for {doc_id[:12]} ({len(artifacts['outline'])} headings)")
+        return artifacts
+
+    def _load(self, doc_id: str) -> Optional[Dict]:
+        if not Config.PERSIST_INDEX:
+            return None
+        try:
+            with open(self.artifact_path(doc_id), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
@@ -0,0 +1,54 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Optional
+from config import Config
+from utils.single_flight import single_flight
+
+
+class DocumentStores:
+    """Open vector stores by document id, shared by every session of this process.
+
+    Sessions never search a store they do not own a document in: each question resolves
+    the store for its own session's document id. The OPEN_DOCUMENTS most recently used
+    stores stay open; an evicted one is reopened from its published index, or has to be
+    uploaded again when PERSIST_INDEX is off.
+    """
+
+    def __init__(self, factory: Callable, max_open: int = None):
+        self.factory = factory
+        self.max_open = max_open or Config.OPEN_DOCUMENTS
+        self._stores = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, doc_id: str, store):
+        with self._lock:
+            self._stores[doc_id] = store
+            self._stores.move_to_end(doc_id)
+            while len(self._stores) > self.max_open:
+                self._stores.popitem(last=False)
+
+    def _open(self, doc_id: str):
+        store = self.factory()
+        if not store.load_from_store(doc_id):
+            return None
+        self._remember(doc_id, store)
+        return store
+
+    def get(self, doc_id: Optional[str]):
+        """The store for a document, reopening its published index if needed; None if unknown"""
+        if doc_id is None:
+            return None
+        with self._lock:
+            store = self._stores.get(doc_id)
+            if store is not None:
+                self._stores.move_to_end(doc_id)
+                return store
+        # Sessions asking about the same evicted document reopen it once
+        return single_flight.do("open", doc_id, self._open, doc_id)
+
+    def build(self, doc_id: str, fill: Callable):
+        """A new store for a document, filled by `fill(store)` and then made available"""
+        store = self.factory()
+        fill(store)
+        self._remember(doc_id, store)
+        return store
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import os
+import re
+from typing import Callable, List, Optional, Sequence, Tuple
+from config import Config
+from utils.lazy import lazy_import
+from utils.model_router import COMPLEX_INTENT_PATTERN
+from utils.quantization import normalize_rows
+
+np = lazy_import("numpy")
+
+SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+|\n{2,}|\n--- Page \d+ ---\n')
+
+# Direct wh-lookups ("what is the max operating temperature?") rather than open or yes/no
+# questions, whose best matching sentence rarely answers them on its own
+LOOKUP_PATTERN = (r'^(what|which|when|where|who|whom|whose|'
+                  r'how (many|much|long|big|large|high|low|often|old|far|fast))\b')
+WORD = re.compile(r"[a-z0-9][a-z0-9-]*")
+STOP_WORDS = set("""
+    a an the of to in on at by for from with about into as and or but if than then
+    is are was were be been being do does did has have had can could will would should may might must
+    what which when where who whom whose how many much long big large high low often old far fast
+    this that these those it its there their they them i me my we our you your he she his her
+    not no any some all each here please tell give show find say says said
+""".split())
+
+
+def split_sentences(text: str, min_chars: int = 20, max_chars: int = 400) -> List[str]:
+    sentences = []
+    for sentence in SENTENCE_SPLIT.split(text):
+        sentence = " ".join(sentence.split())
+        if len(sentence) >= min_chars:
+            sentences.append(sentence[:max_chars])
+    return sentences
+
+
+def key_terms(text: str) -> set:
+    """Content words, lowercased, with a plural "s" dropped"""
+    return {word[:-1] if len(word) > 3 and word.endswith("s") else word
+            for word in WORD.findall(text.lower()) if word not in STOP_WORDS}
+
+
+def term_coverage(question: str, sentence: str) -> float:
+    """Share of the question's key terms that appear in the sentence (1.0 if it has none)"""
+    terms = key_terms(question)
+    return len(terms & key_terms(sentence)) / len(terms) if terms else 1.0
+
+
+def is_lookup_question(question: str) -> bool:
+    question_lower = question.strip().lower()
+    return bool(re.search(LOOKUP_PATTERN, question_lower)) and not re.search(COMPLEX_INTENT_PATTERN, question_lower)
+
+
+class ExtractiveIndex:
+    """Sentence embeddings for every chunk, built alongside the chunk index.
+
+    Lets a lookup question be answered with the single best sentence from the
+    retrieved chunks, without an LLM call. Sentences of one chunk are stored
+    contiguously; `bounds[i]:bounds[i + 1]` are the rows of chunk i.
+    """
+
+    def __init__(self):
+        self.sentences: List[str] = []
+        self.vectors = None
+        self.bounds = None
+
+    def build(self, texts: Sequence[str], embed_documents: Callable[[List[str]], List[List[float]]]) -> bool:
+        per_chunk = [split_sentences(text)[:Config.EXTRACTIVE_MAX_SENTENCES_PER_CHUNK] for text in texts]
+        total = sum(len(s) for s in per_chunk)
+        if total == 0 or total > Config.EXTRACTIVE_MAX_SENTENCES:
+            print(f"Extractive answers disabled for this document ({total} sentences)")
+            return False
+        self.sentences = [sentence for chunk in per_chunk for sentence in chunk]
+        print(f"Embedding {total} sentences for extractive answers...")
+        # float16 halves the memory; scores are computed in float32
+        self.vectors = normalize_rows(embed_documents(self.sentences)).astype(np.float16)
+        self.bounds = np.cumsum([0] + [len(s) for s in per_chunk])
+        return True
+
+    def save(self, directory: str):
+        if not self.ready:
+            return
+        from utils.index_store import write_texts
+        write_texts(directory, "sentences", self.sentences)
+        np.save(os.path.join(directory, "sentence_vectors.npy"), self.vectors)
+        np.save(os.path.join(directory, "sentence_bounds.npy"), np.asarray(self.bounds, dtype=np.int64))
+
+    @classmethod
+    def load(cls, directory: str) -> "ExtractiveIndex":
+        """Memory-mapped index written by save(); not ready if none was saved"""
+        from utils.index_store import MappedTexts, load_array
+        index = cls()
+        if os.path.exists(os.path.join(directory, "sentence_vectors.npy")):
+            index.sentences = MappedTexts(directory, "sentences")
+            index.vectors = load_array(directory, "sentence_vectors")
+            index.bounds = load_array(directory, "sentence_bounds")
+        return index
+
+    @property
+    def ready(self) -> bool:
+        return self.vectors is not None
+
+    def best_sentence(self, query_embedding, chunk_ids: Sequence[int]) -> Optional[Tuple[str, int, float]]:
+        """(sentence, chunk_id, cosine similarity) of the best sentence within the given chunks"""
+        if not self.ready:
+            return None
+        query = normalize_rows(query_embedding)[0]
+        best = None
+        for chunk_id in chunk_ids:
+            start, end = self.bounds[chunk_id], self.bounds[chunk_id + 1]
+            if start == end:
+                continue
+            scores = self.vectors[start:end].astype(np.float32) @ query
+            row = int(np.argmax(scores))
+            if best is None or scores[row] > best[2]:
+                best = (self.sentences[start + row], chunk_id, float(scores[row]))
+        return best
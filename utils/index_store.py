@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import Callable, Dict, Optional, Sequence
+from config import Config
+from utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+lc_schema = lazy_import("langchain.schema")
+
+CURRENT_POINTER = "CURRENT"
+META_FILE = "meta.json"
+FORMAT_VERSION = 1
+
+
+def write_texts(directory: str, name: str, texts: Sequence[str]):
+    """Store strings as one UTF-8 blob plus an int64 array of byte offsets"""
+    offsets = np.empty(len(texts) + 1, dtype=np.int64)
+    offsets[0] = 0
+    with open(os.path.join(directory, f"{name}.bin"), "wb") as f:
+        for i, text in enumerate(texts):
+            data = text.encode("utf-8")
+            f.write(data)
+            offsets[i + 1] = offsets[i] + len(data)
+    np.save(os.path.join(directory, f"{name}_offsets.npy"), offsets)
+
+
+def load_array(directory: str, name: str):
+    """Memory-map a saved .npy array read-only; pages are shared between processes"""
+    return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+
+
+class MappedTexts(Sequence):
+    """Read-only strings decoded on access from a memory-mapped blob written by write_texts"""
+
+    def __init__(self, directory: str, name: str):
+        self._offsets = load_array(directory, f"{name}_offsets")
+        blob_path = os.path.join(directory, f"{name}.bin")
+        # np.memmap refuses empty files
+        self._blob = np.memmap(blob_path, dtype=np.uint8, mode="r") if os.path.getsize(blob_path) else b""
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        return bytes(self._blob[start:end]).decode("utf-8")
+
+
+class MappedDocuments(Sequence):
+    """Chunk Documents built on access from mapped texts and page numbers"""
+
+    def __init__(self, texts: MappedTexts, source: str, pages=None):
+        self.texts = texts
+        self.source = source
+        self.pages = pages
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        i = int(i)
+        if i < 0:
+            i += len(self)
+        metadata = {"source": self.source, "chunk_id": i}
+        if self.pages is not None:
+            metadata["page"] = int(self.pages[i])
+        return lc_schema.Document(page_content=self.texts[i], metadata=metadata)
+
+
+class IndexStore:
+    """Generation-swapped index directories under Config.VECTOR_DB_DIR.
+
+    Each publish writes a complete generation into a hidden temp directory, renames it
+    to gen-<timestamp>, then atomically replaces the CURRENT pointer file. Readers
+    resolve CURRENT once and memory-map that generation's files, so they never see a
+    half-written index and keep a consistent view even while a newer one is published.
+    Files of a pruned generation stay readable by processes that still map them.
+    Every publish also evicts whole documents that have gone unused for
+    INDEX_RETENTION_HOURS or exceed INDEX_MAX_DOCUMENTS; loading a document marks it used.
+    """
+
+    def __init__(self, root: str = None):
+        self.root = root or Config.VECTOR_DB_DIR
+
+    def doc_dir(self, doc_id: str) -> str:
+        return os.path.join(self.root, doc_id)
+
+    def current(self, doc_id: str) -> Optional[str]:
+        """Path of the published generation for a document, or None"""
+        try:
+            with open(os.path.join(self.doc_dir(doc_id), CURRENT_POINTER), encoding="utf-8") as f:
+                generation = f.read().strip()
+        except OSError:
+            return None
+        path = os.path.join(self.doc_dir(doc_id), generation)
+        return path if os.path.isfile(os.path.join(path, META_FILE)) else None
+
+    def publish(self, doc_id: str, write: Callable[[str], Dict]) -> str:
+        """Write a new generation with `write(directory)` (which returns the metadata) and make it current"""
+        doc_dir = self.doc_dir(doc_id)
+        os.makedirs(doc_dir, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=".staging-", dir=doc_dir)
+        try:
+            meta = dict(write(staging) or {}, format=FORMAT_VERSION, doc_id=doc_id, created=time.time())
+            with open(os.path.join(staging, META_FILE), "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            self._fsync_dir(staging)
+            generation = f"gen-{time.time_ns()}-{os.getpid()}"
+            os.rename(staging, os.path.join(doc_dir, generation))
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        pointer_tmp = os.path.join(doc_dir, f".{CURRENT_POINTER}.{os.getpid()}.tmp")
+        with open(pointer_tmp, "w", encoding="utf-8") as f:
+            f.write(generation)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(pointer_tmp, os.path.join(doc_dir, CURRENT_POINTER))
+        print(f"Published index generation {generation} for {doc_id[:12]}")
+        self._prune(doc_dir, generation)
+        self.evict(keep=doc_id)
+        return os.path.join(doc_dir, generation)
+
+    def touch(self, doc_id: str):
+        """Mark a document as used, so eviction keeps it for another retention period"""
+        try:
+            os.utime(os.path.join(self.doc_dir(doc_id), CURRENT_POINTER))
+        except OSError:
+            pass
+
+    def last_used(self, doc_id: str) -> float:
+        doc_dir = self.doc_dir(doc_id)
+        pointer = os.path.join(doc_dir, CURRENT_POINTER)
+        # A document still being published for the first time has no pointer yet
+        return os.path.getmtime(pointer if os.path.exists(pointer) else doc_dir)
+
+    def evict(self, keep: str = None) -> int:
+        """Delete documents unused for INDEX_RETENTION_HOURS, then the least recently used
+        beyond INDEX_MAX_DOCUMENTS. Returns how many were deleted."""
+        try:
+            doc_ids = [name for name in os.listdir(self.root)
+                       if name != keep and not name.startswith(".") and os.path.isdir(self.doc_dir(name))]
+        except OSError:
+            return 0
+        used = {}
+        for doc_id in doc_ids:
+            try:
+                used[doc_id] = self.last_used(doc_id)
+            except OSError:
+                pass  # Deleted meanwhile by another process
+        by_age = sorted(used, key=used.get)
+        expired = set()
+        if Config.INDEX_RETENTION_HOURS > 0:
+            cutoff = time.time() - Config.INDEX_RETENTION_HOURS * 3600
+            expired.update(doc_id for doc_id in by_age if used[doc_id] < cutoff)
+        if Config.INDEX_MAX_DOCUMENTS > 0:
+            # `keep` counts towards the limit too
+            excess = len(by_age) + (keep is not None) - Config.INDEX_MAX_DOCUMENTS
+            expired.update(by_age[:max(0, excess)])
+        for doc_id in expired:
+            shutil.rmtree(self.doc_dir(doc_id), ignore_errors=True)
+        if expired:
+            print(f"Evicted {len(expired)} stored document(s) from {self.root}")
+        return len(expired)
+
+    @staticmethod
+    def read_meta(generation_dir: str) -> Dict:
+        with open(os.path.join(generation_dir, META_FILE), encoding="utf-8") as f:
+            return json.load(f)
+
+    @staticmethod
+    def _fsync_dir(directory: str):
+        for name in os.listdir(directory):
+            with open(os.path.join(directory, name), "rb") as f:
+                os.fsync(f.fileno())
+
+    @staticmethod
+    def _prune(doc_dir: str, current: str):
+        generations = sorted(name for name in os.listdir(doc_dir) if name.startswith("gen-") and name != current)
+        stale = generations[:max(0, len(generations) - (Config.INDEX_GENERATIONS_KEPT - 1))]
+        for name in stale:
+            shutil.rmtree(os.path.join(doc_dir, name), ignore_errors=True)
@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import os
+import shutil
+from array import array
+from bisect import bisect_right
+from typing import Callable, Dict, Iterator, List, Tuple
+from config import Config
+from utils.boilerplate import BoilerplateFilter
+from utils.chunker import PAGE_MARKER
+from utils.pdf_processor import join_pages
+from utils.index_store import MappedTexts
+from utils.lazy import lazy_import
+from utils.quantization import QuantizedIndex, get_codec, normalize_rows
+from utils.relevance import RelevanceCalibrator
+
+np = lazy_import("numpy")
+
+
+class IncrementalIndexWriter:
+    """Appends chunks and their embeddings to an index generation directory batch by batch.
+
+    Produces the same files as VectorStore._write_generation, but only one batch is in
+    memory at a time: texts, codes and rescoring vectors go to raw files that are turned
+    into .npy arrays by finish(). The "pq" codebooks are fitted on the first
+    PQ_TRAINING_SAMPLE vectors; until then those vectors wait unencoded.
+    """
+
+    def __init__(self, directory: str, mode: str = None):
+        self.directory = directory
+        self.mode = mode or Config.EMBEDDING_STORAGE
+        self.codec = get_codec(self.mode)
+        self.fitted = self.mode != "pq"
+        self.count = 0
+        self.dim = 0
+        self.offsets = array("q", [0])
+        self.pages = array("i")
+        self._untrained: List = []
+        self._files = {}
+
+    def _append(self, name: str, array):
+        if name not in self._files:
+            self._files[name] = (open(os.path.join(self.directory, f"{name}.raw"), "wb"), array.dtype, array.shape[1:])
+        self._files[name][0].write(np.ascontiguousarray(array).tobytes())
+
+    def add(self, texts: List[str], pages: List[int], embeddings):
+        vectors = normalize_rows(embeddings)
+        self.dim = vectors.shape[1]
+        self.count += len(texts)
+        with open(os.path.join(self.directory, "chunks.bin"), "ab") as f:
+            for text in texts:
+                data = text.encode("utf-8")
+                f.write(data)
+                self.offsets.append(self.offsets[-1] + len(data))
+        self.pages.extend(pages)
+        if self.mode != "float32":
+            self._append("vectors", vectors)
+
+        if self.fitted:
+            self._encode(vectors)
+            return
+        self._untrained.append(vectors)
+        if sum(len(v) for v in self._untrained) >= Config.PQ_TRAINING_SAMPLE:
+            self._fit_pending()
+
+    def _fit_pending(self):
+        pending = np.concatenate(self._untrained)
+        self._untrained = []
+        self.codec.fit(pending)
+        self.fitted = True
+        self._encode(pending)
+
+    def _encode(self, vectors):
+        codes = self.codec.encode(vectors)
+        if self.mode == "int8":
+            self._append("codes", codes[0])
+            self._append("scales", codes[1])
+        else:
+            self._append("codes", codes)
+
+    def finish(self) -> Dict:
+        """Write the .npy arrays and return the index metadata for QuantizedIndex.load"""
+        if self._untrained:
+            self._fit_pending()
+        if self.mode == "pq" and self.codec.codebooks is not None:
+            np.savez(os.path.join(self.directory, "codebooks.npz"), *self.codec.codebooks)
+        for name, (f, dtype, shape) in self._files.items():
+            f.close()
+            _raw_to_npy(os.path.join(self.directory, f"{name}.raw"), os.path.join(self.directory, f"{name}.npy"),
+                        dtype, (self.count,) + shape)
+        self._files = {}
+        np.save(os.path.join(self.directory, "chunks_offsets.npy"), np.frombuffer(self.offsets, dtype=np.int64))
+        np.save(os.path.join(self.directory, "pages.npy"), np.frombuffer(self.pages, dtype=np.int32))
+        return {"mode": self.mode, "count": self.count, "dim": self.dim}
+
+
+def _raw_to_npy(raw_path: str, npy_path: str, dtype, shape: Tuple[int, ...]):
+    """Prefix a raw array dump with a .npy header (streamed, never loaded into memory)"""
+    with open(npy_path, "wb") as out:
+        np.lib.format.write_array_header_1_0(out, {
+            "descr": np.lib.format.dtype_to_descr(np.dtype(dtype)),
+            "fortran_order": False,
+            "shape": shape,
+        })
+        with open(raw_path, "rb") as raw:
+            shutil.copyfileobj(raw, out, 1024 * 1024)
+    os.remove(raw_path)
+
+
+def chunk_start_pages(text: str, chunks: List[str]) -> List[int]:
+    """Page each chunk starts on, for chunkers that return plain strings (CHUNKER = "recursive")"""
+    markers = [(m.start(), int(m.group(1))) for m in PAGE_MARKER.finditer(text)]
+    starts = [start for start, _ in markers]
+    pages, cursor = [], 0
+    for chunk in chunks:
+        found = text.find(chunk, cursor)
+        if found >= 0:
+            cursor = found
+        i = bisect_right(starts, cursor) - 1
+        pages.append(markers[max(i, 0)][1] if markers else 1)
+    return pages
+
+
+def iter_chunk_batches(processor, path: str) -> Iterator[Tuple[List[str], List[int]]]:
+    """(chunk texts, start pages) in batches of LARGE_DOCUMENT_EMBED_BATCH, reading
+    LARGE_DOCUMENT_PAGE_WINDOW pages at a time. Chunks do not cross window boundaries.
+    Repeated headers and footers are stripped per window, learning from all pages so far.
+    Windows are split by processor.split_text, so CHUNKER applies as for small uploads."""
+    window_size = Config.LARGE_DOCUMENT_PAGE_WINDOW
+    cleanup = BoilerplateFilter() if Config.STRIP_BOILERPLATE else None
+    window, texts, pages = [], [], []
+
+    def split_window():
+        text = join_pages(cleanup.clean(window) if cleanup else window)
+        spans = processor.split_text(text)
+        texts.extend(spans)
+        pages.extend(spans.pages if hasattr(spans, "pages") else chunk_start_pages(text, spans))
+        window.clear()
+
+    for page in processor.iter_page_texts(path, release_every=window_size):
+        window.append(page)
+        if len(window) >= window_size:
+            split_window()
+        while len(texts) >= Config.LARGE_DOCUMENT_EMBED_BATCH:
+            batch = Config.LARGE_DOCUMENT_EMBED_BATCH
+            yield texts[:batch], pages[:batch]
+            del texts[:batch], pages[:batch]
+    if window:
+        split_window()
+    if cleanup and cleanup.chars_removed:
+        processor.record_boilerplate(cleanup)
+    for start in range(0, len(texts), Config.LARGE_DOCUMENT_EMBED_BATCH):
+        yield texts[start:start + Config.LARGE_DOCUMENT_EMBED_BATCH], pages[start:start + Config.LARGE_DOCUMENT_EMBED_BATCH]
+
+
+def index_large_document(processor, vector_store, path: str, filename: str, doc_id: str,
+                         embed_documents: Callable[[List[str]], List[List[float]]] = None) -> int:
+    """Extract, chunk, embed and index a PDF on disk with memory bounded by the page
+    window and embedding batch, then serve it from the published memory-mapped index.
+
+    Extractive sentence indexes are not built in this mode. Returns the chunk count.
+    """
+    if not Config.PERSIST_INDEX:
+        raise Exception("Large-document mode needs PERSIST_INDEX: the index is built on disk")
+    embed_documents = embed_documents or vector_store.embeddings.embed_documents
+
+    def write(directory: str) -> Dict:
+        writer = IncrementalIndexWriter(directory)
+        for texts, pages in iter_chunk_batches(processor, path):
+            writer.add(texts, pages, embed_documents(texts))
+            print(f"Indexed {writer.count} chunks (through page {pages[-1]})")
+        index_meta = writer.finish()
+        if not writer.count:
+            raise Exception("No meaningful text chunks could be created from the PDF")
+        calibration = RelevanceCalibrator().calibrate(
+            QuantizedIndex.load(directory, index_meta), MappedTexts(directory, "chunks"), embed_documents)
+        return {"source": filename, "pages": True, "index": index_meta, "calibration": calibration}
+
+    vector_store.store.publish(doc_id, write)
+    vector_store.load_from_store(doc_id)
+    return len(vector_store.documents)
@@ -0,0 +1,55 @@
+import importlib
+import threading
+
+_missing = object()
+
+
+class LazyModule:
+    """Stand-in for a module that is only imported on first attribute access.
+
+    Keeps heavy dependencies (numpy, langchain, PyPDF2, ...) off the import path of
+    the app so the first page renders before they are loaded.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """Return a proxy that imports `name` the first time it is used"""
+    return LazyModule(name)
+
+
+_optional_cache = {}
+_optional_lock = threading.Lock()
+
+
+def optional_import(name: str):
+    """Import an optional dependency once, returning None if it is not installed"""
+    module = _optional_cache.get(name, _missing)
+    if module is _missing:
+        with _optional_lock:
+            module = _optional_cache.get(name, _missing)
+            if module is _missing:
+                try:
+                    module = importlib.import_module(name)
+                except ImportError:
+                    module = None
+                _optional_cache[name] = module
+    return module
@@ -0,0 +1,65 @@
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, List, Tuple
+from config import Config
+
+
+class MicroBatcher:
+    """Groups concurrent single requests into batch calls.
+
+    The first request for a group opens a window of `window_ms`; every request for the
+    same group that arrives before it closes (up to `max_batch`) is handed to
+    `batch_fn(group, items)` in one call, which must return one result per item.
+    """
+
+    def __init__(self, batch_fn: Callable[[Hashable, List[Any]], List[Any]], window_ms: float = None, max_batch: int = None):
+        self.batch_fn = batch_fn
+        self.window = (Config.RETRIEVAL_BATCH_WINDOW_MS if window_ms is None else window_ms) / 1000.0
+        self.max_batch = max_batch or Config.RETRIEVAL_MAX_BATCH
+        self._pending: Dict[Hashable, List[Tuple[Any, Future]]] = {}
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+
+    def submit(self, group: Hashable, item: Any) -> Future:
+        future = Future()
+        with self._lock:
+            pending = self._pending.get(group)
+            opened = pending is None
+            if opened:
+                pending = self._pending[group] = []
+            pending.append((item, future))
+            full = len(pending) >= self.max_batch
+            if full:
+                self._pending.pop(group)
+        if full:
+            threading.Thread(target=self._run, args=(group, pending), daemon=True).start()
+        elif opened:
+            threading.Timer(self.window, self._flush, args=(group, pending)).start()
+        return future
+
+    def _flush(self, group: Hashable, pending: List[Tuple[Any, Future]]):
+        with self._lock:
+            # Already dispatched if the batch filled up before the window closed
+            if self._pending.get(group) is not pending:
+                return
+            self._pending.pop(group)
+        self._run(group, pending)
+
+    def _run(self, group: Hashable, pending: List[Tuple[Any, Future]]):
+        with self._lock:
+            self.batches += 1
+            self.items += len(pending)
+        try:
+            results = self.batch_fn(group, [item for item, _ in pending])
+        except Exception as e:
+            for _, future in pending:
+                future.set_exception(e)
+            return
+        for (_, future), result in zip(pending, results):
+            future.set_result(result)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {"batches": self.batches, "items": self.items,
+                    "mean_batch": self.items / self.batches if self.batches else 0.0}
@@ -0,0 +1,173 @@
+import re
+import threading
+import time
+from typing import Callable, Dict, Optional
+from config import Config
+from utils.upstream import call_timeout, get_upstream
+
+# Questions that need reasoning or synthesis rather than a lookup
+COMPLEX_INTENT_PATTERN = (r'\b(explain|why|compare|comparison|difference|differences|analy[sz]e|analysis|'
+                          r'summar(y|ize|ise)|evaluate|pros and cons|step[- ]by[- ]step|implications?|recommend)\b')
+
+# Phrases a small model uses when it could not answer from what it was given
+LOW_CONFIDENCE_PATTERN = (r"\b(i don't know|i do not know|not sure|i'm unable|i am unable|couldn't find|could not find|"
+                          r"no information|doesn't (mention|contain|say|specify)|does not (mention|contain|say|specify)|"
+                          r"not (mentioned|provided|included|specified) in)\b")
+
+# Request kinds made by background jobs rather than for a waiting user
+BACKGROUND_KINDS = ("summary_map", "summary_reduce")
+
+
+class StubResponse:
+    def __init__(self, content: str, prompt_tokens: int, completion_tokens: int):
+        self.content = content
+        self.response_metadata = {"token_usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }}
+
+
+class StubChatModel:
+    """Deterministic local chat model for tests, load tests and offline development.
+
+    Answers with the first sentence of the prompt's context block (or a canned
+    reply) after an optional fixed latency, and reports estimated token usage.
+    """
+
+    def __init__(self, name: str = "stub", latency: float = 0.0, reply: Optional[str] = None):
+        self.model_name = name
+        self.latency = latency
+        self.reply = reply
+
+    def invoke(self, prompt, **kwargs) -> StubResponse:
+        if self.latency:
+            time.sleep(self.latency)
+        text = prompt if isinstance(prompt, str) else "\n".join(getattr(m, "content", str(m)) for m in prompt)
+        if self.reply is not None:
+            content = self.reply
+        else:
+            match = re.search(r'Context from PDF:\s*(.+?)(?<=[.!?])\s', text, re.DOTALL)
+            content = match.group(1).strip() if match else f"[{self.model_name}] OK"
+        return StubResponse(content, estimate_tokens(text), estimate_tokens(content))
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def create_chat_model(model_name: str):
+    """Chat model for a tier; "stub" gives the local StubChatModel"""
+    if model_name == "stub":
+        return StubChatModel()
+    from langchain_openai import ChatOpenAI
+    # Retries and timeouts are handled by utils/upstream.py
+    return ChatOpenAI(api_key=Config.OPENAI_API_KEY, base_url=Config.OPENAI_BASE_URL, model=model_name, temperature=0.1,
+                      timeout=Config.UPSTREAM_TIMEOUT, max_retries=0)
+
+
+class ModelRouter:
+    """Sends each LLM request to the fast or the full model tier.
+
+    Small talk, query rewrites and per-batch summaries always go to the fast tier.
+    PDF answers go there when retrieval is confident, the context is short and the
+    question is a lookup rather than an explanation or comparison. A fast answer that reads as unsure is
+    retried on the full tier when escalation is enabled (only sensible when the full model is the
+    stronger one). Per-tier call counts,
+    latency and token usage are recorded.
+    """
+
+    def __init__(self, full_model_factory: Callable = None, fast_model_factory: Callable = None):
+        self._factories = {
+            "full": full_model_factory or (lambda: create_chat_model(Config.CHAT_MODEL)),
+            "fast": fast_model_factory or (lambda: create_chat_model(Config.FAST_CHAT_MODEL)),
+        }
+        self._models = {}
+        self._lock = threading.Lock()
+        self._stats = {tier: {"calls": 0, "seconds": 0.0, "max_seconds": 0.0, "prompt_tokens": 0,
+                              "completion_tokens": 0}
+                       for tier in self._factories}
+        self.escalations = 0
+        self._local = threading.local()
+
+    def model(self, tier: str):
+        if tier not in self._models:
+            with self._lock:
+                if tier not in self._models:
+                    self._models[tier] = self._factories[tier]()
+        return self._models[tier]
+
+    def choose(self, kind: str, question: str, context: str = "", retrieval_score: Optional[float] = None) -> str:
+        """Pick "fast" or "full" for a request"""
+        if not Config.ENABLE_MODEL_ROUTING:
+            return "full"
+        if kind in ("conversational", "rewrite", "summary_map"):
+            return "fast"
+        if re.search(COMPLEX_INTENT_PATTERN, question.lower()):
+            return "full"
+        if kind == "pdf":
+            confident = retrieval_score is not None and retrieval_score >= Config.ROUTER_FAST_MIN_CONFIDENCE
+            short = len(context) <= Config.ROUTER_FAST_MAX_CONTEXT_CHARS
+            return "fast" if confident and short else "full"
+        return "full"
+
+    def invoke(self, prompt, kind: str, question: str, context: str = "", retrieval_score: Optional[float] = None) -> str:
+        """Run the prompt on the chosen tier (escalating if needed) and return the answer text"""
+        tier = self.choose(kind, question, context, retrieval_score)
+        # Background summary calls are long and nobody waits on their tail: not hedged
+        hedge = kind not in BACKGROUND_KINDS
+        text = self._invoke_tier(tier, prompt, hedge)
+        if tier == "fast" and kind == "pdf" and Config.ROUTER_ESCALATE and self.looks_low_confidence(text):
+            print("Fast model answer looks unsure, escalating to the full model")
+            with self._lock:
+                self.escalations += 1
+            text = self._invoke_tier("full", prompt, hedge)
+        return text
+
+    @staticmethod
+    def looks_low_confidence(text: str) -> bool:
+        return len(text.strip()) < 20 or re.search(LOW_CONFIDENCE_PATTERN, text.lower()) is not None
+
+    def _call_model(self, tier: str, prompt):
+        # The HTTP request ends with the deadline, so an abandoned attempt frees its worker
+        return self.model(tier).invoke(prompt, timeout=call_timeout())
+
+    def _invoke_tier(self, tier: str, prompt, hedge: bool = True) -> str:
+        start = time.perf_counter()
+        # Within the request deadline, behind the tier's circuit breaker, hedged at its p95 latency
+        response = get_upstream(f"chat:{tier}").call(self._call_model, tier, prompt, hedge=hedge)
+        elapsed = time.perf_counter() - start
+        text = response.content if hasattr(response, 'content') else str(response)
+        usage = (getattr(response, "response_metadata", None) or {}).get("token_usage") or {}
+        prompt_text = prompt if isinstance(prompt, str) else "".join(getattr(m, "content", "") for m in prompt)
+        prompt_tokens = usage.get("prompt_tokens") or estimate_tokens(prompt_text)
+        completion_tokens = usage.get("completion_tokens") or estimate_tokens(text)
+        with self._lock:
+            stats = self._stats[tier]
+            stats["calls"] += 1
+            stats["seconds"] += elapsed
+            stats["max_seconds"] = max(stats["max_seconds"], elapsed)
+            stats["prompt_tokens"] += prompt_tokens
+            stats["completion_tokens"] += completion_tokens
+        self._local.last_request = {"tier": tier, "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens}
+        print(f"LLM call on {tier} tier took {elapsed:.2f}s ({prompt_tokens} prompt tokens)")
+        return text
+
+    def last_request(self) -> Optional[Dict]:
+        """Tier and token counts of this thread's most recent LLM call"""
+        return getattr(self._local, "last_request", None)
+
+    def stats(self) -> Dict:
+        """Per-tier calls, mean/max latency and token totals, plus escalation count"""
+        with self._lock:
+            report = {}
+            for tier, s in self._stats.items():
+                report[tier] = {
+                    "calls": s["calls"],
+                    "mean_seconds": s["seconds"] / s["calls"] if s["calls"] else 0.0,
+                    "max_seconds": s["max_seconds"],
+                    "prompt_tokens": s["prompt_tokens"],
+                    "completion_tokens": s["completion_tokens"],
+                }
+            report["escalations"] = self.escalations
+            return report
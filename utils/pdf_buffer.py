@@ -0,0 +1,168 @@
+import hashlib
+import io
+import mmap
+import os
+import shutil
+import tempfile
+
+
+class MemoryViewReader(io.RawIOBase):
+    """Seekable read-only stream over a memoryview; reads copy only the requested slice"""
+
+    def __init__(self, view: memoryview):
+        self._view = view
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        n = max(0, min(len(b), len(self._view) - self._pos))
+        b[:n] = self._view[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self._pos = offset
+        elif whence == io.SEEK_CUR:
+            self._pos += offset
+        elif whence == io.SEEK_END:
+            self._pos = len(self._view) + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        self._pos = max(0, self._pos)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+
+class PDFBuffer:
+    """One immutable copy of a PDF's bytes shared by parsing, OCR rasterization, hashing and saving.
+
+    Wraps either the upload's own buffer (no copy) or a memory-mapped file. A file path is
+    only materialized when a consumer needs one (the OCR rasterizer), and then only once.
+    """
+
+    def __init__(self, data, path: str = None):
+        self._view = memoryview(data).cast("B").toreadonly()
+        self._path = path
+        self._owns_path = False
+        self._mmap = None
+        self._file = None
+        self._sha256 = None
+
+    @classmethod
+    def from_upload(cls, uploaded_file) -> "PDFBuffer":
+        """Wrap a Streamlit UploadedFile (or any BytesIO) without copying its contents"""
+        return cls(uploaded_file.getbuffer())
+
+    @classmethod
+    def from_path(cls, path: str) -> "PDFBuffer":
+        """Memory-map a PDF on disk; pages are loaded lazily by the OS"""
+        f = open(path, "rb")
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            f.close()
+            raise
+        buffer = cls(mapped, path=path)
+        buffer._mmap = mapped
+        buffer._file = f
+        return buffer
+
+    @classmethod
+    def spool(cls, fileobj, directory: str = None, block_size: int = 1024 * 1024) -> "PDFBuffer":
+        """Copy an upload to a temp file block by block (hashing on the way) and map it.
+
+        The file is deleted on close. Used for large documents, which are then read
+        through the file rather than held in memory.
+        """
+        fd, path = tempfile.mkstemp(suffix=".pdf", dir=directory)
+        digest = hashlib.sha256()
+        try:
+            with os.fdopen(fd, "wb") as out:
+                fileobj.seek(0)
+                while True:
+                    block = fileobj.read(block_size)
+                    if not block:
+                        break
+                    digest.update(block)
+                    out.write(block)
+            buffer = cls.from_path(path)
+        except Exception:
+            os.remove(path)
+            raise
+        buffer._owns_path = True
+        buffer._sha256 = digest.hexdigest()
+        return buffer
+
+    @classmethod
+    def wrap(cls, pdf_bytes) -> "PDFBuffer":
+        """Accept a PDFBuffer, BytesIO, bytes-like object or file path"""
+        if isinstance(pdf_bytes, PDFBuffer):
+            return pdf_bytes
+        if isinstance(pdf_bytes, (str, os.PathLike)):
+            return cls.from_path(os.fspath(pdf_bytes))
+        if hasattr(pdf_bytes, "getbuffer"):
+            return cls(pdf_bytes.getbuffer())
+        return cls(pdf_bytes)
+
+    def __len__(self) -> int:
+        return len(self._view)
+
+    def view(self) -> memoryview:
+        return self._view
+
+    def stream(self) -> io.BufferedReader:
+        """A fresh seekable file object over the shared bytes (for PyPDF2)"""
+        return io.BufferedReader(MemoryViewReader(self._view))
+
+    def sha256(self) -> str:
+        if self._sha256 is None:
+            self._sha256 = hashlib.sha256(self._view).hexdigest()
+        return self._sha256
+
+    def as_path(self) -> str:
+        """Path of a file holding these bytes, writing a temp file on first use"""
+        if self._path is None:
+            fd, path = tempfile.mkstemp(suffix=".pdf")
+            with os.fdopen(fd, "wb") as f:
+                f.write(self._view)
+            self._path = path
+            self._owns_path = True
+        return self._path
+
+    def save(self, file_path: str):
+        """Persist the bytes, letting the kernel copy when they already live in a file"""
+        if self._path is not None:
+            shutil.copyfile(self._path, file_path)
+        else:
+            with open(file_path, "wb") as f:
+                f.write(self._view)
+
+    def close(self):
+        self._view.release()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._owns_path and self._path:
+            try:
+                os.remove(self._path)
+            except OSError:
+                pass
+        self._path = None
+        self._owns_path = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -1,93 +1,190 @@
-import PyPDF2
 import os
-from typing import List
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+import threading
+from functools import cached_property
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
 from config import Config
-from io import BytesIO
+from utils.pdf_buffer import PDFBuffer
+from utils.chunker import TextChunker
+from utils.boilerplate import BoilerplateFilter
+from utils.lazy import lazy_import, optional_import
+
+PyPDF2 = lazy_import("PyPDF2")
+
+
+def load_ocr():
+    """Return (convert_from_path, pytesseract) when the OCR dependencies are installed, else None"""
+    pdf2image = optional_import("pdf2image")
+    pytesseract = optional_import("pytesseract")
+    if pdf2image is None or pytesseract is None or optional_import("PIL") is None:
+        return None
+    return pdf2image.convert_from_path, pytesseract
+
+
+def join_pages(pages: Sequence[Tuple[int, str]]) -> str:
+    """Page texts joined with the page markers the chunker maps back to page numbers"""
+    return "".join(f"\n--- Page {page_number} ---\n{page_text}" for page_number, page_text in pages)
 
-# OCR dependencies
-try:
-    from pdf2image import convert_from_bytes
-    from PIL import Image
-    import pytesseract
-    HAS_OCR = True
-except ImportError:
-    HAS_OCR = False
 
 class PDFProcessor:
     def __init__(self):
-        self.text_splitter = RecursiveCharacterTextSplitter(
+        self.chunker = TextChunker()
+        self._boilerplate_stats = {"documents": 0, "chars_removed": 0, "lines_removed": 0, "chunks_removed": 0}
+        self._stats_lock = threading.Lock()
+
+    @cached_property
+    def text_splitter(self):
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+        return RecursiveCharacterTextSplitter(
             chunk_size=Config.CHUNK_SIZE,
             chunk_overlap=Config.CHUNK_OVERLAP,
             length_function=len,
         )
 
-    def extract_text_from_pdf_bytes(self, pdf_bytes: BytesIO) -> str:
+    def extract_text_from_pdf_bytes(self, pdf_bytes: PDFBuffer) -> str:
         """Extract text from PDF file-like object (in-memory), with OCR fallback for scanned/image-based PDFs."""
-        text = ""
+        return join_pages(self.extract_pages(pdf_bytes))
+
+    def extract_pages(self, pdf_bytes: PDFBuffer) -> List[Tuple[int, str]]:
+        """(page number, text) for every page with text, read from an in-memory PDF"""
+        owns_buffer = not isinstance(pdf_bytes, PDFBuffer)
+        pdf_bytes = PDFBuffer.wrap(pdf_bytes)
         try:
-            pdf_reader = PyPDF2.PdfReader(pdf_bytes)
-            print(f"PDF has {len(pdf_reader.pages)} pages (in-memory)")
-            for page_num, page in enumerate(pdf_reader.pages):
-                page_text = ""
-                try:
-                    page_text = page.extract_text()
-                except Exception as e:
-                    print(f"Error extracting text from page {page_num + 1}: {e}")
-                if not page_text or not page_text.strip():
-                    print(f"Page {page_num + 1} appears to be empty or image-based. Trying OCR...")
-                    if HAS_OCR:
-                        try:
-                            # Convert the specific page to image and OCR
-                            images = convert_from_bytes(pdf_bytes.getvalue(), first_page=page_num+1, last_page=page_num+1)
-                            ocr_text = ""
-                            for img in images:
-                                ocr_text += pytesseract.image_to_string(img)
-                            if ocr_text.strip():
-                                page_text = ocr_text
-                                print(f"OCR extracted {len(ocr_text)} characters from page {page_num + 1}")
-                            else:
-                                print(f"OCR failed to extract text from page {page_num + 1}")
-                        except Exception as ocr_e:
-                            print(f"OCR error on page {page_num + 1}: {ocr_e}")
-                    else:
-                        print("OCR dependencies not installed. Skipping OCR.")
-                if page_text and page_text.strip():
-                    text += f"\n--- Page {page_num + 1} ---\n"
-                    text += page_text
-                else:
-                    print(f"No text extracted from page {page_num + 1}")
-            print(f"Total extracted text length: {len(text)} characters (in-memory)")
-            if not text.strip():
+            pages = list(self.iter_page_texts(pdf_bytes))
+            total = sum(len(page_text) for _, page_text in pages)
+            print(f"Total extracted text length: {total} characters (in-memory)")
+            if not any(page_text.strip() for _, page_text in pages):
                 raise Exception("No text could be extracted from any page of the PDF (in-memory)")
+            text = pages[0][1]
             sample_text = text[:500] + "..." if len(text) > 500 else text
             print(f"Sample extracted text: {sample_text}")
-            return text
+            return pages
         except Exception as e:
             raise Exception(f"Error reading PDF (in-memory): {str(e)}")
+        finally:
+            if owns_buffer:
+                pdf_bytes.close()
 
-    def process_pdf_bytes(self, pdf_bytes: BytesIO) -> List[str]:
-        text = self.extract_text_from_pdf_bytes(pdf_bytes)
+    def iter_page_texts(self, source, release_every: int = None) -> Iterator[Tuple[int, str]]:
+        """Yield (page number, text) for every page with text, OCR-ing image-only pages.
+
+        `source` is a PDFBuffer or a file path. A path is read through a plain file
+        handle, so a large document is never held in memory; with `release_every`,
+        PyPDF2's cache of parsed objects is dropped after that many pages.
+        """
+        if isinstance(source, PDFBuffer):
+            stream, as_path = source.stream(), source.as_path
+        else:
+            stream, as_path = open(source, "rb"), lambda: source
+        with stream:
+            pdf_reader = PyPDF2.PdfReader(stream)
+            print(f"PDF has {len(pdf_reader.pages)} pages")
+            for page_num in range(len(pdf_reader.pages)):
+                page_text = self._page_text(pdf_reader.pages[page_num], page_num, as_path)
+                if page_text and page_text.strip():
+                    yield page_num + 1, page_text
+                else:
+                    print(f"No text extracted from page {page_num + 1}")
+                if release_every and (page_num + 1) % release_every == 0:
+                    # Decoded content streams and fonts stay cached on the reader otherwise
+                    pdf_reader.resolved_objects.clear()
+
+    def _page_text(self, page, page_num: int, as_path: Callable[[], str]) -> str:
+        page_text = ""
+        try:
+            page_text = page.extract_text()
+        except Exception as e:
+            print(f"Error extracting text from page {page_num + 1}: {e}")
+        if not page_text or not page_text.strip():
+            print(f"Page {page_num + 1} appears to be empty or image-based. Trying OCR...")
+            ocr = load_ocr()
+            if ocr:
+                convert_from_path, pytesseract = ocr
+                try:
+                    # Convert the specific page to image and OCR; the rasterizer reads the
+                    # shared file instead of receiving a fresh copy of the document per page
+                    images = convert_from_path(as_path(), first_page=page_num+1, last_page=page_num+1)
+                    ocr_text = ""
+                    for img in images:
+                        ocr_text += pytesseract.image_to_string(img)
+                    if ocr_text.strip():
+                        page_text = ocr_text
+                        print(f"OCR extracted {len(ocr_text)} characters from page {page_num + 1}")
+                    else:
+                        print(f"OCR failed to extract text from page {page_num + 1}")
+                except Exception as ocr_e:
+                    print(f"OCR error on page {page_num + 1}: {ocr_e}")
+            else:
+                print("OCR dependencies not installed. Skipping OCR.")
+        return page_text
+
+    def process_pdf_bytes(self, pdf_bytes: PDFBuffer) -> Sequence[str]:
+        pages = self.extract_pages(pdf_bytes)
+        text = join_pages(pages)
         if not text.strip():
             raise Exception("No text could be extracted from the PDF (in-memory)")
-        chunks = self.text_splitter.split_text(text)
-        print(f"Split text into {len(chunks)} chunks (in-memory)")
-        filtered_chunks = [chunk for chunk in chunks if len(chunk.strip()) > 50]
-        print(f"After filtering short chunks: {len(filtered_chunks)} chunks remain (in-memory)")
+        if Config.STRIP_BOILERPLATE:
+            # Running headers, footers and page numbers would otherwise be embedded in every chunk
+            cleanup = BoilerplateFilter()
+            pages = cleanup.clean(pages)
+            if cleanup.chars_removed:
+                text = join_pages(pages)
+                self.record_boilerplate(cleanup)
+        filtered_chunks = self.split_text(text)
         if not filtered_chunks:
             raise Exception("No meaningful text chunks could be created from the PDF (in-memory)")
         for i, chunk in enumerate(filtered_chunks[:3]):
             print(f"Chunk {i+1} sample: {chunk[:200]}... (in-memory)")
         return filtered_chunks
 
+    def split_text(self, text: str) -> Sequence[str]:
+        """Chunks of the extracted text, short chunks dropped"""
+        if Config.CHUNKER == "recursive":
+            chunks = self.text_splitter.split_text(text)
+            print(f"Split text into {len(chunks)} chunks (in-memory)")
+            filtered_chunks = [chunk for chunk in chunks if len(chunk.strip()) > Config.MIN_CHUNK_LENGTH]
+        else:
+            # Spans over the extracted text; short chunks are filtered while splitting
+            filtered_chunks = self.chunker.split(text)
+            print(f"Split text into {len(filtered_chunks)} chunks (in-memory)")
+        print(f"After filtering short chunks: {len(filtered_chunks)} chunks remain (in-memory)")
+        return filtered_chunks
+
+    def record_boilerplate(self, cleanup: BoilerplateFilter):
+        """Log one document's boilerplate removal and add it to the running totals.
+
+        Chunks removed are estimated as characters removed over the chunk stride
+        (CHUNK_SIZE - CHUNK_OVERLAP) rather than by chunking the text a second time.
+        """
+        report = cleanup.report()
+        stride = Config.CHUNK_SIZE - Config.CHUNK_OVERLAP
+        if Config.CHUNK_LENGTH_UNIT == "tokens":
+            stride *= 4  # Typical characters per token, as in chars_per_token()
+        chunks_removed = round(report["chars_removed"] / stride)
+        print(f"Stripped boilerplate: {report['chars_removed']} characters in {report['lines_removed']} lines "
+              f"over {report['pages']} pages, ~{chunks_removed} fewer chunks (e.g. {report['patterns'][:3]})")
+        with self._stats_lock:
+            stats = self._boilerplate_stats
+            stats["documents"] += 1
+            stats["chars_removed"] += report["chars_removed"]
+            stats["lines_removed"] += report["lines_removed"]
+            stats["chunks_removed"] += chunks_removed
+
+    def boilerplate_stats(self) -> Dict[str, int]:
+        """Documents with boilerplate stripped, and characters, lines and chunks removed from them"""
+        with self._stats_lock:
+            return dict(self._boilerplate_stats)
+
     def save_uploaded_file(self, uploaded_file, filename: str) -> str:
         """Save uploaded file to disk"""
         try:
             os.makedirs(Config.UPLOAD_DIR, exist_ok=True)
             file_path = os.path.join(Config.UPLOAD_DIR, filename)
 
-            with open(file_path, "wb") as f:
-                f.write(uploaded_file.getbuffer())
+            if isinstance(uploaded_file, PDFBuffer):
+                uploaded_file.save(file_path)
+            else:
+                with PDFBuffer.from_upload(uploaded_file) as pdf_buffer:
+                    pdf_buffer.save(file_path)
 
             # Verify file was saved
             if not os.path.exists(file_path):
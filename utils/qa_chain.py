@@ -1,73 +1,43 @@
-from typing import List, Tuple
-from langchain_openai import ChatOpenAI
-from langchain.schema import HumanMessage, SystemMessage
-from langchain.schema import Document
-from langchain.prompts import PromptTemplate
+from __future__ import annotations
+
+from functools import cached_property
+from typing import List, Tuple, TYPE_CHECKING
 from config import Config
 from utils.web_search import WebSearch
+from utils.single_flight import single_flight, normalize_key
+from utils.model_router import ModelRouter, create_chat_model
+from utils.prompts import conversational_messages, pdf_messages, web_messages
+from utils.upstream import UpstreamError
 import logging
 
+if TYPE_CHECKING:
+    from langchain.schema import Document
+
 logger = logging.getLogger(__name__)
 
 class QAChain:
-    def __init__(self):
-        self.llm = ChatOpenAI(
-            api_key=Config.OPENAI_API_KEY,
-            model=Config.CHAT_MODEL,
-            temperature=0.1
-        )
-        self.web_search = WebSearch()
-        
-        # Custom prompt template for PDF-based answers with Ira's personality
-        self.pdf_prompt_template = PromptTemplate(
-            template="""
-You are Ira, a friendly and helpful PDF Q&A assistant. You have a warm, professional personality and always aim to be helpful and engaging.
-
-Use the following pieces of context from the PDF document to answer the question. If you don't know the answer based on the context provided, say so honestly but in a friendly way.
-
-Context from PDF:
-{context}
-
-Question: {question}
-
-Instructions:
-- Answer based on the PDF context provided
-- Be conversational and friendly like "Ira"
-- If the information isn't in the context, say so politely
-- Use a warm, helpful tone
-- Add relevant insights when appropriate
-- Use emojis sparingly (1-2 per response) to maintain friendliness
+    @cached_property
+    def llm(self):
+        """Full-size chat model client, built on first use (or by the startup warm-up)"""
+        return create_chat_model(Config.CHAT_MODEL)
 
-Answer:""",
-            input_variables=["context", "question"]
-        )
-        
-        # Custom prompt template for web/general answers with Ira's personality
-        self.web_prompt_template = PromptTemplate(
-            template="""
-You are Ira, a friendly and knowledgeable AI assistant. You have a warm personality and always try to be helpful.
+    @cached_property
+    def router(self) -> ModelRouter:
+        """Chooses between the fast tier (Config.FAST_CHAT_MODEL) and self.llm per request"""
+        return ModelRouter(full_model_factory=lambda: self.llm)
 
-Web search results (if available):
-{web_context}
+    @cached_property
+    def web_search(self) -> WebSearch:
+        return WebSearch()
 
-Question: {question}
-
-Instructions:
-- Provide a helpful, accurate answer
-- Be conversational and friendly like "Ira"
-- Use your general knowledge and web results to provide comprehensive information
-- Maintain a warm, professional tone
-- Add practical insights when relevant
-- Use emojis sparingly (1-2 per response) to maintain friendliness
-- If you're uncertain about something, say so honestly
-- If web results are provided, use them as context and cite them when relevant
-
-Answer:""",
-            input_variables=["web_context", "question"]
-        )
-    
     def answer_from_pdf(self, question: str, relevant_docs: List[Tuple[Document, float]]) -> str:
         """Generate answer from PDF content with Ira's personality"""
+        # Sessions asking the same question over the same chunks share one LLM call
+        chunks = tuple((doc.metadata.get("source"), doc.metadata.get("chunk_id"), hash(doc.page_content))
+                       for doc, _ in relevant_docs)
+        return single_flight.do("answer", (chunks, normalize_key(question)), self._answer_from_pdf, question, relevant_docs)
+
+    def _answer_from_pdf(self, question: str, relevant_docs: List[Tuple[Document, float]]) -> str:
         try:
             if not relevant_docs:
                 return "I couldn't find relevant information in your PDF to answer that question. Could you try rephrasing it or asking about something else from the document? 😊"
@@ -79,21 +49,20 @@ Answer:""",
             print(f"Context length: {len(context)} characters")
             print(f"Using {len(relevant_docs)} document chunks")
             
-            # Use the custom prompt template
-            prompt = self.pdf_prompt_template.format(
-                context=context,
-                question=question
-            )
+            # Constant system message + per-request context and question
+            prompt = pdf_messages(context, question)
             
-            # Get response from LLM
-            response = self.llm.invoke(prompt)
-            
-            # Extract content from response
-            if hasattr(response, 'content'):
-                return f"📄 **Based on your uploaded PDF:**\n\n{response.content}"
-            else:
-                return f"📄 **Based on your uploaded PDF:**\n\n{str(response)}"
-                
+            # Get response from the LLM tier suited to this request
+            best_similarity = 1 - min(score for _, score in relevant_docs)
+            answer = self.router.invoke(prompt, "pdf", question, context, retrieval_score=best_similarity)
+            return f"📄 **Based on your uploaded PDF:**\n\n{answer}"
+
+        except UpstreamError as e:
+            # The model is down or too slow: the best passage still answers many lookups
+            logger.warning(f"answer_from_pdf without the LLM: {e}")
+            passage = relevant_docs[0][0].page_content.strip()
+            return (f"⏳ I can't reach the language model right now, so here is the most relevant "
+                    f"passage from your PDF:\n\n> {passage[:800]}")
         except Exception as e:
             logger.error(f"Error in answer_from_pdf: {e}")
             return f"I'm sorry, I encountered an error while processing your question about the PDF. Could you please try asking in a different way? 😊"
@@ -106,21 +75,14 @@ Answer:""",
             if not web_context:
                 web_context = "[No web results found]"
             
-            # Use the web prompt template
-            prompt = self.web_prompt_template.format(
-                web_context=web_context,
-                question=question
-            )
+            prompt = web_messages(web_context, question)
             
             # Get response from LLM
-            response = self.llm.invoke(prompt)
-            
-            # Extract content from response
-            if hasattr(response, 'content'):
-                return response.content
-            else:
-                return str(response)
-                
+            return self.router.invoke(prompt, "web", question, web_context)
+
+        except UpstreamError as e:
+            logger.warning(f"answer_from_web unavailable: {e}")
+            return "⏳ I can't reach the language model right now. Please try again in a moment! 😊"
         except Exception as e:
             logger.error(f"Error in answer_from_web: {e}")
             return f"I'm sorry, I encountered an error while trying to answer your question. Let me try to help you in a different way! 😊"
@@ -128,27 +90,8 @@ Answer:""",
     def get_conversational_response(self, message: str) -> str:
         """Generate conversational responses for greetings and casual chat"""
         try:
-            conversational_prompt = f"""
-You are Ira, a friendly PDF Q&A assistant with a warm personality. 
-Respond to this message in a natural, conversational way:
-
-Message: {message}
-
-Keep your response:
-- Warm and friendly
-- Professional but approachable  
-- Brief but engaging
-- Include 1-2 relevant emojis
-- Mention your PDF analysis capabilities if appropriate
-
-Response:"""
-            
-            response = self.llm.invoke(conversational_prompt)
-            
-            if hasattr(response, 'content'):
-                return response.content
-            else:
-                return str(response)
+            conversational_prompt = conversational_messages(message)
+            return self.router.invoke(conversational_prompt, "conversational", message)
                 
         except Exception as e:
             logger.error(f"Error in conversational response: {e}")
@@ -0,0 +1,328 @@
+from __future__ import annotations
+
+import os
+import tempfile
+from typing import Tuple
+from config import Config
+from utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+
+def normalize_rows(vectors) -> np.ndarray:
+    """Return a float32 copy of the vectors scaled to unit length (zero rows stay zero)"""
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class Float32Codec:
+    """Full precision storage, used as the reference for recall measurements"""
+    name = "float32"
+
+    def fit(self, vectors: np.ndarray):
+        return self
+
+    def encode(self, vectors: np.ndarray):
+        return np.ascontiguousarray(vectors, dtype=np.float32)
+
+    def scores(self, codes, query: np.ndarray) -> np.ndarray:
+        return codes @ query
+
+    def batch_scores(self, codes, queries: np.ndarray) -> np.ndarray:
+        return codes @ queries.T
+
+    def nbytes(self, codes) -> int:
+        return codes.nbytes
+
+
+class Float16Codec:
+    """Half precision storage: 2 bytes per dimension"""
+    name = "float16"
+
+    def fit(self, vectors: np.ndarray):
+        return self
+
+    def encode(self, vectors: np.ndarray):
+        return vectors.astype(np.float16)
+
+    def scores(self, codes, query: np.ndarray) -> np.ndarray:
+        return _blocked_dot(codes, query)
+
+    def batch_scores(self, codes, queries: np.ndarray) -> np.ndarray:
+        return _blocked_dot(codes, queries.T)
+
+    def nbytes(self, codes) -> int:
+        return codes.nbytes
+
+
+class Int8Codec:
+    """Symmetric int8 storage with one float32 scale per vector: ~1 byte per dimension"""
+    name = "int8"
+
+    def fit(self, vectors: np.ndarray):
+        return self
+
+    def encode(self, vectors: np.ndarray):
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        values = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return values, scales.astype(np.float32)
+
+    def scores(self, codes, query: np.ndarray) -> np.ndarray:
+        values, scales = codes
+        return _blocked_dot(values, query) * scales
+
+    def batch_scores(self, codes, queries: np.ndarray) -> np.ndarray:
+        values, scales = codes
+        return _blocked_dot(values, queries.T) * scales[:, None]
+
+    def nbytes(self, codes) -> int:
+        values, scales = codes
+        return values.nbytes + scales.nbytes
+
+
+class ProductQuantizer:
+    """Product quantization: each vector becomes one uint8 centroid id per subspace"""
+    name = "pq"
+
+    def __init__(self, num_subspaces: int = None, num_centroids: int = 256, iterations: int = 15, seed: int = 0):
+        self.num_subspaces = num_subspaces or Config.PQ_SUBSPACES
+        self.num_centroids = num_centroids
+        self.iterations = iterations
+        self.seed = seed
+        self.codebooks = None
+
+    def _split(self, vectors: np.ndarray):
+        return np.array_split(vectors, self.num_subspaces, axis=1)
+
+    def fit(self, vectors: np.ndarray):
+        rng = np.random.default_rng(self.seed)
+        k = min(self.num_centroids, len(vectors))
+        self.codebooks = []
+        for sub in self._split(vectors):
+            centroids = sub[rng.choice(len(sub), size=k, replace=False)].copy()
+            for _ in range(self.iterations):
+                assignment = self._assign(sub, centroids)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assignment, sub)
+                counts = np.bincount(assignment, minlength=k)
+                occupied = counts > 0
+                centroids[occupied] = sums[occupied] / counts[occupied, None]
+            self.codebooks.append(centroids)
+        return self
+
+    @staticmethod
+    def _assign(sub: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        # argmin ||x - c||^2 == argmax (x.c - ||c||^2 / 2)
+        return np.argmax(sub @ centroids.T - 0.5 * np.sum(centroids ** 2, axis=1), axis=1)
+
+    def encode(self, vectors: np.ndarray):
+        if self.codebooks is None:
+            raise Exception("Product quantizer must be fitted before encoding")
+        columns = [self._assign(sub, book) for sub, book in zip(self._split(vectors), self.codebooks)]
+        return np.stack(columns, axis=1).astype(np.uint8)
+
+    def scores(self, codes, query: np.ndarray) -> np.ndarray:
+        # Asymmetric distance: one lookup table per subspace, then a gather-and-sum over the codes
+        tables = [book @ q for book, q in zip(self.codebooks, np.array_split(query, self.num_subspaces))]
+        total = np.zeros(len(codes), dtype=np.float32)
+        for j, table in enumerate(tables):
+            total += table[codes[:, j]]
+        return total
+
+    def batch_scores(self, codes, queries: np.ndarray) -> np.ndarray:
+        total = np.zeros((len(codes), len(queries)), dtype=np.float32)
+        for j, (book, sub) in enumerate(zip(self.codebooks, np.array_split(queries, self.num_subspaces, axis=1))):
+            total += (book @ sub.T)[codes[:, j]]
+        return total
+
+    def nbytes(self, codes) -> int:
+        return codes.nbytes + sum(book.nbytes for book in self.codebooks)
+
+
+CODECS = {
+    "float32": Float32Codec,
+    "float16": Float16Codec,
+    "int8": Int8Codec,
+    "pq": ProductQuantizer,
+}
+
+
+def get_codec(mode: str):
+    """Create the codec for a storage mode name"""
+    if mode not in CODECS:
+        raise ValueError(f"Unknown embedding storage mode '{mode}'. Choose one of: {', '.join(CODECS)}")
+    return CODECS[mode]()
+
+
+class QuantizedIndex:
+    """Embedding index that scans compact codes and exactly rescores the best candidates.
+
+    Full precision vectors for rescoring are spilled to a memory-mapped temp file, so
+    only the pages of the rescored rows are touched during a search.
+    """
+
+    def __init__(self, mode: str = None, rescore_multiplier: int = None):
+        self.mode = mode or Config.EMBEDDING_STORAGE
+        self.rescore_multiplier = rescore_multiplier or Config.RESCORE_MULTIPLIER
+        self.codec = get_codec(self.mode)
+        self.codes = None
+        self.full_vectors = None
+        self._spill_path = None
+        self.count = 0
+        self.dim = 0
+
+    def __len__(self):
+        return self.count
+
+    def build(self, embeddings):
+        """Quantize the given embeddings into this (new) index.
+
+        Build a fresh QuantizedIndex for each document and swap it in when complete;
+        rebuilding an index that searches are using would change it under them.
+        """
+        if self.codes is not None:
+            raise Exception("QuantizedIndex.build() on an index that is already built; build a new one")
+        vectors = normalize_rows(embeddings)
+        self.count, self.dim = vectors.shape
+        self.codes = self.codec.fit(vectors).encode(vectors)
+        if self.mode != "float32":
+            self.full_vectors = self._spill(vectors)
+        print(f"Built {self.mode} index: {self.count} vectors, {self.memory_bytes() / max(self.count, 1):.0f} bytes per chunk")
+        return self
+
+    def _spill(self, vectors: np.ndarray) -> np.memmap:
+        os.makedirs(Config.VECTOR_DB_DIR, exist_ok=True)
+        fd, self._spill_path = tempfile.mkstemp(suffix=".f32", dir=Config.VECTOR_DB_DIR)
+        os.close(fd)
+        spilled = np.memmap(self._spill_path, dtype=np.float32, mode="w+", shape=vectors.shape)
+        spilled[:] = vectors
+        spilled.flush()
+        return np.memmap(self._spill_path, dtype=np.float32, mode="r", shape=vectors.shape)
+
+    def save(self, directory: str) -> dict:
+        """Write codes and rescoring vectors as .npy files; returns metadata for load()"""
+        if self.mode == "int8":
+            np.save(os.path.join(directory, "codes.npy"), self.codes[0])
+            np.save(os.path.join(directory, "scales.npy"), self.codes[1])
+        elif self.codes is not None:
+            np.save(os.path.join(directory, "codes.npy"), self.codes)
+        if self.mode == "pq":
+            np.savez(os.path.join(directory, "codebooks.npz"), *self.codec.codebooks)
+        if self.full_vectors is not None:
+            np.save(os.path.join(directory, "vectors.npy"), np.asarray(self.full_vectors))
+        return {"mode": self.mode, "count": self.count, "dim": self.dim}
+
+    @classmethod
+    def load(cls, directory: str, meta: dict, rescore_multiplier: int = None) -> "QuantizedIndex":
+        """Open an index written by save() with every array memory-mapped read-only"""
+        index = cls(meta["mode"], rescore_multiplier)
+        index.count, index.dim = meta["count"], meta["dim"]
+        if not index.count:
+            return index
+
+        def mapped(name):
+            return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+
+        if index.mode == "int8":
+            index.codes = (mapped("codes"), mapped("scales"))
+        else:
+            index.codes = mapped("codes")
+        if index.mode == "pq":
+            with np.load(os.path.join(directory, "codebooks.npz")) as books:
+                index.codec.codebooks = [books[f"arr_{i}"] for i in range(len(books.files))]
+        if os.path.exists(os.path.join(directory, "vectors.npy")):
+            index.full_vectors = mapped("vectors")
+        return index
+
+    def memory_bytes(self) -> int:
+        """Resident bytes used by the scanned codes (the spilled rescoring copy is excluded)"""
+        if self.codes is None:
+            return 0
+        return self.codec.nbytes(self.codes)
+
+    def search(self, query_embedding, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (row indices, cosine similarities) of the top k rows, best first"""
+        if not self.count:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        query = normalize_rows(query_embedding)[0]
+        k = min(k, self.count)
+        approx = self.codec.scores(self.codes, query)
+        if self.full_vectors is None:
+            candidates = _top_k(approx, k)
+            return candidates, approx[candidates].astype(np.float32)
+
+        candidates = _top_k(approx, min(self.count, k * self.rescore_multiplier))
+        candidates.sort()  # sequential reads from the memory map
+        exact = np.asarray(self.full_vectors[candidates]) @ query
+        order = np.argsort(-exact)[:k]
+        return candidates[order], exact[order]
+
+    def search_batch(self, query_embeddings, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Top k for many queries at once: (rows, similarities), each shaped (queries, k).
+
+        The codes are scanned with one matrix-matrix product for all queries, and the
+        union of every query's candidates is rescored with a second one.
+        """
+        queries = normalize_rows(query_embeddings)
+        k = min(k, self.count)
+        if not self.count or not len(queries):
+            return np.empty((len(queries), 0), dtype=np.int64), np.empty((len(queries), 0), dtype=np.float32)
+        approx = self.codec.batch_scores(self.codes, queries)  # (count, queries)
+        if self.full_vectors is None:
+            rows = np.stack([_top_k(approx[:, j], k) for j in range(len(queries))])
+            return rows, np.take_along_axis(approx.T, rows, axis=1).astype(np.float32)
+
+        width = min(self.count, k * self.rescore_multiplier)
+        candidates = [_top_k(approx[:, j], width) for j in range(len(queries))]
+        union = np.unique(np.concatenate(candidates))  # sorted: sequential reads from the memory map
+        exact = np.asarray(self.full_vectors[union]) @ queries.T  # (union, queries)
+        rows, sims = [], []
+        for j, cand in enumerate(candidates):
+            scores = exact[np.searchsorted(union, cand), j]
+            order = np.argsort(-scores)[:k]
+            rows.append(cand[order])
+            sims.append(scores[order])
+        return np.stack(rows), np.stack(sims).astype(np.float32)
+
+    def vectors(self, rows) -> np.ndarray:
+        """Full precision unit vectors for the given rows"""
+        if self.full_vectors is not None:
+            return np.asarray(self.full_vectors[rows])
+        return np.asarray(self.codes[rows], dtype=np.float32)
+
+    def close(self):
+        """Release the rescoring memory map and delete this index's own spill file"""
+        self.full_vectors = None
+        if self._spill_path:
+            try:
+                os.remove(self._spill_path)
+            except OSError:
+                pass
+            self._spill_path = None
+
+    def __del__(self):
+        self.close()
+
+
+def _blocked_dot(codes: np.ndarray, query: np.ndarray, block_rows: int = 4096) -> np.ndarray:
+    """codes @ query (a vector, or a matrix of query columns), widening to float32 one
+    block at a time so BLAS does the work without materializing a full precision copy
+    of the index"""
+    out = np.empty((len(codes),) + query.shape[1:], dtype=np.float32)
+    for start in range(0, len(codes), block_rows):
+        block = codes[start:start + block_rows]
+        out[start:start + len(block)] = block.astype(np.float32) @ query
+    return out
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest scores, sorted best first"""
+    if k >= len(scores):
+        return np.argsort(-scores)
+    part = np.argpartition(-scores, k - 1)[:k]
+    return part[np.argsort(-scores[part])]
@@ -0,0 +1,128 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from config import Config
+
+# Signals that a message leans on earlier turns rather than standing alone
+FOLLOW_UP_PATTERNS = [
+    r'^(and|but|also|so|then|or)\b',
+    r'^(what|how) about\b',
+    r'^(why|how|when|where|which|who)\??$',
+]
+
+# Short messages made only of these words ("tell me more about it", "why is that?")
+# carry no topic of their own; anything with a content word is retrieved as asked
+REFERENCE_WORDS = set("""
+    it its they them their this that these those he she his her him one ones
+    what why how when where which who whom whose
+    is are was were be been do does did can could would should will has have had
+    a an the of to in on for about with from me us you i
+    more further else again too also please tell explain say said mean means meant elaborate expand detail details work works
+""".split())
+FOLLOW_UP_MAX_WORDS = 6
+
+# References that point into a previous answer; concatenation alone can't resolve them
+ORDINAL_PATTERN = (r'\b(the )?(first|second|third|fourth|fifth|last|former|latter|previous|next|other)'
+                   r'( one| ones| point| item| step| option)?\b|\bwhich one\b')
+
+REWRITE_PROMPT = """Rewrite the user's latest message as a standalone search query for a PDF document.
+Resolve pronouns and references (like "it" or "the second one") using the conversation.
+Return only the rewritten query, nothing else.
+
+Conversation:
+{history}
+
+Latest message: {question}
+
+Standalone query:"""
+
+
+def normalize_text(text: str) -> str:
+    return re.sub(r'\s+', ' ', text.strip().lower())
+
+
+class QueryRewriter:
+    """Builds standalone retrieval queries from follow-up questions.
+
+    A local heuristic handles most follow-ups for free; the LLM is only asked when a
+    message refers into an earlier answer (ordinals, "the former", ...). Results are
+    cached per (question, recent turns).
+    """
+
+    def __init__(self, qa_chain=None, context_length: int = None, cache_size: int = None):
+        self.qa_chain = qa_chain
+        self.context_length = context_length or Config.CONVERSATION_CONTEXT_LENGTH
+        self.cache_size = cache_size or Config.QUERY_REWRITE_CACHE_SIZE
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {
+            "queries": 0,
+            "follow_ups": 0,
+            "heuristic_rewrites": 0,
+            "llm_rewrites": 0,
+            "cache_hits": 0,
+            "fallbacks_prevented": 0,
+        }
+
+    def is_follow_up(self, question: str) -> bool:
+        question_lower = normalize_text(question)
+        if re.search(ORDINAL_PATTERN, question_lower):
+            return True
+        if any(re.search(pattern, question_lower) for pattern in FOLLOW_UP_PATTERNS):
+            return True
+        words = re.findall(r"[a-z']+", question_lower)
+        return 0 < len(words) <= FOLLOW_UP_MAX_WORDS and all(word in REFERENCE_WORDS for word in words)
+
+    def _recent_turns(self, messages: List[Dict]) -> List[Dict]:
+        return [m for m in messages if m.get("role") in ("user", "assistant")][-self.context_length:]
+
+    def rewrite(self, question: str, messages: List[Dict]) -> str:
+        """Return a standalone query for `question` given the earlier chat messages"""
+        self._bump("queries")
+        turns = self._recent_turns(messages)
+        previous_questions = [m["content"] for m in turns if m["role"] == "user"]
+        if not previous_questions or not self.is_follow_up(question):
+            return question
+        self._bump("follow_ups")
+
+        key = (normalize_text(question), tuple(normalize_text(m["content"])[:200] for m in turns))
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.stats["cache_hits"] += 1
+                return self._cache[key]
+
+        rewritten = None
+        if Config.QUERY_REWRITE_USE_LLM and self.qa_chain is not None and re.search(ORDINAL_PATTERN, normalize_text(question)):
+            rewritten = self._llm_rewrite(question, turns)
+            if rewritten:
+                self._bump("llm_rewrites")
+        if not rewritten:
+            # The previous question carries the topic; together they embed like a standalone query
+            rewritten = f"{previous_questions[-1]} {question}"
+            self._bump("heuristic_rewrites")
+
+        print(f"Rewrote follow-up '{question[:50]}' -> '{rewritten[:100]}'")
+        with self._lock:
+            self._cache[key] = rewritten
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return rewritten
+
+    def _llm_rewrite(self, question: str, turns: List[Dict]) -> Optional[str]:
+        history = "\n".join(f"{m['role']}: {m['content'][:400]}" for m in turns)
+        try:
+            text = self.qa_chain.router.invoke(REWRITE_PROMPT.format(history=history, question=question), "rewrite", question)
+            return text.strip().strip('"') or None
+        except Exception as e:
+            print(f"LLM query rewrite failed, using heuristic: {e}")
+            return None
+
+    def record_prevented_fallback(self):
+        """Called when the rewritten query reached the PDF but the raw question would not have"""
+        self._bump("fallbacks_prevented")
+
+    def _bump(self, stat: str):
+        with self._lock:
+            self.stats[stat] += 1
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import re
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from config import Config
+from utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+# Questions no uploaded document should be able to answer; their best match against the
+# index shows what "irrelevant" scores look like for this particular document
+OFF_TOPIC_PROBES = [
+    "What is the capital of France?",
+    "How do I bake sourdough bread at home?",
+    "Who won the football world cup in 2018?",
+    "What is the weather like today?",
+    "Tell me a joke about cats.",
+    "How far is the moon from the earth?",
+    "What are the best tourist attractions in Tokyo?",
+    "How do I learn to play the guitar?",
+    "What is the plot of Romeo and Juliet?",
+    "Recommend a good science fiction movie.",
+    "How many calories are in a banana?",
+    "What time zone is New York in?",
+]
+
+_probe_cache = {}
+
+
+def _first_sentence(text: str, max_chars: int = 200) -> str:
+    sentence = re.split(r'(?<=[.!?])\s', text.strip(), maxsplit=1)[0]
+    return sentence[:max_chars]
+
+
+class RelevanceCalibrator:
+    """Derives a per-document relevance cutoff (cosine distance) when the index is built.
+
+    "synthetic" mode embeds pseudo-queries (the first sentence of sampled chunks) and a
+    fixed set of off-topic probes, then places the cutoff between the two best-match
+    score distributions. "chunks" mode needs no API calls: it uses chunk-to-chunk
+    similarities of non-neighbouring chunks as the background distribution.
+    """
+
+    def __init__(self, mode: str = None, sample_size: int = None):
+        self.mode = mode or Config.RELEVANCE_CALIBRATION
+        self.sample_size = sample_size or Config.CALIBRATION_SAMPLE_SIZE
+
+    def calibrate(self, index, texts: Sequence[str], embed_documents: Callable[[List[str]], List[List[float]]]) -> Dict:
+        fallback = {"threshold": Config.SIMILARITY_THRESHOLD, "calibrated": False, "mode": self.mode}
+        if self.mode == "off" or len(index) < Config.MIN_CALIBRATION_CHUNKS:
+            return fallback
+        try:
+            rng = np.random.default_rng(0)
+            rows = np.sort(rng.choice(len(index), size=min(self.sample_size, len(index)), replace=False))
+            if self.mode == "chunks":
+                result = self._from_chunks(index, rows)
+            else:
+                result = self._from_synthetic_queries(index, texts, rows, embed_documents)
+        except Exception as e:
+            print(f"Relevance calibration failed, using fixed threshold: {e}")
+            return fallback
+        result.update({"calibrated": True, "mode": self.mode})
+        print(f"Calibrated relevance threshold: {result['threshold']:.4f} (fixed default {Config.SIMILARITY_THRESHOLD})")
+        return result
+
+    def _from_synthetic_queries(self, index, texts, rows, embed_documents) -> Dict:
+        rows = rows[:Config.CALIBRATION_QUERIES]
+        pseudo_queries = [_first_sentence(texts[i]) for i in rows]
+        probes = _probe_cache.get(Config.EMBEDDING_MODEL)
+        to_embed = pseudo_queries + ([] if probes is not None else OFF_TOPIC_PROBES)
+        embedded = embed_documents(to_embed)
+        if probes is None:
+            # Probe embeddings depend only on the model, so they are reused across documents
+            probes = embedded[len(pseudo_queries):]
+            _probe_cache[Config.EMBEDDING_MODEL] = probes
+        # A pseudo-query is taken from its own chunk, so that chunk is excluded: the score
+        # of the best *other* chunk is what a real question about the document gets
+        positive = np.array([self._best_other(index, vec, row) for vec, row in zip(embedded, rows)])
+        negative = np.array([index.search(vec, 1)[1][0] for vec in probes])
+        return self._cutoff(positive, negative)
+
+    @staticmethod
+    def _best_other(index, vector, source_row: int) -> float:
+        rows, similarities = index.search(vector, 2)
+        return float(next(sim for row, sim in zip(rows, similarities) if row != source_row))
+
+    def _from_chunks(self, index, rows) -> Dict:
+        vectors = index.vectors(rows)
+        sims = vectors @ vectors.T
+        # Neighbouring chunks share overlap text, so only distant pairs count as unrelated
+        far_apart = np.abs(rows[:, None] - rows[None, :]) > 2
+        negative = sims[far_apart]
+        np.fill_diagonal(sims, -1.0)
+        positive = sims.max(axis=1)
+        return self._cutoff(positive, negative)
+
+    @staticmethod
+    def _cutoff(positive, negative) -> Dict:
+        high_negative = float(np.quantile(negative, Config.CALIBRATION_NEGATIVE_QUANTILE))
+        low_positive = float(np.quantile(positive, 1 - Config.CALIBRATION_NEGATIVE_QUANTILE))
+        # Midway between the score ranges; if they overlap, favour the off-topic side
+        cutoff = (high_negative + low_positive) / 2 if low_positive > high_negative else high_negative
+        return {
+            "threshold": 1 - cutoff,
+            "positive_median": float(np.median(positive)),
+            "negative_median": float(np.median(negative)),
+        }
+
+
+def evaluate_routing(vector_store, labelled: List[Tuple[str, bool]], thresholds: Optional[Dict[str, float]] = None) -> Dict:
+    """Precision/recall of the "answer from PDF" decision on (question, is_about_pdf) pairs.
+
+    Each question is embedded once; every named threshold (defaults: the calibrated one
+    and Config.SIMILARITY_THRESHOLD) is then scored on the same distances. Decisions
+    follow is_relevant_to_pdf: when the best vector match misses the threshold, the
+    fuzzy keyword fallback's distance (1 - fuzzy score) is checked instead.
+    """
+    if thresholds is None:
+        thresholds = {"calibrated": vector_store.relevance_threshold, "fixed": Config.SIMILARITY_THRESHOLD}
+    distances = [vector_store.best_distance(question) for question, _ in labelled]
+    fuzzy_distances = {}
+
+    def fuzzy_distance(i: int) -> Optional[float]:
+        # Computed once per question, and only if some threshold needs the fallback
+        if i not in fuzzy_distances:
+            best_match, fuzzy_score = vector_store.fuzzy_keyword_search(labelled[i][0])
+            fuzzy_distances[i] = 1 - fuzzy_score if best_match else None
+        return fuzzy_distances[i]
+
+    report = {}
+    for name, threshold in thresholds.items():
+        tp = fp = fn = tn = 0
+        for i, (distance, (_, expected)) in enumerate(zip(distances, labelled)):
+            if distance is not None and distance >= threshold:
+                distance = fuzzy_distance(i)
+            predicted = distance is not None and distance < threshold
+            if predicted and expected:
+                tp += 1
+            elif predicted:
+                fp += 1
+            elif expected:
+                fn += 1
+            else:
+                tn += 1
+        precision = tp / (tp + fp) if tp + fp else 0.0
+        recall = tp / (tp + fn) if tp + fn else 0.0
+        report[name] = {
+            "threshold": threshold,
+            "precision": precision,
+            "recall": recall,
+            "f1": 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+            "accuracy": (tp + tn) / len(labelled) if labelled else 0.0,
+        }
+    return report
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+from typing import List
+from config import Config
+from utils.lazy import lazy_import
+
+np = lazy_import("numpy")
+
+
+def mmr_select(query_similarities, vectors, k: int, lambda_mult: float = None) -> List[int]:
+    """Indices of k candidates chosen by maximal marginal relevance.
+
+    `vectors` are the candidates' unit embeddings (rows) and `query_similarities` their
+    cosine similarity to the query. The candidate-candidate similarities come from one
+    matrix product; each greedy step is a vectorized update of the best similarity to
+    anything already selected.
+    """
+    lambda_mult = Config.MMR_LAMBDA if lambda_mult is None else lambda_mult
+    relevance = np.asarray(query_similarities, dtype=np.float32)
+    count = len(relevance)
+    if count <= k:
+        return list(np.argsort(-relevance))
+    pairwise = vectors @ vectors.T
+    first = int(np.argmax(relevance))
+    selected = [first]
+    chosen = np.zeros(count, dtype=bool)
+    chosen[first] = True
+    redundancy = pairwise[first].copy()
+    while len(selected) < k:
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[chosen] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        chosen[best] = True
+        np.maximum(redundancy, pairwise[best], out=redundancy)
+    return selected
+
+
+def join_overlapping(first: str, second: str, max_overlap: int = None) -> str:
+    """Concatenate consecutive chunks, dropping the text they share through chunk overlap"""
+    max_overlap = max_overlap or 2 * Config.CHUNK_OVERLAP
+    probe = second[:40]
+    if probe:
+        pos = first.find(probe, max(0, len(first) - max_overlap - len(probe)))
+        while pos >= 0:
+            if second.startswith(first[pos:]):
+                return first + second[len(first) - pos:]
+            pos = first.find(probe, pos + 1)
+    return f"{first}\n{second}"
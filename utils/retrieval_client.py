@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+from functools import cached_property
+from typing import List, Sequence, Tuple, TYPE_CHECKING
+from config import Config
+from utils.extractive import is_lookup_question
+from utils.lazy import lazy_import
+
+if TYPE_CHECKING:
+    from langchain.schema import Document
+
+requests = lazy_import("requests")
+lc_schema = lazy_import("langchain.schema")
+
+
+class RetrievalClient:
+    """Drop-in replacement for VectorStore that calls retrieval_service.py.
+
+    Used when Config.RETRIEVAL_MODE is "service": text extraction stays in the app,
+    embedding, indexing and search happen in the service.
+    """
+
+    def __init__(self, base_url: str = None):
+        self.base_url = (base_url or Config.RETRIEVAL_SERVICE_URL).rstrip("/")
+        self.doc_id = None
+        self.calibration = {}
+        self.relevance_threshold = Config.SIMILARITY_THRESHOLD
+
+    @cached_property
+    def session(self):
+        return requests.Session()
+
+    def _call(self, method: str, path: str, **kwargs) -> dict:
+        response = self.session.request(method, f"{self.base_url}{path}", timeout=Config.RETRIEVAL_TIMEOUT, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    def _use(self, info: dict):
+        self.doc_id = info["doc_id"]
+        self.calibration = info.get("calibration") or {}
+        self.relevance_threshold = info["relevance_threshold"]
+
+    def create_vector_store(self, text_chunks: Sequence[str], pdf_filename: str, doc_id: str = None):
+        """Send extracted chunks to the service to be embedded and indexed"""
+        doc_id = doc_id or f"{pdf_filename}:{len(text_chunks)}"
+        pages = getattr(text_chunks, "pages", None)
+        print(f"Sending {len(text_chunks)} chunks to the retrieval service...")
+        self._use(self._call("POST", "/ingest", json={
+            "doc_id": doc_id,
+            "filename": pdf_filename,
+            "chunks": list(text_chunks),
+            "pages": list(pages) if pages else None,
+        }))
+
+    def load_from_store(self, doc_id: str) -> bool:
+        try:
+            self._use(self._call("POST", f"/documents/{doc_id}/load"))
+            return True
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                return False
+            raise
+
+    def refresh(self) -> bool:
+        # The service follows newly published generations itself
+        return False
+
+    def chunk_texts(self) -> List[str]:
+        return self._call("GET", f"/documents/{self.doc_id}/chunks")["chunks"]
+
+    @staticmethod
+    def _results(items: List[dict]) -> List[Tuple[Document, float]]:
+        return [(lc_schema.Document(page_content=item["content"], metadata=item["metadata"]), item["distance"])
+                for item in items]
+
+    def similarity_search(self, query: str, k: int = 3) -> List[Tuple[Document, float]]:
+        if self.doc_id is None:
+            print("Vector store not initialized")
+            return []
+        try:
+            return self._results(self._call("POST", "/search", json={"doc_id": self.doc_id, "query": query, "k": k})["results"])
+        except Exception as e:
+            print(f"Error in similarity search: {e}")
+            return []
+
+    def batch_similarity_search(self, queries: Sequence[str], k: int = 3) -> List[List[Tuple[Document, float]]]:
+        if self.doc_id is None:
+            print("Vector store not initialized")
+            return [[] for _ in queries]
+        try:
+            data = self._call("POST", "/batch_search", json={"doc_id": self.doc_id, "queries": list(queries), "k": k})
+            return [self._results(items) for items in data["results"]]
+        except Exception as e:
+            print(f"Error in batch similarity search: {e}")
+            return [[] for _ in queries]
+
+    def extractive_answer(self, query: str, relevant_docs: List[Tuple[Document, float]]):
+        if not Config.ENABLE_EXTRACTIVE_ANSWERS or not is_lookup_question(query):
+            return None
+        docs = {doc.metadata["chunk_id"]: doc for doc, _ in relevant_docs if "chunk_id" in doc.metadata}
+        if not docs:
+            return None
+        try:
+            answer = self._call("POST", "/extractive", json={"doc_id": self.doc_id, "query": query, "chunk_ids": list(docs)})["answer"]
+        except Exception as e:
+            print(f"Extractive answer failed: {e}")
+            return None
+        if answer is None:
+            return None
+        return answer["sentence"], docs[answer["chunk_id"]], answer["score"]
+
+    def is_relevant_to_pdf(self, query: str, threshold: float = None) -> bool:
+        """Check if query is relevant to PDF content"""
+        if threshold is None:
+            threshold = self.relevance_threshold
+
+        results = self.similarity_search(query, k=1)
+        if not results:
+            print("No results found for relevance check")
+            return False
+
+        _, score = results[0]
+        is_relevant = score < threshold
+        print(f"Relevance check - Query: '{query[:50]}...', Score: {score:.4f}, Threshold: {threshold}, Relevant: {is_relevant}")
+        return is_relevant
@@ -0,0 +1,61 @@
+import re
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable
+
+
+def normalize_key(text: str) -> str:
+    """Case- and whitespace-insensitive form of user input for coalescing keys"""
+    return re.sub(r'\s+', ' ', text.strip().lower())
+
+
+class SingleFlight:
+    """Coalesces identical concurrent calls into one upstream call.
+
+    The first caller for a key runs the function; callers arriving while it is in
+    flight wait on the same future and share its result (or exception). Nothing is
+    cached once the call completes. Counters are kept per group for metrics.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight: Dict[Hashable, Future] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def do(self, group: str, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        flight_key = (group, key)
+        with self._lock:
+            stats = self._stats.setdefault(group, {"calls": 0, "executed": 0, "coalesced": 0})
+            stats["calls"] += 1
+            future = self._in_flight.get(flight_key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._in_flight[flight_key] = future
+                stats["executed"] += 1
+            else:
+                stats["coalesced"] += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._in_flight.pop(flight_key, None)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Copy of the per-group counters: calls, executed upstream, coalesced"""
+        with self._lock:
+            return {group: dict(counts) for group, counts in self._stats.items()}
+
+
+# Shared by every session in this server process (components are cached per process)
+single_flight = SingleFlight()
@@ -0,0 +1,285 @@
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+from config import Config
+
+# Monotonic time by which the current request must be answered (None = no deadline)
+_deadline: contextvars.ContextVar = contextvars.ContextVar("upstream_deadline", default=None)
+
+_executor = ThreadPoolExecutor(max_workers=Config.UPSTREAM_WORKERS, thread_name_prefix="upstream")
+
+# Exception classes (of openai, httpx, requests or the standard library, matched by name so
+# none has to be imported) raised when an upstream could not be reached or did not answer
+TRANSIENT_ERROR_NAMES = {"APITimeoutError", "APIConnectionError", "TimeoutException", "TransportError",
+                         "Timeout", "ConnectionError", "TimeoutError"}
+
+
+class UpstreamError(Exception):
+    """An upstream call was not attempted or abandoned by this layer"""
+
+
+class CircuitOpenError(UpstreamError):
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} is unavailable (circuit open, retrying in {retry_after:.0f}s)")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(UpstreamError):
+    def __init__(self, name: str):
+        super().__init__(f"{name} did not answer within the request deadline")
+        self.name = name
+
+
+@contextmanager
+def deadline(seconds: float = None):
+    """Give every upstream call made inside the block (in this thread or context) a shared
+    time budget. Nested deadlines can only shorten the budget. Also usable as a decorator."""
+    seconds = Config.REQUEST_DEADLINE_SECONDS if seconds is None else seconds
+    current = _deadline.get()
+    token = _deadline.set(min(current, time.monotonic() + seconds) if current else time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current deadline, or None outside any deadline"""
+    current = _deadline.get()
+    return None if current is None else current - time.monotonic()
+
+
+def call_timeout() -> float:
+    """Timeout for one HTTP request: the time left, capped at UPSTREAM_TIMEOUT"""
+    left = remaining()
+    return Config.UPSTREAM_TIMEOUT if left is None else max(0.0, min(left, Config.UPSTREAM_TIMEOUT))
+
+
+def is_transient(error: BaseException) -> bool:
+    """True for errors worth retrying: timeouts, connection failures, HTTP 408, 429 and 5xx.
+    Bad requests, auth failures or an oversized prompt fail the same way every time."""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if status is not None:
+        return status in (408, 429) or status >= 500
+    return any(cls.__name__ in TRANSIENT_ERROR_NAMES for cls in type(error).__mro__)
+
+
+class CircuitBreaker:
+    """Opens after BREAKER_FAILURE_THRESHOLD consecutive failures so calls fail fast.
+
+    After BREAKER_RESET_SECONDS one trial call is let through (half-open): success
+    closes the circuit, failure opens it again for another reset period.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = None, reset_seconds: float = None):
+        self.name = name
+        self.failure_threshold = failure_threshold or Config.BREAKER_FAILURE_THRESHOLD
+        self.reset_seconds = reset_seconds or Config.BREAKER_RESET_SECONDS
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go through now"""
+        with self._lock:
+            if self.state == "closed":
+                return
+            waited = time.monotonic() - self.opened_at
+            if self.state == "open" and waited >= self.reset_seconds:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._trial_running:
+                self._trial_running = True
+                return
+            raise CircuitOpenError(self.name, max(0.0, self.reset_seconds - waited))
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.state = "closed"
+            self._trial_running = False
+
+    def release_trial(self):
+        """End a call that says nothing about the upstream's health (e.g. a deadline it had
+        almost no time for), without counting it either way"""
+        with self._lock:
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    print(f"Circuit for {self.name} opened after {self.failures} failures")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+
+class Upstream:
+    """Deadline, circuit breaker, retries and hedging around calls to one upstream API.
+
+    A hedged call sends a duplicate request when the first has not answered within the
+    upstream's recent p95 latency and returns whichever succeeds first, trimming the
+    tail at the cost of roughly 5% extra requests. Only idempotent calls should be hedged.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.breaker = CircuitBreaker(name)
+        self._latencies = deque(maxlen=Config.HEDGE_LATENCY_WINDOW)
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "failures": 0, "request_errors": 0, "retries": 0, "rejected": 0,
+                       "deadline_exceeded": 0, "hedged": 0, "hedge_wins": 0}
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def hedge_delay(self) -> Optional[float]:
+        """Recent p95 latency of hedgeable calls, or None until HEDGE_MIN_SAMPLES have succeeded"""
+        with self._lock:
+            if len(self._latencies) < Config.HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self._latencies)
+        return max(Config.HEDGE_MIN_DELAY, ordered[int(0.95 * (len(ordered) - 1))])
+
+    def call(self, fn: Callable, *args, hedge: bool = False, **kwargs) -> Any:
+        """fn(*args, **kwargs) within the current deadline, retried up to UPSTREAM_RETRIES times"""
+        self._count("calls")
+        for attempt in range(Config.UPSTREAM_RETRIES + 1):
+            left = remaining()
+            if left is not None and left <= 0:
+                # Spent by earlier steps of the request; not the upstream's fault
+                self._count("deadline_exceeded")
+                raise DeadlineExceeded(self.name)
+            try:
+                self.breaker.before_call()
+            except CircuitOpenError:
+                self._count("rejected")
+                raise
+            try:
+                return self._attempt(fn, args, kwargs, hedge)
+            except DeadlineExceeded:
+                self._count("deadline_exceeded")
+                # Only a call that had a real chance to answer counts against the upstream
+                if left is None or left >= Config.HEDGE_MIN_DELAY:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.release_trial()
+                raise
+            except Exception as e:
+                if not is_transient(e):
+                    # The upstream answered; the request itself was refused (bad key, oversized prompt, ...)
+                    self._count("request_errors")
+                    self.breaker.release_trial()
+                    raise
+                self._count("failures")
+                self.breaker.record_failure()
+                if attempt == Config.UPSTREAM_RETRIES:
+                    raise
+                print(f"{self.name} call failed ({e}), retrying")
+                self._count("retries")
+
+    def _timed(self, fn: Callable, args, kwargs, record: bool) -> Any:
+        start = time.monotonic()
+        result = fn(*args, **kwargs)
+        if record:
+            with self._lock:
+                self._latencies.append(time.monotonic() - start)
+        return result
+
+    def _attempt(self, fn: Callable, args, kwargs, hedge: bool) -> Any:
+        left = remaining()
+        delay = self.hedge_delay() if hedge and Config.ENABLE_HEDGING else None
+        if left is None and delay is None:
+            # Nothing to give up on or race against: call in this thread
+            result = self._timed(fn, args, kwargs, hedge)
+            self.breaker.record_success()
+            return result
+
+        def submit():
+            # Copy the context so calls made by fn see the same deadline
+            return _executor.submit(contextvars.copy_context().run, self._timed, fn, args, kwargs, hedge)
+
+        first = submit()
+        pending = {first}
+        if delay is not None and (left is None or delay < left):
+            done, _ = wait(pending, timeout=delay)
+            if not done:
+                self._count("hedged")
+                pending.add(submit())
+        error = None
+        while pending:
+            left = remaining()
+            done, pending = wait(pending, timeout=None if left is None else max(0.0, left), return_when=FIRST_COMPLETED)
+            if not done:
+                # The abandoned requests finish (or time out) in the background
+                raise DeadlineExceeded(self.name)
+            for future in done:
+                if future.exception() is None:
+                    if future is not first:
+                        self._count("hedge_wins")
+                    self.breaker.record_success()
+                    return future.result()
+                error = error or future.exception()
+        raise error
+
+    def stats(self) -> Dict:
+        delay = self.hedge_delay()
+        with self._lock:
+            report = dict(self._stats)
+        report["state"] = self.breaker.state
+        report["hedge_delay_ms"] = round(delay * 1000) if delay is not None else None
+        return report
+
+
+class GuardedEmbeddings:
+    """Routes an embeddings client's calls through the "embeddings" upstream.
+
+    Single queries are hedged; document batches (ingest) are not, since they are large
+    and a duplicate would double the cost of the slowest requests. Each HTTP request
+    times out with the deadline, so abandoned attempts do not hold a worker beyond it.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.upstream = get_upstream("embeddings")
+
+    def _embed_query(self, text: str):
+        return self.client.embed_query(text, timeout=call_timeout())
+
+    def _embed_documents(self, texts):
+        return self.client.embed_documents(texts, timeout=call_timeout())
+
+    def embed_query(self, text: str):
+        return self.upstream.call(self._embed_query, text, hedge=True)
+
+    def embed_documents(self, texts):
+        return self.upstream.call(self._embed_documents, texts)
+
+
+_upstreams: Dict[str, Upstream] = {}
+_registry_lock = threading.Lock()
+
+
+def get_upstream(name: str) -> Upstream:
+    """The process-wide Upstream for a name; breakers and latency history are shared by all sessions"""
+    with _registry_lock:
+        if name not in _upstreams:
+            _upstreams[name] = Upstream(name)
+        return _upstreams[name]
+
+
+def upstream_stats() -> Dict[str, Dict]:
+    with _registry_lock:
+        upstreams = list(_upstreams.values())
+    return {upstream.name: upstream.stats() for upstream in upstreams}
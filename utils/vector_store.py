@@ -1,37 +1,167 @@
+from __future__ import annotations
+
 import os
-import numpy as np
-from typing import List, Tuple
-from langchain_openai import OpenAIEmbeddings
-from langchain.schema import Document
+import threading
+from collections import OrderedDict
+from functools import cached_property
+from typing import List, Sequence, Tuple, TYPE_CHECKING
 from config import Config
-from thefuzz import process as fuzz_process
+from utils.lazy import lazy_import
+from utils.quantization import QuantizedIndex
+from utils.relevance import RelevanceCalibrator
+from utils.single_flight import single_flight, normalize_key
+from utils.extractive import ExtractiveIndex, is_lookup_question, term_coverage
+from utils.rerank import join_overlapping, mmr_select
+from utils.index_store import IndexStore, MappedDocuments, MappedTexts, load_array, write_texts
+from utils.upstream import GuardedEmbeddings
+
+if TYPE_CHECKING:
+    from langchain.schema import Document
+
+np = lazy_import("numpy")
+lc_schema = lazy_import("langchain.schema")
+
+_embeddings = None
+_embeddings_lock = threading.Lock()
+
+
+def shared_embeddings() -> GuardedEmbeddings:
+    """The process-wide OpenAI embeddings client, built on first use (or by the startup warm-up).
+    Calls go through the "embeddings" upstream (deadline, circuit breaker, hedging)."""
+    global _embeddings
+    with _embeddings_lock:
+        if _embeddings is None:
+            from langchain_openai import OpenAIEmbeddings
+            _embeddings = GuardedEmbeddings(OpenAIEmbeddings(
+                api_key=Config.OPENAI_API_KEY,
+                base_url=Config.OPENAI_BASE_URL,
+                model=Config.EMBEDDING_MODEL,
+                # OpenAI-compatible servers expect raw strings rather than tiktoken ids
+                check_embedding_ctx_length=Config.OPENAI_BASE_URL is None,
+                timeout=Config.UPSTREAM_TIMEOUT,
+                max_retries=0
+            ))
+        return _embeddings
+
 
 class VectorStore:
     def __init__(self):
-        self.embeddings = OpenAIEmbeddings(
-            api_key=Config.OPENAI_API_KEY,
-            model=Config.EMBEDDING_MODEL
-        )
         self.documents = []
-        self.document_embeddings = []
+        self.doc_id = None
+        self.index = QuantizedIndex()
+        self.calibration = {}
+        self.relevance_threshold = Config.SIMILARITY_THRESHOLD
+        self.extractive = ExtractiveIndex()
+        self.store = IndexStore()
+        self.generation = None
+        self._query_embeddings = OrderedDict()
+        self._query_lock = threading.Lock()
 
-    def create_vector_store(self, text_chunks: List[str], pdf_filename: str):
+    @cached_property
+    def embeddings(self):
+        """Embeddings client; one is shared by every store in the process"""
+        return shared_embeddings()
+
+    def create_vector_store(self, text_chunks: Sequence[str], pdf_filename: str, doc_id: str = None,
+                            pages: Sequence[int] = None):
         """Create in-memory vector store from text chunks using simple cosine similarity"""
+        # ChunkSpans from the fast chunker also know the page each chunk starts on
+        if pages is None:
+            pages = getattr(text_chunks, "pages", None)
         documents = [
-            Document(
+            lc_schema.Document(
                 page_content=chunk,
-                metadata={"source": pdf_filename, "chunk_id": i}
+                metadata={"source": pdf_filename, "chunk_id": i, **({"page": pages[i]} if pages else {})}
             )
             for i, chunk in enumerate(text_chunks)
         ]
-        self.documents = documents
-        
-        # Generate embeddings for all documents
+
+        # Everything is built into locals: searches running meanwhile keep using the
+        # previous index, and overlapping builds never share (or delete) each other's files
         print(f"Generating embeddings for {len(documents)} documents...")
         texts = [doc.page_content for doc in documents]
-        self.document_embeddings = self.embeddings.embed_documents(texts)
-        
-        print(f"Created simple vector store with {len(documents)} documents")
+        index = QuantizedIndex().build(self.embeddings.embed_documents(texts))
+
+        # Derive this document's relevance cutoff from its own score distribution
+        calibration = RelevanceCalibrator().calibrate(index, texts, self.embeddings.embed_documents)
+
+        extractive = ExtractiveIndex()
+        if Config.ENABLE_EXTRACTIVE_ANSWERS:
+            extractive.build(texts, self.embeddings.embed_documents)
+
+        # Swap the finished index in; the replaced one deletes its spill file once unused
+        self.documents, self.index, self.extractive = documents, index, extractive
+        self.calibration = calibration
+        self.relevance_threshold = calibration["threshold"]
+        # Identifies the indexed content in coalescing keys (the PDF's SHA-256 when known)
+        self.doc_id = doc_id or f"{pdf_filename}:{len(text_chunks)}"
+        self.generation = None
+        print(f"Created simple vector store with {len(documents)} documents ({index.mode} storage)")
+
+        if Config.PERSIST_INDEX and doc_id:
+            # Publish, then serve from the mapped files so every worker shares one copy
+            try:
+                self.store.publish(doc_id, lambda directory: self._write_generation(
+                    directory, documents, index, extractive, calibration))
+                self.load_from_store(doc_id)
+            except OSError as e:
+                print(f"Could not persist index for {doc_id[:12]}, keeping it in memory: {e}")
+
+    @staticmethod
+    def _write_generation(directory: str, documents, index: QuantizedIndex, extractive: ExtractiveIndex,
+                          calibration: dict) -> dict:
+        texts = [doc.page_content for doc in documents]
+        write_texts(directory, "chunks", texts)
+        pages = [doc.metadata.get("page") for doc in documents]
+        has_pages = bool(pages) and all(page is not None for page in pages)
+        if has_pages:
+            np.save(os.path.join(directory, "pages.npy"), np.asarray(pages, dtype=np.int32))
+        extractive.save(directory)
+        return {
+            "source": documents[0].metadata["source"] if documents else "",
+            "pages": has_pages,
+            "index": index.save(directory),
+            "calibration": calibration,
+        }
+
+    def load_from_store(self, doc_id: str) -> bool:
+        """Serve a published index for the document from memory-mapped files.
+
+        Returns False when no generation has been published yet. Nothing is embedded:
+        another worker process (or an earlier run) already did that work.
+        """
+        if not Config.PERSIST_INDEX:
+            return False
+        generation = self.store.current(doc_id)
+        if generation is None:
+            return False
+        if generation == self.generation:
+            return True
+        meta = self.store.read_meta(generation)
+        pages = load_array(generation, "pages") if meta.get("pages") else None
+        documents = MappedDocuments(MappedTexts(generation, "chunks"), meta["source"], pages)
+        index = QuantizedIndex.load(generation, meta["index"])
+        extractive = ExtractiveIndex.load(generation)
+
+        self.documents, self.index, self.extractive = documents, index, extractive
+        self.calibration = meta.get("calibration") or {}
+        self.relevance_threshold = self.calibration.get("threshold", Config.SIMILARITY_THRESHOLD)
+        self.doc_id, self.generation = doc_id, generation
+        self.store.touch(doc_id)
+        print(f"Loaded mapped index for {doc_id[:12]}: {len(documents)} chunks ({index.mode} storage)")
+        return True
+
+    def refresh(self) -> bool:
+        """Swap to a newer published generation of the current document, if any"""
+        if self.doc_id is None or self.generation is None:
+            return False
+        return self.store.current(self.doc_id) != self.generation and self.load_from_store(self.doc_id)
+
+    def chunk_texts(self) -> Sequence[str]:
+        """Texts of the indexed chunks, in chunk_id order"""
+        if isinstance(self.documents, MappedDocuments):
+            return self.documents.texts
+        return [doc.page_content for doc in self.documents]
 
     def cosine_similarity(self, vec1, vec2):
         """Calculate cosine similarity between two vectors"""
@@ -52,54 +182,182 @@ class VectorStore:
         if not self.documents:
             return None, 0
         
+        from thefuzz import process as fuzz_process
         choices = [doc.page_content for doc in self.documents]
         best_match, score = fuzz_process.extractOne(query, choices)
         return best_match, score / 100.0
 
+    def embed_query(self, query: str) -> List[float]:
+        """Embed a query, sharing one API call between identical concurrent requests.
+
+        Recent query embeddings are kept in a small LRU cache, so the search, relevance
+        check and extractive scoring of one question cost a single API call.
+        """
+        key = (Config.EMBEDDING_MODEL, query.strip())
+        with self._query_lock:
+            if key in self._query_embeddings:
+                self._query_embeddings.move_to_end(key)
+                return self._query_embeddings[key]
+        embedding = single_flight.do("embed", key, self.embeddings.embed_query, query)
+        with self._query_lock:
+            self._query_embeddings[key] = embedding
+            if len(self._query_embeddings) > Config.QUERY_EMBEDDING_CACHE_SIZE:
+                self._query_embeddings.popitem(last=False)
+        return embedding
+
     def similarity_search(self, query: str, k: int = 3) -> List[Tuple[Document, float]]:
         """Search for similar documents using cosine similarity"""
-        if not self.documents or not self.document_embeddings:
+        key = (self.doc_id, normalize_key(query), k)
+        return single_flight.do("search", key, self._similarity_search, query, k)
+
+    def _similarity_search(self, query: str, k: int) -> List[Tuple[Document, float]]:
+        if not self.documents or not len(self.index):
             print("Vector store not initialized")
             return []
 
         try:
             # Generate embedding for the query
-            query_embedding = self.embeddings.embed_query(query)
-            
-            # Calculate similarities
-            similarities = []
-            for i, doc_embedding in enumerate(self.document_embeddings):
-                similarity = self.cosine_similarity(query_embedding, doc_embedding)
-                # Convert similarity to distance (lower is better)
-                distance = 1 - similarity
-                similarities.append((self.documents[i], distance, similarity))
-            
-            # Sort by similarity (highest first) and take top k
-            similarities.sort(key=lambda x: x[2], reverse=True)
-            results = [(doc, distance) for doc, distance, _ in similarities[:k]]
+            query_embedding = self.embed_query(query)
             
-            print(f"Found {len(results)} similar documents for query: '{query[:50]}...'")
-            for i, (doc, score) in enumerate(results):
-                print(f"  Result {i+1}: Score={score:.4f}, Content preview: '{doc.page_content[:100]}...'")
-
-            # Check if results are relevant enough
-            if not results or all(score >= Config.SIMILARITY_THRESHOLD for _, score in results):
-                print("No relevant vector match, using fuzzy keyword search fallback.")
-                best_match, fuzzy_score = self.fuzzy_keyword_search(query)
-                if best_match:
-                    doc = Document(page_content=best_match, metadata={"source": "fuzzy_fallback"})
-                    return [(doc, 1-fuzzy_score)]
-
-            return results
+            # Scan the quantized codes, rescoring the best candidates at full precision
+            rows, similarities = self.index.search(query_embedding, self._fetch_k(k))
+            rows, similarities = self._diversify(rows, similarities, k)
+            results = self._collect_results(query, rows, similarities)
+            # Answer context (not the single-chunk relevance check) gets the hits' neighbours
+            return self.expand_neighbors(results) if k > 1 else results
 
         except Exception as e:
             print(f"Error in similarity search: {e}")
             return []
 
+    def embed_queries(self, queries: Sequence[str]) -> List[List[float]]:
+        """Embed many queries, sending only the uncached ones in one batched API call"""
+        keys = [(Config.EMBEDDING_MODEL, query.strip()) for query in queries]
+        with self._query_lock:
+            found = {key: self._query_embeddings[key] for key in keys if key in self._query_embeddings}
+        missing = list(dict.fromkeys(key for key in keys if key not in found))
+        if missing:
+            embedded = self.embeddings.embed_documents([text for _, text in missing])
+            found.update(zip(missing, embedded))
+            with self._query_lock:
+                for key in missing:
+                    self._query_embeddings[key] = found[key]
+                while len(self._query_embeddings) > Config.QUERY_EMBEDDING_CACHE_SIZE:
+                    self._query_embeddings.popitem(last=False)
+        return [found[key] for key in keys]
+
+    def batch_similarity_search(self, queries: Sequence[str], k: int = 3) -> List[List[Tuple[Document, float]]]:
+        """similarity_search for many queries: one embedding call and one matrix-matrix scan"""
+        if not self.documents or not len(self.index):
+            print("Vector store not initialized")
+            return [[] for _ in queries]
+        if not queries:
+            return []
+
+        try:
+            rows, similarities = self.index.search_batch(self.embed_queries(queries), self._fetch_k(k))
+            print(f"Batch search over {len(queries)} queries")
+            results = [self._collect_results(query, *self._diversify(r, sims, k))
+                       for query, r, sims in zip(queries, rows, similarities)]
+            return [self.expand_neighbors(r) for r in results] if k > 1 else results
+        except Exception as e:
+            print(f"Error in batch similarity search: {e}")
+            return [[] for _ in queries]
+
+    @staticmethod
+    def _fetch_k(k: int) -> int:
+        return max(k, Config.MMR_FETCH_K) if Config.ENABLE_MMR and k > 1 else k
+
+    def _diversify(self, rows, similarities, k: int):
+        """Keep k of the candidates by maximal marginal relevance, using the index's own
+        vectors (no API calls); overlapping neighbours of a hit rarely survive"""
+        if len(rows) <= k:
+            return rows, similarities
+        order = mmr_select(similarities, self.index.vectors(rows), k)
+        return rows[order], similarities[order]
+
+    def expand_neighbors(self, results: List[Tuple[Document, float]], window: int = None) -> List[Tuple[Document, float]]:
+        """Merge each hit with up to `window` adjacent chunks per side (by chunk_id).
+
+        The merged text drops the overlap between consecutive chunks and keeps the hit's
+        score; a hit already inside a better-ranked hit's window is dropped.
+        """
+        window = Config.NEIGHBOR_WINDOW if window is None else window
+        if window <= 0:
+            return results
+        covered = set()
+        expanded = []
+        for doc, score in results:
+            chunk_id = doc.metadata.get("chunk_id")
+            if chunk_id is None:
+                expanded.append((doc, score))
+                continue
+            if chunk_id in covered:
+                continue
+            start = end = chunk_id
+            while start > max(0, chunk_id - window) and start - 1 not in covered:
+                start -= 1
+            while end < min(len(self.documents) - 1, chunk_id + window) and end + 1 not in covered:
+                end += 1
+            ids = list(range(start, end + 1))
+            covered.update(ids)
+            text = self.documents[start].page_content
+            for i in ids[1:]:
+                text = join_overlapping(text, self.documents[i].page_content)
+            expanded.append((lc_schema.Document(page_content=text, metadata=dict(doc.metadata, chunk_ids=ids)), score))
+        return expanded
+
+    def _collect_results(self, query: str, rows, similarities) -> List[Tuple[Document, float]]:
+        # Convert similarity to distance (lower is better)
+        results = [(self.documents[i], float(1 - sim)) for i, sim in zip(rows, similarities)]
+        
+        print(f"Found {len(results)} similar documents for query: '{query[:50]}...'")
+        for i, (doc, score) in enumerate(results):
+            print(f"  Result {i+1}: Score={score:.4f}, Content preview: '{doc.page_content[:100]}...'")
+
+        # Check if results are relevant enough
+        if not results or all(score >= self.relevance_threshold for _, score in results):
+            print("No relevant vector match, using fuzzy keyword search fallback.")
+            best_match, fuzzy_score = self.fuzzy_keyword_search(query)
+            if best_match:
+                doc = lc_schema.Document(page_content=best_match, metadata={"source": "fuzzy_fallback"})
+                return [(doc, 1-fuzzy_score)]
+
+        return results
+
+    def best_distance(self, query: str):
+        """Cosine distance of the closest chunk (no fuzzy fallback), or None if the store is empty"""
+        if not len(self.index):
+            return None
+        _, similarities = self.index.search(self.embed_query(query), 1)
+        return float(1 - similarities[0])
+
+    def extractive_answer(self, query: str, relevant_docs: List[Tuple[Document, float]]):
+        """Best sentence from the retrieved chunks when it answers a lookup confidently.
+
+        Returns (sentence, document, score) or None, in which case the LLM should answer.
+        """
+        if not self.extractive.ready or not is_lookup_question(query):
+            return None
+        docs = {doc.metadata["chunk_id"]: doc for doc, _ in relevant_docs if "chunk_id" in doc.metadata}
+        if not docs:
+            return None
+        best = self.extractive.best_sentence(self.embed_query(query), list(docs))
+        if best is None:
+            return None
+        sentence, chunk_id, score = best
+        print(f"Extractive candidate (score {score:.4f}): '{sentence[:100]}'")
+        if score < Config.EXTRACTIVE_MIN_SCORE:
+            return None
+        if term_coverage(query, sentence) < Config.EXTRACTIVE_MIN_TERM_COVERAGE:
+            print("Extractive candidate misses some of the question's key terms, using the LLM")
+            return None
+        return sentence, docs[chunk_id], score
+
     def is_relevant_to_pdf(self, query: str, threshold: float = None) -> bool:
         """Check if query is relevant to PDF content"""
         if threshold is None:
-            threshold = Config.SIMILARITY_THRESHOLD
+            threshold = self.relevance_threshold
             
         results = self.similarity_search(query, k=1)
         if not results:
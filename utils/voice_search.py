@@ -1,39 +1,187 @@
-import speech_recognition as sr
-from typing import Optional
+import io
+import json
+import threading
+from abc import ABC, abstractmethod
+from typing import Iterator, Optional
+from config import Config
+from utils.lazy import lazy_import, optional_import
 
-try:
-    import openai
-    HAS_OPENAI = True
-except ImportError:
-    HAS_OPENAI = False
+sr = lazy_import("speech_recognition")
+
+
+class TranscriptionBackend(ABC):
+    """Turns `speech_recognition.AudioData` into text.
+
+    Backends are created once and reused; `stream` yields partial transcripts for
+    long recordings delivered as a sequence of audio chunks.
+    """
+    name = "base"
+
+    @abstractmethod
+    def transcribe(self, audio, recognizer) -> str:
+        """Text of one AudioData recording ("" when nothing was recognized)"""
+
+    def stream(self, audio_chunks, recognizer) -> Iterator[str]:
+        """Yield the transcript so far after each chunk"""
+        parts = []
+        for audio in audio_chunks:
+            text = self.transcribe(audio, recognizer).strip()
+            if text:
+                parts.append(text)
+                yield " ".join(parts)
+
+
+class GoogleBackend(TranscriptionBackend):
+    """Google Web Speech API (free, but requires internet)"""
+    name = "google"
+
+    def transcribe(self, audio, recognizer) -> str:
+        try:
+            return recognizer.recognize_google(audio)
+        except sr.UnknownValueError:
+            return ""
+
+
+class WhisperAPIBackend(TranscriptionBackend):
+    """OpenAI Whisper API; the WAV payload is sent straight from memory"""
+    name = "whisper"
+
+    def __init__(self, api_key: Optional[str] = None, model: str = "whisper-1"):
+        openai = optional_import("openai")
+        if openai is None:
+            raise ImportError("The openai package is required for the Whisper backend")
+        self.client = openai.OpenAI(api_key=api_key or Config.OPENAI_API_KEY, base_url=Config.OPENAI_BASE_URL)
+        self.model = model
+
+    def transcribe(self, audio, recognizer) -> str:
+        transcript = self.client.audio.transcriptions.create(
+            model=self.model,
+            file=("speech.wav", audio.get_wav_data()),
+        )
+        return transcript.text
+
+
+class VoskBackend(TranscriptionBackend):
+    """Offline recognition on CPU with a local Vosk model (no network round trip)"""
+    name = "vosk"
+    sample_rate = 16000
+
+    def __init__(self, model_path: Optional[str] = None):
+        vosk = optional_import("vosk")
+        if vosk is None:
+            raise ImportError("The vosk package is required for offline transcription")
+        self._vosk = vosk
+        # Loading a model takes seconds, so it happens once per process
+        self.model = vosk.Model(model_path or Config.VOSK_MODEL_PATH)
+
+    def _recognizer(self):
+        return self._vosk.KaldiRecognizer(self.model, self.sample_rate)
+
+    def _pcm(self, audio) -> bytes:
+        return audio.get_raw_data(convert_rate=self.sample_rate, convert_width=2)
+
+    def transcribe(self, audio, recognizer) -> str:
+        kaldi = self._recognizer()
+        kaldi.AcceptWaveform(self._pcm(audio))
+        return json.loads(kaldi.FinalResult()).get("text", "")
+
+    def stream(self, audio_chunks, recognizer) -> Iterator[str]:
+        # One decoder across chunks keeps context; partial hypotheses are yielded as they firm up
+        kaldi = self._recognizer()
+        final_parts = []
+        for audio in audio_chunks:
+            if kaldi.AcceptWaveform(self._pcm(audio)):
+                text = json.loads(kaldi.Result()).get("text", "")
+                if text:
+                    final_parts.append(text)
+                yield " ".join(final_parts)
+            else:
+                partial = json.loads(kaldi.PartialResult()).get("partial", "")
+                yield " ".join(final_parts + ([partial] if partial else []))
+        text = json.loads(kaldi.FinalResult()).get("text", "")
+        if text:
+            final_parts.append(text)
+        yield " ".join(final_parts)
+
+
+BACKENDS = {
+    GoogleBackend.name: GoogleBackend,
+    WhisperAPIBackend.name: WhisperAPIBackend,
+    VoskBackend.name: VoskBackend,
+}
+
+
+def create_backend(name: Optional[str] = None, **kwargs) -> TranscriptionBackend:
+    """Create a transcription backend by name ("google", "whisper" or "vosk")"""
+    name = name or Config.VOICE_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown voice backend '{name}'. Choose one of: {', '.join(BACKENDS)}")
+    return BACKENDS[name](**kwargs)
+
+
+class VoiceTranscriber:
+    """Long-lived transcription service with one reusable recognizer and backend"""
+
+    def __init__(self, backend: Optional[TranscriptionBackend] = None):
+        self.recognizer = sr.Recognizer()
+        self.backend = backend or create_backend()
+
+    @staticmethod
+    def _audio_source(audio_file):
+        # Raw bytes are wrapped in memory; no temp file is written
+        if isinstance(audio_file, (bytes, bytearray, memoryview)):
+            audio_file = io.BytesIO(audio_file)
+        return sr.AudioFile(audio_file)
+
+    def load_audio(self, audio_file):
+        """Read a WAV/AIFF/FLAC path, file-like object or bytes into AudioData"""
+        with self._audio_source(audio_file) as source:
+            return self.recognizer.record(source)
+
+    def transcribe(self, audio_file) -> str:
+        """Transcribe a whole recording"""
+        return self.backend.transcribe(self.load_audio(audio_file), self.recognizer)
+
+    def iter_audio_chunks(self, audio_file, chunk_seconds: Optional[float] = None):
+        """Yield consecutive AudioData chunks of a recording without loading it all at once"""
+        chunk_seconds = chunk_seconds or Config.VOICE_CHUNK_SECONDS
+        with self._audio_source(audio_file) as source:
+            while True:
+                audio = self.recognizer.record(source, duration=chunk_seconds)
+                if not audio.frame_data:
+                    break
+                yield audio
+
+    def transcribe_stream(self, audio_file, chunk_seconds: Optional[float] = None) -> Iterator[str]:
+        """Transcribe a long recording chunk by chunk, yielding the partial transcript so far"""
+        return self.backend.stream(self.iter_audio_chunks(audio_file, chunk_seconds), self.recognizer)
+
+
+_transcribers = {}
+_transcribers_lock = threading.Lock()
+
+
+def get_transcriber(backend: Optional[str] = None, **kwargs) -> VoiceTranscriber:
+    """Shared VoiceTranscriber per backend name and options (e.g. api_key), created on first use"""
+    name = backend or Config.VOICE_BACKEND
+    key = (name, tuple(sorted(kwargs.items())))
+    with _transcribers_lock:
+        if key not in _transcribers:
+            _transcribers[key] = VoiceTranscriber(create_backend(name, **kwargs))
+        return _transcribers[key]
 
 
 def transcribe_audio(audio_file, use_whisper: bool = False, openai_api_key: Optional[str] = None) -> str:
     """
-    Transcribe an audio file (file-like object or file path) to text.
+    Transcribe an audio file (file-like object, bytes or file path) to text.
     If use_whisper is True and OpenAI is available, use Whisper API.
-    Otherwise, use SpeechRecognition's default recognizer (Google Web Speech API).
+    Otherwise, use the configured backend (Config.VOICE_BACKEND).
     """
-    recognizer = sr.Recognizer()
     try:
-        if isinstance(audio_file, str):
-            audio_source = sr.AudioFile(audio_file)
+        if use_whisper and openai_api_key and optional_import("openai"):
+            transcriber = get_transcriber("whisper", api_key=openai_api_key)
         else:
-            audio_source = sr.AudioFile(audio_file)
-        with audio_source as source:
-            audio = recognizer.record(source)
-        if use_whisper and HAS_OPENAI and openai_api_key:
-            # Use OpenAI Whisper API
-            import tempfile
-            with tempfile.NamedTemporaryFile(suffix='.wav', delete=True) as tmp:
-                tmp.write(audio.get_wav_data())
-                tmp.flush()
-                openai.api_key = openai_api_key
-                with open(tmp.name, 'rb') as f:
-                    transcript = openai.Audio.transcribe('whisper-1', f)
-                return transcript['text']
-        else:
-            # Use Google Web Speech API (free, but requires internet)
-            return recognizer.recognize_google(audio)
+            transcriber = get_transcriber()
+        return transcriber.transcribe(audio_file)
     except Exception as e:
-        return f"[Voice transcription error: {str(e)}]" 
\ No newline at end of file
+        return f"[Voice transcription error: {str(e)}]"
@@ -0,0 +1,39 @@
+import importlib
+import threading
+import time
+from config import Config
+
+
+def warm_up_components(components: dict) -> threading.Thread:
+    """Build the API clients and import heavy modules in a background thread.
+
+    Lets the first page render immediately; by the time the user uploads a PDF or
+    asks a question the clients are usually ready.
+    """
+    thread = threading.Thread(target=_warm_up, args=(components,), name="component-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def _warm_up(components: dict):
+    start = time.perf_counter()
+    try:
+        # Touching the lazy properties builds the clients (and imports langchain/openai)
+        # (in "service" mode there is no embeddings client: the retrieval service embeds)
+        embeddings = None
+        if Config.RETRIEVAL_MODE != "service":
+            from utils.vector_store import shared_embeddings
+            embeddings = shared_embeddings()
+        llm = components['qa_chain'].llm
+        components['qa_chain'].router.model("fast")
+        # Modules needed by the first upload and search
+        for module in ("numpy", "PyPDF2"):
+            importlib.import_module(module)
+        if Config.WARMUP_PING:
+            # Opens the HTTPS connections so the first real call skips the TLS handshake
+            if embeddings is not None:
+                embeddings.embed_query("warm-up")
+            llm.invoke("Reply with OK.")
+        print(f"Component warm-up finished in {time.perf_counter() - start:.2f}s")
+    except Exception as e:
+        print(f"Component warm-up failed (components will load on first use): {e}")
@@ -1,7 +1,9 @@
-import requests
-from bs4 import BeautifulSoup
 from typing import List, Dict
 from config import Config
+from utils.lazy import lazy_import
+from utils.upstream import call_timeout, get_upstream
+
+requests = lazy_import("requests")
 
 class WebSearch:
     def __init__(self):
@@ -13,15 +15,7 @@ class WebSearch:
             return []
         
         try:
-            url = "https://serpapi.com/search"
-            params = {
-                "q": query,
-                "api_key": self.serpapi_key,
-                "num": num_results
-            }
-            
-            response = requests.get(url, params=params)
-            results = response.json()
+            results = get_upstream("search").call(self._fetch, query, num_results, hedge=True)
             
             search_results = []
             for result in results.get("organic_results", []):
@@ -36,6 +30,17 @@ class WebSearch:
             print(f"Error in web search: {e}")
             return []
     
+    def _fetch(self, query: str, num_results: int) -> Dict:
+        params = {
+            "q": query,
+            "api_key": self.serpapi_key,
+            "num": num_results
+        }
+        # Bounded by the question's deadline; errors count towards the circuit breaker
+        response = requests.get(Config.SERPAPI_URL, params=params, timeout=call_timeout())
+        response.raise_for_status()
+        return response.json()
+
     def get_web_context(self, query: str) -> str:
         """Get web context for the query"""
         results = self.search_google(query)